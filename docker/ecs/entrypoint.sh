@@ -31,22 +31,12 @@ cleanup() {
   
   if [ $exit_code -ne 0 ]; then
     # Update job status to FAILED if script exits with error
-    err=$(tail -c 2048 "$LOGFILE" | sed 's/"/\\"/g')
-    $AWS_CLI dynamodb update-item \
-      --table-name "$DDB_TABLE" \
-      --key "{\"jobId\":{\"S\":\"$JOB_ID\"}}" \
-      --update-expression "SET #s = :s, finishedAt = :ft, errorDetail = :err" \
-      --expression-attribute-names '{"#s":"status"}' \
-      --expression-attribute-values "{\":s\":{\"S\":\"FAILED\"},\":ft\":{\"S\":\"$(TIMESTAMP)\"},\":err\":{\"S\":\"$err\"}}"
+    err=$(tail -c 2048 "$LOGFILE")
+    ddb_update FAILED --set finishedAt="$(TIMESTAMP)" --set errorDetail="$err"
     echo "Job status updated to FAILED" >> "$LOGFILE"
   elif [ "$JOB_STATUS" != "COMPLETED" ]; then
     # If we haven't explicitly marked job as completed, do it now
-    $AWS_CLI dynamodb update-item \
-      --table-name "$DDB_TABLE" \
-      --key "{\"jobId\":{\"S\":\"$JOB_ID\"}}" \
-      --update-expression "SET #s = :s, finishedAt = :ft" \
-      --expression-attribute-names '{"#s":"status"}' \
-      --expression-attribute-values "{\":s\":{\"S\":\"COMPLETED\"},\":ft\":{\"S\":\"$(TIMESTAMP)\"}}"
+    ddb_update COMPLETED --set finishedAt="$(TIMESTAMP)"
     echo "Job status updated to COMPLETED" >> "$LOGFILE"
   fi
 }
@@ -55,45 +45,26 @@ TIMESTAMP() {
   date -u +%Y-%m-%dT%H:%M:%SZ
 }
 
-# ddb_update <STATUS> <EXPR_SUFFIX> <VALS_FRAGMENT>
-# e.g. ddb_update RECORDING ", foo = :f"  '":f":{"S":"bar"}'
+# ddb_update <STATUS> [--set NAME=VALUE] [--number NAME=VALUE] [--set-once NAME=VALUE]
+# e.g. ddb_update RECORDING --set foo=bar
+# Writes go through the shared job state machine, so a status the recorder
+# reports late can never undo a later or final status written by the Lambdas
 ddb_update(){
-  local status="$1"
-  local expr_suffix="$2"
-  local vals_frag="$3"
-
-  # Build JSON for --expression-attribute-values
-  local json="{\":s\":{\"S\":\"$status\"}"
-  if [[ -n "$vals_frag" ]]; then
-    json+=",${vals_frag}"
-  fi
-  json+="}"
-
-  # Replace any reserved words with expression attribute names
-  # Convert "ttl = :ttl" to "#ttl = :ttl" in expr_suffix
-  expr_suffix="${expr_suffix//ttl = /#ttl = }"
-  
-  # Add ttl to attribute names if needed
-  local attr_names='{"#s":"status"}'
-  if [[ "$expr_suffix" == *"#ttl"* ]]; then
-    attr_names='{"#s":"status","#ttl":"ttl"}'
-  fi
-
-  $AWS_CLI dynamodb update-item \
-    --table-name "$DDB_TABLE" \
-    --key "{\"jobId\":{\"S\":\"$JOB_ID\"}}" \
-    --update-expression "SET #s = :s${expr_suffix}" \
-    --expression-attribute-names "$attr_names" \
-    --expression-attribute-values "$json"
+  python3 /app/job_state.py "$JOB_ID" "$@"
 }
 
 # 1) RECORDING + set TTL
 ttl_epoch=$(( $(date +%s) + TTL_DAYS*86400 ))
-ddb_update RECORDING \
-  ", recordingAt = :ra, ttl = :ttl" \
-  '":ra":{"S":"'"$(TIMESTAMP)"'"},":ttl":{"N":"'"$ttl_epoch"'"}'
+ddb_update RECORDING --set recordingAt="$(TIMESTAMP)" --number ttl="$ttl_epoch"
 
 # 2) start download in background
+# For live HLS, yt-dlp's ffmpeg downloader fetches the video and audio formats in one
+# ffmpeg process that writes straight to $TARGET(.part) as MPEG-TS (--hls-use-mpegts).
+# MPEG-TS is only appended to, so the live upload and progress agent follow the file
+# as it grows. Where yt-dlp downloads the formats itself (e.g. YouTube's DASH with
+# --live-from-start), they go to per-format files that are merged into $TARGET when
+# the stream ends: that recording is uploaded after yt-dlp exits, and progress
+# follows the per-format files until then
 yt-dlp \
   --live-from-start \
   --hls-prefer-ffmpeg \
@@ -104,59 +75,61 @@ yt-dlp \
   "$URL" 2>>"$LOGFILE" &
 dl_pid=$!
 
-# 3) heartbeat every 60s
-while kill -0 "$dl_pid" 2>/dev/null; do
-  now=$(TIMESTAMP)
-  size=$(stat -c%s "$TARGET" 2>/dev/null || echo 0)
-  $AWS_CLI dynamodb update-item \
-    --table-name "$DDB_TABLE" \
-    --key "{\"jobId\":{\"S\":\"$JOB_ID\"}}" \
-    --update-expression "SET lastHeartbeat = :hb, bytesDownloaded = :bd" \
-    --expression-attribute-values "{\":hb\":{\"S\":\"$now\"},\":bd\":{\"N\":\"$size\"}}"
-  sleep 60
-done
+# Upload settled parts of the recording while yt-dlp is still writing it. Each
+# block is read once and feeds the multipart upload, the torrent piece hashes and
+# the whole-file SHA-256, so once yt-dlp exits only the tail is left to process.
+# Announce tiers and web seeds come from tracker-config.json (TRACKERS / WEB_SEED_URLS override it)
+S3_KEY=${S3_KEY%/}
+TORRENT_FILE="/tmp/$(basename "$TARGET").torrent"
+SHA256_FILE="/tmp/$(basename "$TARGET").sha256"
+UPLOAD_CHECKPOINT="/downloads/.$(basename "$TARGET").upload"
+python3 /app/recording_pipeline.py "$TARGET" "$S3_BUCKET" "$S3_KEY/$(basename "$TARGET")" \
+  --follow "$dl_pid" --checkpoint "$UPLOAD_CHECKPOINT" \
+  -o "$TORRENT_FILE" -c "Chronicle Livestream Recording" \
+  --sha256-output "$SHA256_FILE" 2>>"$LOGFILE" &
+pipeline_pid=$!
+
+# 3) heartbeat: one long-lived agent writes bytes recorded and ingest rates, sampling
+# every 5s at first and backing off to 60s while the rate is steady
+python3 /app/progress_agent.py "$JOB_ID" "$TARGET" --pid "$dl_pid" 2>>"$LOGFILE" &
+progress_pid=$!
 
 wait "$dl_pid"
 exit_code=$?
+wait "$progress_pid" 2>/dev/null || true
 
 if [ $exit_code -ne 0 ]; then
+  # Stop the live upload without completing it; S3 aborts it via the bucket lifecycle rule
+  kill "$pipeline_pid" 2>/dev/null || true
+  wait "$pipeline_pid" 2>/dev/null || true
   # 4) FAILED
-  err=$(tail -c 2048 "$LOGFILE" | sed 's/"/\\"/g')
-  $AWS_CLI dynamodb update-item \
-    --table-name "$DDB_TABLE" \
-    --key "{\"jobId\":{\"S\":\"$JOB_ID\"}}" \
-    --update-expression "SET #s = :s, finishedAt = :ft, errorDetail = :err" \
-    --expression-attribute-names '{"#s":"status"}' \
-    --expression-attribute-values "{\":s\":{\"S\":\"FAILED\"},\":ft\":{\"S\":\"$(TIMESTAMP)\"},\":err\":{\"S\":\"$err\"}}"
+  err=$(tail -c 2048 "$LOGFILE")
+  ddb_update FAILED --set finishedAt="$(TIMESTAMP)" --set errorDetail="$err"
   exit $exit_code
 fi
 
 # 5) UPLOADING
-ddb_update UPLOADING \
-  ", uploadingAt = :ua" \
-  '":ua":{"S":"'"$(TIMESTAMP)"'"}'
+ddb_update UPLOADING --set uploadingAt="$(TIMESTAMP)"
 
-# Remove any trailing slashes from S3_KEY
-S3_KEY=${S3_KEY%/}
-
-# Create a copy in the shared volume for transmission
-echo "Copying file to shared volume for seeding..."
+# Make the file available in the shared volume for transmission
+echo "Linking file into shared volume for seeding..."
 # Make sure the downloads directory exists
 mkdir -p /var/downloads
-# Copy the file to the shared volume before uploading to S3
-cp -v "$TARGET" "/var/downloads/$(basename "$TARGET")"
+# A hardlink (or a reflink across filesystems that support it) avoids reading and
+# writing the whole recording again; a plain copy is the last resort
+ln -f "$TARGET" "/var/downloads/$(basename "$TARGET")" 2>/dev/null || \
+  cp -v --reflink=auto "$TARGET" "/var/downloads/$(basename "$TARGET")"
 
-# Upload file to S3 with correct path (avoid path/file/file pattern)
-$AWS_CLI s3 cp "$TARGET" "s3://$S3_BUCKET/$S3_KEY/$(basename "$TARGET")" 2>>"$LOGFILE"
+# Wait for the pipeline to send the tail and complete the upload (avoid path/file/file
+# pattern in the key). Parts go up concurrently (S3_UPLOAD_PART_SIZE / S3_UPLOAD_CONCURRENCY),
+# and a rerun after a crash resumes from the parts S3 already has
+wait "$pipeline_pid"
 
-# 6) CREATING TORRENT
-ddb_update CREATING_TORRENT \
-  ", creatingTorrentAt = :cta" \
-  '":cta":{"S":"'"$(TIMESTAMP)"'"}'
+# 6) CREATING TORRENT (already built by the pipeline from the same reads as the upload)
+ddb_update CREATING_TORRENT --set creatingTorrentAt="$(TIMESTAMP)" --set contentSha256="$(cat "$SHA256_FILE")"
 
 # Get the full S3 path of the uploaded file
 S3_FULL_PATH="s3://$S3_BUCKET/$S3_KEY/$(basename "$TARGET")"
-TORRENT_FILE="/tmp/$(basename "$TARGET").torrent"
 
 # Store torrent in the watch subfolder
 TORRENT_S3_KEY="watch/$(basename "$TARGET").torrent"
@@ -166,58 +139,12 @@ echo "Ensuring watch folder exists in S3 bucket..."
 $AWS_CLI s3api head-object --bucket "$S3_BUCKET" --key "watch/" &>/dev/null || \
   $AWS_CLI s3api put-object --bucket "$S3_BUCKET" --key "watch/" --content-length 0
 
-# Create torrent file with transmission-create
-# Use the file in the shared volume instead of the original download location
-transmission-create -o "$TORRENT_FILE" -c "Chronicle Livestream Recording" -t udp://23.252.56.60:6969 "/var/downloads/$(basename "$TARGET")"
-
 # Upload torrent file to S3
-$AWS_CLI s3 cp "$TORRENT_FILE" "s3://$S3_BUCKET/$TORRENT_S3_KEY" 2>>"$LOGFILE"
+python3 /app/s3_uploader.py "$TORRENT_FILE" "$S3_BUCKET" "$TORRENT_S3_KEY" \
+  --content-type application/x-bittorrent 2>>"$LOGFILE"
 
-# Start transmission container to seed the torrent (if we're in LocalStack)
-if [[ -n "${AWS_ENDPOINT_URL:-}" ]]; then
-  # For local development, check if Docker is available
-  if ! docker info &>/dev/null; then
-    echo "Docker not available inside container. This is expected in LocalStack Lambda."
-    echo "The torrent file has been uploaded to S3 and can be used by the transmission service."
-  else
-    # Docker is available, start transmission container
-    docker run -d \
-      --name "transmission-${JOB_ID}" \
-      --network="chronicle-network" \
-      --volumes-from chronicle-recorder \
-      --volumes-from chronicle-transmission \
-      -e "JOB_ID=$JOB_ID" \
-      -e "DDB_TABLE=$DDB_TABLE" \
-      -e "TORRENT_FILE=$TORRENT_FILE" \
-      -e "SOURCE_FILE=$TARGET" \
-      -e "S3_BUCKET=$S3_BUCKET" \
-      -e "S3_KEY=$TORRENT_S3_KEY" \
-      -e "AWS_ENDPOINT_URL=$AWS_ENDPOINT_URL" \
-      chronicle-transmission
-  fi
-else
-  # For production, we use ECS task
-  aws ecs run-task \
-    --cluster "${ECS_CLUSTER}" \
-    --task-definition "${TRANSMISSION_TASK_DEF}" \
-    --launch-type FARGATE \
-    --network-configuration "awsvpcConfiguration={subnets=[${SUBNET_IDS}],securityGroups=[${SECURITY_GROUP_IDS}],assignPublicIp=ENABLED}" \
-    --overrides "{
-      \"containerOverrides\": [{
-        \"name\": \"chronicle-transmission\",
-        \"environment\": [
-          {\"name\": \"JOB_ID\", \"value\": \"$JOB_ID\"},
-          {\"name\": \"DDB_TABLE\", \"value\": \"$DDB_TABLE\"},
-          {\"name\": \"TORRENT_FILE\", \"value\": \"$TORRENT_FILE\"},
-          {\"name\": \"SOURCE_FILE\", \"value\": \"$TARGET\"},
-          {\"name\": \"S3_BUCKET\", \"value\": \"$S3_BUCKET\"},
-          {\"name\": \"S3_KEY\", \"value\": \"$TORRENT_S3_KEY\"}
-        ]
-      }]
-    }"
-fi
+# Seeding needs no per-job container or task: the seeder pool (docker/transmission)
+# picks the torrent up from the watch folder's S3 notification
 
 # 7) Update DynamoDB with torrent info
-ddb_update COMPLETED \
-  ", finishedAt = :ft, torrentFile = :tf" \
-  '":ft":{"S":"'"$(TIMESTAMP)"'"},":tf":{"S":"'"$TORRENT_S3_KEY"'"}'
+ddb_update COMPLETED --set finishedAt="$(TIMESTAMP)" --set torrentFile="$TORRENT_S3_KEY"
@@ -31,11 +31,15 @@ echo "✅ LocalStack is up!"
 # Configuration (override via env if desired)
 S3_BUCKET="${S3_BUCKET:-chronicle-recordings-${ENVIRONMENT}}"
 DDB_TABLE=${DDB_TABLE:-jobs}
+ACTIVE_RECORDINGS_TABLE=${ACTIVE_RECORDINGS_TABLE:-active-recordings}
+STATS_TABLE=${STATS_TABLE:-job-stats}
 QUEUE_NAME=${QUEUE_NAME:-chronicle-jobs.fifo}
 DLQ_NAME=${DLQ_NAME:-chronicle-jobs-dlq.fifo}
 LAMBDA_NAME=${LAMBDA_NAME:-dispatch-to-ecs}
 LAMBDA_SRC_DIR="terraform/backend/lambda"
 LAMBDA_ZIP="${LAMBDA_SRC_DIR}/dispatch_to_ecs.zip"
+STATS_LAMBDA_NAME=${STATS_LAMBDA_NAME:-job-stats-stream}
+STATS_LAMBDA_ZIP="${LAMBDA_SRC_DIR}/stats_stream.zip"
 API_NAME=${API_NAME:-chronicle-api}
 ECS_CLUSTER=${ECS_CLUSTER:-local-cluster}
 
@@ -48,8 +52,10 @@ if [ ! -f "$LAMBDA_ZIP" ]; then
   # Install requests (and its deps) into TMPDIR
   python3 -m pip install requests docker -t "$TMPDIR"
 
-  # Copy your handler
-  cp "$LAMBDA_SRC_DIR/dispatch_to_ecs.py" "$TMPDIR/"
+  # Copy your handler and the modules it imports
+  cp "$LAMBDA_SRC_DIR/dispatch_to_ecs.py" "$LAMBDA_SRC_DIR/job_queries.py" "$LAMBDA_SRC_DIR/job_state.py" \
+    "$LAMBDA_SRC_DIR/clients.py" "$LAMBDA_SRC_DIR/s3_uploader.py" "$LAMBDA_SRC_DIR/message_groups.py" \
+    "$LAMBDA_SRC_DIR/active_recordings.py" "$LAMBDA_SRC_DIR/job_stats.py" "$TMPDIR/"
 
   # Create the ZIP from inside TMPDIR, but write it back to the repo
   (
@@ -60,6 +66,13 @@ if [ ! -f "$LAMBDA_ZIP" ]; then
   rm -rf "$TMPDIR"
 fi
 
+# The stats stream Lambda only needs boto3, which the runtime provides
+if [ ! -f "$STATS_LAMBDA_ZIP" ]; then
+  echo "📦 Packaging stats stream Lambda into $STATS_LAMBDA_ZIP"
+  zip -j9 "$STATS_LAMBDA_ZIP" "$LAMBDA_SRC_DIR/stats_stream.py" "$LAMBDA_SRC_DIR/job_stats.py" \
+    "$LAMBDA_SRC_DIR/job_state.py" "$LAMBDA_SRC_DIR/clients.py"
+fi
+
 # 2) S3 bucket
 echo "➜ Creating S3 bucket: $S3_BUCKET"
 $AWS_CLI s3 mb s3://$S3_BUCKET
@@ -72,8 +85,28 @@ else
   echo "➜ Creating DynamoDB table: $DDB_TABLE"
   $AWS_CLI dynamodb create-table \
     --table-name "$DDB_TABLE" \
-    --attribute-definitions AttributeName=jobId,AttributeType=S \
+    --attribute-definitions \
+      AttributeName=jobId,AttributeType=S \
+      AttributeName=status,AttributeType=S \
+      AttributeName=createdAt,AttributeType=N \
+      AttributeName=lastUpdatedAt,AttributeType=N \
     --key-schema AttributeName=jobId,KeyType=HASH \
+    --global-secondary-indexes '[{
+      "IndexName": "status-createdAt-index",
+      "KeySchema": [
+        {"AttributeName": "status", "KeyType": "HASH"},
+        {"AttributeName": "createdAt", "KeyType": "RANGE"}
+      ],
+      "Projection": {"ProjectionType": "ALL"}
+    }, {
+      "IndexName": "status-lastUpdatedAt-index",
+      "KeySchema": [
+        {"AttributeName": "status", "KeyType": "HASH"},
+        {"AttributeName": "lastUpdatedAt", "KeyType": "RANGE"}
+      ],
+      "Projection": {"ProjectionType": "ALL"}
+    }]' \
+    --stream-specification StreamEnabled=true,StreamViewType=NEW_AND_OLD_IMAGES \
     --billing-mode PAY_PER_REQUEST
 
   echo "➜ Enabling TTL on '$DDB_TABLE'"
@@ -82,11 +115,79 @@ else
     --time-to-live-specification "Enabled=true,AttributeName=ttl"
 fi
 
+# Jobs written before the indexes existed have ISO string timestamps, which
+# an index keyed on a number rejects; convert them before adding the indexes
+if python3 -c "import boto3" 2> /dev/null; then
+  echo "➜ Converting string timestamps in '$DDB_TABLE' to epoch seconds"
+  DDB_TABLE="$DDB_TABLE" python3 "$LAMBDA_SRC_DIR/job_queries.py"
+else
+  echo "⚠️  boto3 not installed; run 'python3 $LAMBDA_SRC_DIR/job_queries.py' before using an older '$DDB_TABLE'"
+fi
+
+# Add status/<sort key> indexes to tables created before they existed
+# ensure_status_index <sort key attribute>
+ensure_status_index(){
+  local sort_key="$1"
+  local index_name="status-${sort_key}-index"
+  if ! $AWS_CLI dynamodb describe-table --table-name "$DDB_TABLE" \
+      | jq -e --arg name "$index_name" '.Table.GlobalSecondaryIndexes[]? | select(.IndexName==$name)' > /dev/null; then
+    echo "➜ Adding $index_name to '$DDB_TABLE'"
+    $AWS_CLI dynamodb update-table \
+      --table-name "$DDB_TABLE" \
+      --attribute-definitions \
+        AttributeName=status,AttributeType=S \
+        AttributeName=${sort_key},AttributeType=N \
+      --global-secondary-index-updates '[{
+        "Create": {
+          "IndexName": "'"$index_name"'",
+          "KeySchema": [
+            {"AttributeName": "status", "KeyType": "HASH"},
+            {"AttributeName": "'"$sort_key"'", "KeyType": "RANGE"}
+          ],
+          "Projection": {"ProjectionType": "ALL"}
+        }
+      }]'
+  fi
+}
+ensure_status_index createdAt
+ensure_status_index lastUpdatedAt
+
 # Ensure TTL is enabled idempotently
 $AWS_CLI dynamodb update-time-to-live \
   --table-name "$DDB_TABLE" \
   --time-to-live-specification "Enabled=true,AttributeName=ttl"
 
+# The stats stream Lambda follows every change to the jobs table
+if [ "$($AWS_CLI dynamodb describe-table --table-name "$DDB_TABLE" | jq -r '.Table.StreamSpecification.StreamEnabled // false')" != "true" ]; then
+  echo "➜ Enabling the stream on '$DDB_TABLE'"
+  $AWS_CLI dynamodb update-table \
+    --table-name "$DDB_TABLE" \
+    --stream-specification StreamEnabled=true,StreamViewType=NEW_AND_OLD_IMAGES
+fi
+
+# Live stream URL -> job recording it (POST /jobs coalesces duplicate requests)
+if ! $AWS_CLI dynamodb describe-table --table-name "$ACTIVE_RECORDINGS_TABLE" > /dev/null 2>&1; then
+  echo "➜ Creating DynamoDB table: $ACTIVE_RECORDINGS_TABLE"
+  $AWS_CLI dynamodb create-table \
+    --table-name "$ACTIVE_RECORDINGS_TABLE" \
+    --attribute-definitions AttributeName=urlKey,AttributeType=S \
+    --key-schema AttributeName=urlKey,KeyType=HASH \
+    --billing-mode PAY_PER_REQUEST
+  $AWS_CLI dynamodb update-time-to-live \
+    --table-name "$ACTIVE_RECORDINGS_TABLE" \
+    --time-to-live-specification "Enabled=true,AttributeName=ttl"
+fi
+
+# Job counters per status and per day (GET /stats)
+if ! $AWS_CLI dynamodb describe-table --table-name "$STATS_TABLE" > /dev/null 2>&1; then
+  echo "➜ Creating DynamoDB table: $STATS_TABLE"
+  $AWS_CLI dynamodb create-table \
+    --table-name "$STATS_TABLE" \
+    --attribute-definitions AttributeName=statKey,AttributeType=S \
+    --key-schema AttributeName=statKey,KeyType=HASH \
+    --billing-mode PAY_PER_REQUEST
+fi
+
 # 4) SQS FIFO + DLQ
 echo "➜ Creating SQS DLQ (FIFO): $DLQ_NAME"
 DLQ_URL=$($AWS_CLI sqs create-queue \
@@ -120,7 +221,21 @@ else
     --role arn:aws:iam::000000000000:role/irrelevant \
     --zip-file fileb://"$LAMBDA_ZIP" \
     --timeout 300 \
-    --environment "Variables={ECS_CLUSTER=$ECS_CLUSTER,ECS_TASK_DEF=chronicle-recorder-task,S3_BUCKET=$S3_BUCKET,DDB_TABLE=$DDB_TABLE,CONTAINER_NAME=chronicle-recorder,SUBNET_IDS=,SECURITY_GROUP_IDS=,TTL_DAYS=30,TRANSMISSION_TASK_DEF=chronicle-transmission-task,DOCKER_HOST=tcp://host.docker.internal:2375}"
+    --environment "Variables={ECS_CLUSTER=$ECS_CLUSTER,ECS_TASK_DEF=chronicle-recorder-task,S3_BUCKET=$S3_BUCKET,DDB_TABLE=$DDB_TABLE,ACTIVE_RECORDINGS_TABLE=$ACTIVE_RECORDINGS_TABLE,STATS_TABLE=$STATS_TABLE,CONTAINER_NAME=chronicle-recorder,SUBNET_IDS=,SECURITY_GROUP_IDS=,TTL_DAYS=30,DOCKER_HOST=tcp://host.docker.internal:2375}"
+fi
+
+if $AWS_CLI lambda get-function --function-name "$STATS_LAMBDA_NAME" > /dev/null 2>&1; then
+  echo "⚠️  Lambda function '$STATS_LAMBDA_NAME' already exists, skipping creation"
+else
+  echo "➜ Deploying Lambda function: $STATS_LAMBDA_NAME"
+  $AWS_CLI lambda create-function \
+    --function-name "$STATS_LAMBDA_NAME" \
+    --runtime python3.9 \
+    --handler stats_stream.lambda_handler \
+    --role arn:aws:iam::000000000000:role/irrelevant \
+    --zip-file fileb://"$STATS_LAMBDA_ZIP" \
+    --timeout 60 \
+    --environment "Variables={STATS_TABLE=$STATS_TABLE}"
 fi
 
 # 5.1) Create transmission ECS task definition
@@ -176,6 +291,31 @@ for METHOD in GET POST; do
     --source-arn "arn:aws:execute-api:$AWS_REGION:000000000000:$API_ID/*/$METHOD/jobs"
 done
 
+echo "➜ Creating /stats resource"
+STATS_RESOURCE_ID=$($AWS_CLI apigateway create-resource --rest-api-id "$API_ID" \
+  --parent-id "$ROOT_ID" --path-part stats | jq -r .id)
+
+$AWS_CLI apigateway put-method \
+  --rest-api-id "$API_ID" \
+  --resource-id "$STATS_RESOURCE_ID" \
+  --http-method GET \
+  --authorization-type NONE
+
+$AWS_CLI apigateway put-integration \
+  --rest-api-id "$API_ID" \
+  --resource-id "$STATS_RESOURCE_ID" \
+  --http-method GET \
+  --type AWS_PROXY \
+  --integration-http-method POST \
+  --uri "arn:aws:apigateway:$AWS_REGION:lambda:path/2015-03-31/functions/arn:aws:lambda:$AWS_REGION:000000000000:function:$LAMBDA_NAME/invocations"
+
+$AWS_CLI lambda add-permission \
+  --function-name "$LAMBDA_NAME" \
+  --statement-id "apigw-GET-stats-${API_ID}" \
+  --action lambda:InvokeFunction \
+  --principal apigateway.amazonaws.com \
+  --source-arn "arn:aws:execute-api:$AWS_REGION:000000000000:$API_ID/*/GET/stats"
+
 # Enable CORS on the /jobs resource
 echo "➜ Enabling CORS on /jobs resource"
 $AWS_CLI apigateway put-method \
@@ -234,12 +374,27 @@ $AWS_CLI apigateway create-deployment --rest-api-id "$API_ID" --stage-name prod
 echo "-> Creating event source mapping for Lambda"
 $AWS_CLI lambda create-event-source-mapping \
   --function-name "$LAMBDA_NAME" \
-  --batch-size 1 \
+  --batch-size 10 \
+  --function-response-types ReportBatchItemFailures \
   --event-source-arn "arn:aws:sqs:$AWS_REGION:000000000000:$QUEUE_NAME"
 
+echo "-> Creating event source mapping for $STATS_LAMBDA_NAME"
+JOBS_STREAM_ARN=$($AWS_CLI dynamodb describe-table --table-name "$DDB_TABLE" | jq -r .Table.LatestStreamArn)
+$AWS_CLI sqs create-queue --queue-name "$STATS_LAMBDA_NAME-failures" > /dev/null
+$AWS_CLI lambda create-event-source-mapping \
+  --function-name "$STATS_LAMBDA_NAME" \
+  --batch-size 100 \
+  --maximum-batching-window-in-seconds 10 \
+  --starting-position LATEST \
+  --bisect-batch-on-function-error \
+  --maximum-retry-attempts 5 \
+  --destination-config "OnFailure={Destination=arn:aws:sqs:$AWS_REGION:000000000000:$STATS_LAMBDA_NAME-failures}" \
+  --event-source-arn "$JOBS_STREAM_ARN"
+
 echo "✅ LocalStack setup complete!"
 echo "▶ S3 Bucket:   $S3_BUCKET"
 echo "▶ Queue URL:   $QUEUE_URL"
 echo "▶ DynamoDB:    $DDB_TABLE"
+echo "▶ Stats table: $STATS_TABLE"
 echo "▶ Lambda:      $LAMBDA_NAME"
 echo "▶ API URL:     $AWS_ENDPOINT_URL/restapis/$API_ID/prod/_user_request_"
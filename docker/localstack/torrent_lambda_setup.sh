@@ -10,6 +10,7 @@ LAMBDA_NAME="s3-torrent-creator"
 LAMBDA_HANDLER="s3_torrent_creator_local.lambda_handler"
 FUNCTION_DIR="./terraform/backend/lambda"
 REGION="us-west-1"
+WATCH_QUEUE_NAME="chronicle-watch-torrents"
 TMP_DIR="/tmp/lambda_setup"  # Using system /tmp directory
 
 # Try to detect the tracker's IP
@@ -95,6 +96,10 @@ if [ ! -f "$FUNCTION_DIR/s3_torrent_creator_local.py" ]; then
 fi
 
 cp "$FUNCTION_DIR/s3_torrent_creator_local.py" "$TMP_DIR/s3_torrent_creator_local.py"
+# Shared client, torrent, hashing, job state, torrent index, sidecar, record pool, uploader and tracker config modules imported by the handler
+cp "$FUNCTION_DIR/clients.py" "$FUNCTION_DIR/torrent.py" "$FUNCTION_DIR/hash_engine.py" "$FUNCTION_DIR/job_state.py" \
+  "$FUNCTION_DIR/torrent_index.py" "$FUNCTION_DIR/piece_sidecar.py" "$FUNCTION_DIR/record_pool.py" \
+  "$FUNCTION_DIR/s3_uploader.py" "$FUNCTION_DIR/tracker_config.py" "$FUNCTION_DIR/tracker-config.json" "$TMP_DIR/"
 cd "$TMP_DIR" || {
   echo "ERROR: Could not cd to $TMP_DIR"
   exit 1
@@ -130,7 +135,7 @@ aws --endpoint-url="$LOCALSTACK_ENDPOINT" --region="$REGION" --no-cli-pager lamb
   --handler "$LAMBDA_HANDLER" \
   --runtime "python3.9" \
   --role "arn:aws:iam::000000000000:role/s3-torrent-lambda-role" \
-  --environment "Variables={S3_BUCKET=$BUCKET_NAME,DDB_TABLE=jobs,TRACKERS=$TRACKER_URL,AWS_ENDPOINT_URL=$LAMBDA_ENDPOINT_URL,DOCKER_HOST=tcp://host.docker.internal:2375}" \
+  --environment "Variables={S3_BUCKET=$BUCKET_NAME,DDB_TABLE=jobs,TRACKERS=$TRACKER_URL,WEB_SEED_URLS=$LOCALSTACK_ENDPOINT/$BUCKET_NAME,AWS_ENDPOINT_URL=$LAMBDA_ENDPOINT_URL,DOCKER_HOST=tcp://host.docker.internal:2375}" \
   --timeout 300 \
   --memory-size 1024 || LAMBDA_CREATE_RESULT=1
 
@@ -159,6 +164,11 @@ fi
 # Wait a moment for permissions to propagate
 sleep 5
 
+# Queue the transmission seeder reads new watch/ torrents from (see docker/transmission/watch_ingest.py)
+echo "Creating watch torrent notification queue..."
+aws --endpoint-url="$LOCALSTACK_ENDPOINT" --region="$REGION" --no-cli-pager sqs create-queue \
+  --queue-name "$WATCH_QUEUE_NAME" >/dev/null || echo "WARNING: Could not create $WATCH_QUEUE_NAME"
+
 # Now set the S3 notification
 echo "Configuring S3 trigger for Lambda..."
 S3_TRIGGER_RESULT=0
@@ -170,6 +180,16 @@ aws --endpoint-url="$LOCALSTACK_ENDPOINT" --region="$REGION" --no-cli-pager s3ap
         "LambdaFunctionArn": "arn:aws:lambda:'"$REGION"':000000000000:function:'"$LAMBDA_NAME"'",
         "Events": ["s3:ObjectCreated:*"]
       }
+    ],
+    "QueueConfigurations": [
+      {
+        "QueueArn": "arn:aws:sqs:'"$REGION"':000000000000:'"$WATCH_QUEUE_NAME"'",
+        "Events": ["s3:ObjectCreated:*"],
+        "Filter": {"Key": {"FilterRules": [
+          {"Name": "prefix", "Value": "watch/"},
+          {"Name": "suffix", "Value": ".torrent"}
+        ]}}
+      }
     ]
   }' || S3_TRIGGER_RESULT=1
 
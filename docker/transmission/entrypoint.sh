@@ -19,12 +19,18 @@ else
   AWS_CLI="aws"
 fi
 
+# Daemons of a seeder pool share the /config volume, so each keeps its own config directory
+CONFIG_HOME="/config/transmission-home"
+if [ "${SEEDER_POOL:-false}" = "true" ]; then
+  CONFIG_HOME="$CONFIG_HOME-$(hostname)"
+fi
+
 # Create config directory if it doesn't exist
-mkdir -p /config/transmission-home
+mkdir -p "$CONFIG_HOME"
 mkdir -p /watch
 
 # Create settings.json with appropriate configuration
-cat > /config/transmission-home/settings.json << EOF
+cat > "$CONFIG_HOME/settings.json" << EOF
 {
   "download-dir": "/downloads",
   "incomplete-dir": "/downloads/incomplete",
@@ -50,25 +56,42 @@ sync_s3_watch_folder() {
   echo "S3 sync completed at $(date)"
 }
 
-# Initial sync from S3
-sync_s3_watch_folder
-
-# Start periodic sync process in the background
-(
-  while true; do
-    # Wait for 60 seconds
-    sleep 60
-    # Sync from S3
-    sync_s3_watch_folder
-  done
-) &
+if [ -n "${WATCH_QUEUE_URL:-}" ]; then
+  # Add each new torrent over RPC as soon as its S3 notification arrives (no listing)
+  echo "Ingesting torrents from S3 notifications on $WATCH_QUEUE_URL"
+  POOL_ARGS=()
+  if [ "${SEEDER_POOL:-false}" = "true" ]; then
+    POOL_ARGS=(--pool)
+  fi
+  python3 /watch_ingest.py --queue-url "$WATCH_QUEUE_URL" "${POOL_ARGS[@]}" &
+else
+  # No notification queue configured: fall back to polling the watch folder
+  sync_s3_watch_folder
+  (
+    while true; do
+      # Wait for 60 seconds
+      sleep 60
+      # Sync from S3
+      sync_s3_watch_folder
+    done
+  ) &
+fi
 
 # Store the background job PID
 SYNC_PID=$!
 
-# Trap to kill the sync process when transmission terminates
-trap "kill $SYNC_PID 2>/dev/null || true" EXIT
-
-# Start transmission-daemon in foreground
 echo "Starting transmission-daemon to seed torrents..."
-exec transmission-daemon --foreground --config-dir=/config/transmission-home 
\ No newline at end of file
+if [ "${SEEDER_POOL:-false}" = "true" ]; then
+  transmission-daemon --foreground --config-dir="$CONFIG_HOME" &
+  DAEMON_PID=$!
+  # On stop, the watcher hands this daemon's torrents back to the pool while the daemon
+  # still answers RPC, then the daemon is stopped
+  trap 'kill -TERM $SYNC_PID 2>/dev/null || true; wait $SYNC_PID || true; kill -TERM $DAEMON_PID 2>/dev/null || true' TERM INT
+  wait $DAEMON_PID || wait $DAEMON_PID
+else
+  # Trap to kill the sync process when transmission terminates
+  trap "kill $SYNC_PID 2>/dev/null || true" EXIT
+
+  # Start transmission-daemon in foreground
+  exec transmission-daemon --foreground --config-dir="$CONFIG_HOME"
+fi 
\ No newline at end of file
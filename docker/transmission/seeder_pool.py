@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import logging
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+WATCH_PREFIX = "watch/"
+
+# Torrents one daemon carries; past this, cold torrents make room for new ones
+MAX_ACTIVE_TORRENTS = int(os.environ.get("MAX_ACTIVE_TORRENTS", "200"))
+
+# A torrent nobody has downloaded from for this long may be evicted
+COLD_AFTER = float(os.environ.get("COLD_AFTER_HOURS", "6")) * 3600
+
+# How often peer demand is sampled from the daemon
+REFRESH_INTERVAL = 60.0
+
+# An evicted torrent is requeued to come back after this long (the SQS maximum).
+# It is only re-added where a daemon has free room, and waits this long
+# between attempts while the pool is full
+READMIT_DELAY = 900
+READMIT_RETRY_SECONDS = min(int(COLD_AFTER), 12 * 3600)
+
+# A waiting eviction is re-sent as a new message before the queue's
+# retention (14 days) would drop it
+READMIT_RENEW_AFTER = 7 * 86400
+
+TORRENT_FIELDS = ["id", "hashString", "name", "peersGettingFromUs", "rateUpload", "uploadedEver", "addedDate"]
+
+
+class PoolFull(Exception):
+    """This daemon is full and none of its torrents is cold enough to evict"""
+
+
+class NoFreeRoom(PoolFull):
+    """This daemon is full, and an evicted torrent never displaces another one"""
+
+
+def watch_key(name):
+    """Key of a torrent in the S3 watch folder, from the torrent's name"""
+    return f"{WATCH_PREFIX}{name}.torrent"
+
+
+def notification(bucket, key, readmit=False):
+    """An S3 ObjectCreated notification body for key, as watch_ingest.watch_keys reads it.
+
+    readmit marks a torrent this pool evicted, which is only re-added into free room.
+    """
+    body = {"Records": [{
+        "eventName": "ObjectCreated:Put",
+        "s3": {"bucket": {"name": bucket}, "object": {"key": urllib.parse.quote_plus(key)}},
+    }]}
+    if readmit:
+        body["readmit"] = True
+    return json.dumps(body)
+
+
+def is_readmit(message_body):
+    """True for the notification of a torrent the pool evicted"""
+    try:
+        return bool(json.loads(message_body).get("readmit"))
+    except (ValueError, AttributeError):
+        return False
+
+
+class SeederPool:
+    """One daemon's share of the seeding pool.
+
+    Every daemon consumes the same notification queue, so new torrents go
+    to whichever daemon has room. Demand is tracked per torrent from the
+    peers downloading from us and the bytes uploaded; once a daemon is
+    full, the torrents that have been cold longest are evicted to make
+    room. An evicted torrent is requeued and re-added once a daemon has
+    free room, where it seeds for at least cold_after again. On shutdown
+    the daemon requeues its torrents so the rest of the pool picks them up.
+    """
+
+    def __init__(self, rpc, sqs_client, queue_url, bucket,
+                 max_active=MAX_ACTIVE_TORRENTS, cold_after=COLD_AFTER):
+        self.rpc = rpc
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.bucket = bucket
+        self.max_active = max_active
+        self.cold_after = cold_after
+        self.torrents = {}
+        # hashString -> (wall-clock time demand was last seen, uploadedEver then)
+        self.demand = {}
+        self.refreshed_at = None
+
+    def refresh(self, force=False):
+        """Sample every torrent's peer demand from the daemon (at most once per REFRESH_INTERVAL)"""
+        now = time.time()
+        if not force and self.refreshed_at and now - self.refreshed_at < REFRESH_INTERVAL:
+            return
+        response = self.rpc.call("torrent-get", {"fields": TORRENT_FIELDS})
+        self.torrents = {t["hashString"]: t for t in response.get("arguments", {}).get("torrents", [])}
+        for info_hash, torrent in self.torrents.items():
+            active_at, uploaded = self.demand.get(info_hash, (torrent.get("addedDate") or now, 0))
+            if torrent["peersGettingFromUs"] or torrent["rateUpload"] or torrent["uploadedEver"] > uploaded:
+                active_at = now
+            self.demand[info_hash] = (active_at, torrent["uploadedEver"])
+        for info_hash in set(self.demand) - set(self.torrents):
+            del self.demand[info_hash]
+        self.refreshed_at = now
+        hot = sum(1 for t in self.torrents.values() if t["peersGettingFromUs"])
+        logger.info(f"Seeding {len(self.torrents)}/{self.max_active} torrents, {hot} with peers downloading")
+
+    def cold(self):
+        """Torrents without demand for cold_after seconds, coldest first"""
+        cutoff = time.time() - self.cold_after
+        idle = [(active_at, info_hash) for info_hash, (active_at, _) in self.demand.items() if active_at < cutoff]
+        return [self.torrents[info_hash] for _, info_hash in sorted(idle)]
+
+    def make_room(self, readmit=False):
+        """Make sure the daemon can take another torrent, evicting the coldest one if it is full.
+
+        Raises PoolFull if every torrent still has demand. For a readmit
+        (a torrent evicted earlier) nothing is evicted, so two cold
+        torrents never keep displacing each other: NoFreeRoom is raised.
+        """
+        self.refresh()
+        if len(self.torrents) < self.max_active:
+            return
+        if readmit:
+            raise NoFreeRoom(f"Seeding {len(self.torrents)} torrents, no free room for an evicted one")
+        cold = self.cold()
+        if not cold:
+            raise PoolFull(f"Seeding {len(self.torrents)} torrents, none of them cold")
+        self._requeue([cold[0]], delay=READMIT_DELAY, readmit=True)
+        self._remove([cold[0]])
+        logger.info(f"Evicted cold torrent {cold[0]['name']} to make room, requeued for re-admission")
+
+    def added(self):
+        """Note that a torrent was just added, so the next make_room sees it"""
+        self.refresh(force=True)
+
+    def hand_off(self):
+        """Requeue every torrent of this daemon for the rest of the pool (on shutdown)"""
+        self.refresh(force=True)
+        torrents = list(self.torrents.values())
+        self._requeue(torrents)
+        self._remove(torrents)
+        logger.info(f"Handed {len(torrents)} torrents back to the pool")
+
+    def _requeue(self, torrents, delay=0, readmit=False):
+        for torrent in torrents:
+            self.sqs_client.send_message(QueueUrl=self.queue_url, DelaySeconds=delay,
+                                         MessageBody=notification(self.bucket, watch_key(torrent["name"]), readmit))
+
+    def _remove(self, torrents):
+        if not torrents:
+            return
+        # Only the torrent leaves the daemon; whichever daemon adds it again
+        # verifies the data in /downloads, or fetches it from peers and web seeds
+        self.rpc.call("torrent-remove", {"ids": [t["id"] for t in torrents], "delete-local-data": False})
+        for torrent in torrents:
+            self.torrents.pop(torrent["hashString"], None)
+            self.demand.pop(torrent["hashString"], None)
@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import base64
+import signal
+import hashlib
+import logging
+import argparse
+import urllib.parse
+import urllib.error
+import urllib.request
+
+import seeder_pool
+
+logger = logging.getLogger(__name__)
+
+WATCH_PREFIX = "watch/"
+RPC_URL = os.environ.get("TRANSMISSION_RPC_URL", "http://127.0.0.1:9091/transmission/rpc")
+DOWNLOAD_DIR = os.environ.get("DOWNLOAD_DIR", "/downloads")
+
+# SQS long poll: a receive returns as soon as a notification arrives
+WAIT_SECONDS = 20
+
+# A notification a full daemon cannot take is retried (by any daemon) after this long
+FULL_RETRY_SECONDS = 300
+
+
+class TransmissionRPC:
+    """Minimal client for transmission-daemon's JSON-RPC interface"""
+
+    def __init__(self, url=RPC_URL, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.session_id = None
+
+    def call(self, method, arguments):
+        body = json.dumps({"method": method, "arguments": arguments}).encode()
+        for _ in range(2):
+            request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+            if self.session_id:
+                request.add_header("X-Transmission-Session-Id", self.session_id)
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                # The daemon answers 409 with the session ID to use (CSRF protection)
+                if e.code != 409:
+                    raise
+                self.session_id = e.headers.get("X-Transmission-Session-Id")
+        raise IOError("Transmission RPC kept rejecting the session ID")
+
+    def wait_ready(self, timeout=120):
+        """Block until the daemon answers RPC calls"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.call("session-get", {"fields": ["version"]})
+            except (OSError, ValueError) as e:
+                if time.monotonic() > deadline:
+                    raise IOError(f"Transmission RPC at {self.url} not available: {e}")
+                time.sleep(1)
+
+    def add_torrent(self, metainfo):
+        """Add a torrent from its bytes; returns 'torrent-added' or 'torrent-duplicate'"""
+        response = self.call("torrent-add", {
+            "metainfo": base64.b64encode(metainfo).decode(),
+            "download-dir": DOWNLOAD_DIR,
+        })
+        if response.get("result") != "success":
+            raise ValueError(f"Transmission rejected the torrent: {response.get('result')}")
+        return next(iter(response.get("arguments", {})), "torrent-added")
+
+    def has_torrent(self, info_hash):
+        """True if the daemon already holds the torrent with this info hash"""
+        response = self.call("torrent-get", {"ids": [info_hash], "fields": ["id"]})
+        return bool(response.get("arguments", {}).get("torrents"))
+
+
+def _skip(data, i):
+    """Index just past the bencoded value that starts at i"""
+    kind = data[i:i + 1]
+    if kind == b"i":
+        return data.index(b"e", i) + 1
+    if kind in (b"l", b"d"):
+        i += 1
+        while data[i:i + 1] != b"e":
+            i = _skip(data, i)
+        return i + 1
+    colon = data.index(b":", i)
+    return colon + 1 + int(data[i:colon])
+
+
+def info_hash(metainfo):
+    """Hex SHA-1 of a torrent's bencoded info dictionary (transmission's hashString)"""
+    if metainfo[:1] != b"d":
+        raise ValueError("Not a torrent file")
+    i = 1
+    while metainfo[i:i + 1] != b"e":
+        key_end = _skip(metainfo, i)
+        value_end = _skip(metainfo, key_end)
+        if metainfo[i:key_end] == b"4:info":
+            return hashlib.sha1(metainfo[key_end:value_end]).hexdigest()
+        i = value_end
+    raise ValueError("Torrent file has no info dictionary")
+
+
+def watch_keys(message_body):
+    """(bucket, key) of each watch-folder torrent in an S3 event notification"""
+    event = json.loads(message_body)
+    keys = []
+    for record in event.get("Records", []):
+        if not record.get("eventName", "").startswith("ObjectCreated"):
+            continue
+        key = urllib.parse.unquote_plus(record["s3"]["object"]["key"])
+        if key.startswith(WATCH_PREFIX) and key.endswith(".torrent"):
+            keys.append((record["s3"]["bucket"]["name"], key))
+    return keys
+
+
+def ingest(s3_client, rpc, bucket, key, pool=None, readmit=False):
+    """Fetch one torrent from S3 and hand it to transmission.
+
+    A torrent the daemon already holds (a duplicate notification or a
+    redelivery) is skipped before the pool makes room, so it never evicts
+    a cold torrent for nothing.
+    """
+    started = time.monotonic()
+    try:
+        metainfo = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    except s3_client.exceptions.NoSuchKey:
+        logger.warning(f"s3://{bucket}/{key} no longer exists, skipping")
+        return
+    if rpc.has_torrent(info_hash(metainfo)):
+        logger.info(f"{key}: already seeding, skipping")
+        return
+    if pool:
+        pool.make_room(readmit)
+    outcome = rpc.add_torrent(metainfo)
+    if pool:
+        pool.added()
+    logger.info(f"{key}: {outcome} in {(time.monotonic() - started) * 1000:.0f} ms")
+
+
+def wait_for_room(sqs_client, queue_url, message, reason):
+    """Keep an evicted torrent's notification on the queue until a daemon has free room"""
+    sent_at = int(message.get("Attributes", {}).get("SentTimestamp", 0)) / 1000
+    if time.time() - sent_at > seeder_pool.READMIT_RENEW_AFTER:
+        # Re-sent as a new message so the queue's retention never drops it
+        sqs_client.send_message(QueueUrl=queue_url, MessageBody=message["Body"],
+                                DelaySeconds=seeder_pool.READMIT_DELAY)
+        sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=message["ReceiptHandle"])
+        return
+    logger.info(f"Evicted torrent in message {message['MessageId']} waits for free room: {reason}")
+    sqs_client.change_message_visibility(QueueUrl=queue_url, ReceiptHandle=message["ReceiptHandle"],
+                                         VisibilityTimeout=seeder_pool.READMIT_RETRY_SECONDS)
+
+
+def run(sqs_client, s3_client, rpc, queue_url, pool=None, stopping=()):
+    """Consume S3 notifications until stopping is set, adding each new torrent to transmission.
+
+    A message is deleted once all of its torrents are added (or gone from
+    S3); anything else leaves it on the queue to be retried. With a pool,
+    a torrent is only taken if the daemon has room for it.
+    """
+    while not stopping:
+        try:
+            if pool:
+                # Keeps peer demand sampled while no new torrents arrive
+                pool.refresh()
+            response = sqs_client.receive_message(
+                QueueUrl=queue_url,
+                MaxNumberOfMessages=10,
+                WaitTimeSeconds=WAIT_SECONDS,
+                AttributeNames=["SentTimestamp"],
+            )
+        except Exception as e:
+            # e.g. the queue is not created yet, or a network blip
+            logger.error(f"Error receiving from {queue_url} or polling transmission: {e}")
+            time.sleep(5)
+            continue
+        for message in response.get("Messages", []):
+            try:
+                readmit = seeder_pool.is_readmit(message["Body"])
+                for bucket, key in watch_keys(message["Body"]):
+                    ingest(s3_client, rpc, bucket, key, pool, readmit)
+            except seeder_pool.NoFreeRoom as e:
+                wait_for_room(sqs_client, queue_url, message, e)
+                continue
+            except seeder_pool.PoolFull as e:
+                logger.info(f"Leaving message {message['MessageId']} to the rest of the pool: {e}")
+                sqs_client.change_message_visibility(QueueUrl=queue_url, ReceiptHandle=message["ReceiptHandle"],
+                                                     VisibilityTimeout=FULL_RETRY_SECONDS)
+                continue
+            except ValueError as e:
+                # Not a notification, or a torrent transmission will never accept
+                logger.error(f"Dropping message {message['MessageId']}: {e}")
+            except Exception as e:
+                logger.error(f"Error ingesting message {message['MessageId']}, will retry: {e}")
+                continue
+            sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=message["ReceiptHandle"])
+
+
+def main(argv=None):
+    """Add torrents to transmission as they appear in the S3 watch folder"""
+    import boto3
+
+    parser = argparse.ArgumentParser(description="Seed new watch-folder torrents from S3 event notifications")
+    parser.add_argument("--queue-url", default=os.environ.get("WATCH_QUEUE_URL"),
+                        help="SQS queue receiving the bucket's watch/ notifications (default: $WATCH_QUEUE_URL)")
+    parser.add_argument("--pool", action="store_true",
+                        help="run as one daemon of a seeder pool: cap its torrents at $MAX_ACTIVE_TORRENTS, "
+                             "evicting cold ones, and hand them back to the queue on SIGTERM")
+    args = parser.parse_args(argv)
+    if not args.queue_url:
+        parser.error("--queue-url or WATCH_QUEUE_URL is required")
+
+    endpoint_url = os.environ.get("AWS_ENDPOINT_URL") or os.environ.get("AWS_ENDPOINT") or None
+    region = os.environ.get("AWS_REGION", "us-west-1")
+    sqs_client = boto3.client("sqs", region_name=region, endpoint_url=endpoint_url)
+    s3_client = boto3.client("s3", region_name=region, endpoint_url=endpoint_url)
+
+    rpc = TransmissionRPC()
+    rpc.wait_ready()
+    pool = None
+    if args.pool:
+        pool = seeder_pool.SeederPool(rpc, sqs_client, args.queue_url, os.environ["S3_BUCKET"])
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    logger.info(f"Waiting for torrents on {args.queue_url}")
+    try:
+        run(sqs_client, s3_client, rpc, args.queue_url, pool, stopping)
+    except KeyboardInterrupt:
+        pass
+    if pool:
+        pool.hand_off()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
@@ -3,11 +3,46 @@ resource "aws_dynamodb_table" "jobs" {
   billing_mode = "PAY_PER_REQUEST"
   hash_key     = "jobId"
 
+  # Feeds stats_stream, which keeps the job stats aggregates up to date
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
   attribute {
     name = "jobId"
     type = "S"
   }
 
+  attribute {
+    name = "status"
+    type = "S"
+  }
+
+  attribute {
+    name = "createdAt"
+    type = "N"
+  }
+
+  attribute {
+    name = "lastUpdatedAt"
+    type = "N"
+  }
+
+  # Paginated GET /jobs: newest-first listing per status without a table scan
+  global_secondary_index {
+    name            = "status-createdAt-index"
+    hash_key        = "status"
+    range_key       = "createdAt"
+    projection_type = "ALL"
+  }
+
+  # GET /jobs?changedSince=: only the jobs written since the dashboard's last poll
+  global_secondary_index {
+    name            = "status-lastUpdatedAt-index"
+    hash_key        = "status"
+    range_key       = "lastUpdatedAt"
+    projection_type = "ALL"
+  }
+
   # Enable TTL on the numeric "ttl" attribute (epoch seconds)
   ttl {
     attribute_name = "ttl"
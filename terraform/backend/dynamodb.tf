@@ -4,11 +4,46 @@ resource "aws_dynamodb_table" "jobs" {
   billing_mode = "PAY_PER_REQUEST"
   hash_key     = "jobId"
 
+  # Feeds stats_stream, which keeps the job stats aggregates up to date
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
   attribute {
     name = "jobId"
     type = "S"
   }
 
+  attribute {
+    name = "status"
+    type = "S"
+  }
+
+  attribute {
+    name = "createdAt"
+    type = "N"
+  }
+
+  attribute {
+    name = "lastUpdatedAt"
+    type = "N"
+  }
+
+  # Paginated GET /jobs: newest-first listing per status without a table scan
+  global_secondary_index {
+    name            = "status-createdAt-index"
+    hash_key        = "status"
+    range_key       = "createdAt"
+    projection_type = "ALL"
+  }
+
+  # GET /jobs?changedSince=: only the jobs written since the dashboard's last poll
+  global_secondary_index {
+    name            = "status-lastUpdatedAt-index"
+    hash_key        = "status"
+    range_key       = "lastUpdatedAt"
+    projection_type = "ALL"
+  }
+
   ttl {
     attribute_name = "ttl"
     enabled        = true
@@ -18,4 +53,44 @@ resource "aws_dynamodb_table" "jobs" {
     Name        = "${var.environment}-jobs"
     Environment = var.environment
   }
-} 
\ No newline at end of file
+} 
+# Live stream URL (normalised) -> the job recording it. POST /jobs claims a URL
+# with a conditional put, so a duplicate request attaches to the running job
+resource "aws_dynamodb_table" "active_recordings" {
+  name         = "${var.environment}-active-recordings"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "urlKey"
+
+  attribute {
+    name = "urlKey"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "ttl"
+    enabled        = true
+  }
+
+  tags = {
+    Name        = "${var.environment}-active-recordings"
+    Environment = var.environment
+  }
+}
+
+# Job counts per status, per-day counters and totals, kept up to date from the
+# jobs table's stream by stats_stream; GET /stats reads a fixed set of items
+resource "aws_dynamodb_table" "job_stats" {
+  name         = "${var.environment}-job-stats"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "statKey"
+
+  attribute {
+    name = "statKey"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "${var.environment}-job-stats"
+    Environment = var.environment
+  }
+}
@@ -6,6 +6,9 @@ resource "aws_s3_bucket" "streams" {
     id      = "expire-old-objects"
     enabled = true
     expiration { days = 30 }
+
+    # Live recording uploads that were stopped (failed recordings) are never completed
+    abort_incomplete_multipart_upload_days = 2
   }
 }
 
@@ -53,20 +56,17 @@ resource "aws_ecs_task_definition" "recorder" {
           value = "30"
         },
         {
-          name  = "TRANSMISSION_TASK_DEF"
-          value = aws_ecs_task_definition.transmission.arn
-        },
-        {
-          name  = "ECS_CLUSTER"
-          value = aws_ecs_cluster.this.name
+          name  = "S3_UPLOAD_PART_SIZE"
+          value = "67108864"
         },
         {
-          name  = "SUBNET_IDS"
-          value = join(",", aws_public_subnet.public[*].id)
+          name  = "S3_UPLOAD_CONCURRENCY"
+          value = "8"
         },
         {
-          name  = "SECURITY_GROUP_IDS"
-          value = aws_security_group.ecs_tasks.id
+          # Web seed base URLs put in each torrent's url-list (BEP 19)
+          name  = "WEB_SEED_URLS"
+          value = join(",", var.web_seed_urls)
         }
       ]
 
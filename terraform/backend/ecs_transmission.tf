@@ -14,6 +14,37 @@ resource "aws_ecs_task_definition" "transmission" {
       image     = "${aws_ecr_repository.transmission.repository_url}:latest"
       essential = true
       
+      environment = [
+        {
+          name  = "S3_BUCKET"
+          value = aws_s3_bucket.streams.bucket
+        },
+        {
+          name  = "AWS_REGION"
+          value = var.aws_region
+        },
+        {
+          # New watch/ torrents are added over RPC as their S3 notifications arrive
+          name  = "WATCH_QUEUE_URL"
+          value = aws_sqs_queue.watch_torrents.id
+        },
+        {
+          name  = "SEEDER_POOL"
+          value = "true"
+        },
+        {
+          name  = "MAX_ACTIVE_TORRENTS"
+          value = tostring(var.seeder_max_torrents)
+        },
+        {
+          name  = "COLD_AFTER_HOURS"
+          value = "6"
+        }
+      ]
+      
+      # Time to hand the daemon's torrents back to the pool when the task is stopped
+      stopTimeout = 60
+      
       logConfiguration = {
         logDriver = "awslogs"
         options = {
@@ -89,6 +120,21 @@ resource "aws_ecs_task_definition" "transmission" {
   }
 }
 
+# Seeder pool: a few long-running daemons share all torrents instead of one task per recording
+resource "aws_ecs_service" "seeder_pool" {
+  name            = "${var.environment}-seeder-pool"
+  cluster         = aws_ecs_cluster.this.id
+  task_definition = aws_ecs_task_definition.transmission.arn
+  desired_count   = var.seeder_pool_size
+  launch_type     = "FARGATE"
+  
+  network_configuration {
+    subnets          = aws_public_subnet.public[*].id
+    security_groups  = [aws_security_group.ecs_tasks.id]
+    assign_public_ip = true
+  }
+}
+
 # ECR repository for the transmission container
 resource "aws_ecr_repository" "transmission" {
   name = "${var.environment}-transmission"
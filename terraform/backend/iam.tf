@@ -20,11 +20,15 @@ resource "aws_iam_role_policy_attachment" "ecs_exec_attach" {
   policy_arn = "arn:aws:iam::aws:policy/service-role/AmazonECSTaskExecutionRolePolicy"
 }
 
-# ECS Task Role (to allow s3:PutObject)
+# ECS Task Role (to allow s3:PutObject, including resumable multipart uploads)
 data "aws_iam_policy_document" "s3_put" {
   statement {
     effect = "Allow"
-    actions = ["s3:PutObject"]
+    actions = [
+      "s3:PutObject",
+      "s3:ListMultipartUploadParts",
+      "s3:AbortMultipartUpload"
+    ]
     resources = [
       "${aws_s3_bucket.streams.arn}/*"
     ]
@@ -63,6 +67,28 @@ resource "aws_iam_role_policy" "ecs_task_s3_read_watch" {
   policy = data.aws_iam_policy_document.s3_read_watch.json
 }
 
+# The transmission seeder consumes watch-folder notifications, and requeues
+# the torrents it evicts or hands back to the pool
+data "aws_iam_policy_document" "sqs_watch_torrents" {
+  statement {
+    effect = "Allow"
+    actions = [
+      "sqs:ReceiveMessage",
+      "sqs:DeleteMessage",
+      "sqs:GetQueueAttributes",
+      "sqs:SendMessage",
+      "sqs:ChangeMessageVisibility"
+    ]
+    resources = [aws_sqs_queue.watch_torrents.arn]
+  }
+}
+
+resource "aws_iam_role_policy" "ecs_task_sqs_watch_torrents" {
+  name   = "AllowWatchTorrentsQueue"
+  role   = aws_iam_role.ecs_task_role.id
+  policy = data.aws_iam_policy_document.sqs_watch_torrents.json
+}
+
 # Lambda Execution Role
 data "aws_iam_policy_document" "lambda_assume" {
   statement {
@@ -97,6 +123,13 @@ data "aws_iam_policy_document" "lambda_sqs" {
     ]
     resources = [ aws_sqs_queue.chronicle_jobs.arn ]
   }
+
+  # On-failure destination of the job stats stream mapping
+  statement {
+    effect    = "Allow"
+    actions   = ["sqs:SendMessage"]
+    resources = [ aws_sqs_queue.stats_stream_failures.arn ]
+  }
 }
 
 resource "aws_iam_role_policy" "lambda_sqs_policy" {
@@ -127,13 +160,39 @@ resource "aws_iam_role_policy" "lambda_ecs_policy" {
   policy = data.aws_iam_policy_document.lambda_ecs.json
 }
 
-# --- Lambda needs PutItem & UpdateItem on the jobs table ---
+# --- Lambda needs PutItem, UpdateItem & GetItem on the jobs table, Query on its indexes,
+# conditional writes on the active recordings index, and the job stats ---
 data "aws_iam_policy_document" "lambda_ddb" {
   statement {
     effect    = "Allow"
-    actions   = ["dynamodb:PutItem", "dynamodb:UpdateItem"]
+    actions   = ["dynamodb:PutItem", "dynamodb:UpdateItem", "dynamodb:GetItem"]
     resources = [ aws_dynamodb_table.jobs.arn ]
   }
+
+  statement {
+    effect    = "Allow"
+    actions   = ["dynamodb:PutItem", "dynamodb:GetItem", "dynamodb:DeleteItem"]
+    resources = [ aws_dynamodb_table.active_recordings.arn ]
+  }
+
+  # stats_stream reads the jobs table's stream and updates the aggregates; GET /stats reads them
+  statement {
+    effect    = "Allow"
+    actions   = ["dynamodb:DescribeStream", "dynamodb:GetRecords", "dynamodb:GetShardIterator", "dynamodb:ListStreams"]
+    resources = [ aws_dynamodb_table.jobs.stream_arn ]
+  }
+
+  statement {
+    effect    = "Allow"
+    actions   = ["dynamodb:UpdateItem", "dynamodb:BatchGetItem"]
+    resources = [ aws_dynamodb_table.job_stats.arn ]
+  }
+
+  statement {
+    effect    = "Allow"
+    actions   = ["dynamodb:Query"]
+    resources = [ "${aws_dynamodb_table.jobs.arn}/index/*" ]
+  }
 }
 
 resource "aws_iam_role_policy" "lambda_ddb_policy" {
@@ -157,24 +216,3 @@ resource "aws_iam_role_policy" "ecs_ddb_policy" {
   policy = data.aws_iam_policy_document.ecs_ddb.json
 }
 
-# --- ECS task needs to run other ECS tasks (for torrent seeding) ---
-data "aws_iam_policy_document" "ecs_runtask" {
-  statement {
-    effect = "Allow"
-    actions = [
-      "ecs:RunTask",
-      "iam:PassRole"
-    ]
-    resources = [
-      aws_ecs_task_definition.transmission.arn,
-      aws_iam_role.ecs_exec_role.arn,
-      aws_iam_role.ecs_task_role.arn
-    ]
-  }
-}
-
-resource "aws_iam_role_policy" "ecs_runtask_policy" {
-  name   = "EcsTaskRunTaskAccess"
-  role   = aws_iam_role.ecs_task_role.id
-  policy = data.aws_iam_policy_document.ecs_runtask.json
-}
@@ -1,8 +1,47 @@
 # Package the Lambda dispatcher
 data "archive_file" "lambda_dispatch" {
   type        = "zip"
-  source_file = "${path.module}/lambda/dispatch_to_ecs.py"
   output_path = "${path.module}/lambda/dispatch_to_ecs.zip"
+
+  source {
+    content  = file("${path.module}/lambda/dispatch_to_ecs.py")
+    filename = "dispatch_to_ecs.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/job_queries.py")
+    filename = "job_queries.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/job_state.py")
+    filename = "job_state.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/clients.py")
+    filename = "clients.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/s3_uploader.py")
+    filename = "s3_uploader.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/message_groups.py")
+    filename = "message_groups.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/active_recordings.py")
+    filename = "active_recordings.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/job_stats.py")
+    filename = "job_stats.py"
+  }
 }
 
 # Lambda function
@@ -20,11 +59,24 @@ resource "aws_lambda_function" "dispatch" {
       # ECS & S3 settings
       ECS_CLUSTER        = aws_ecs_cluster.this.name
       ECS_TASK_DEF       = aws_ecs_task_definition.recorder.arn
-      TRANSMISSION_TASK_DEF = aws_ecs_task_definition.transmission.arn
       S3_BUCKET          = aws_s3_bucket.streams.bucket
       CONTAINER_NAME     = var.container_name
       DDB_TABLE          = aws_dynamodb_table.jobs.name
 
+      # POST /jobs for a URL already being recorded attaches to that job
+      ACTIVE_RECORDINGS_TABLE = aws_dynamodb_table.active_recordings.name
+      # GET /stats reads the aggregates kept by stats_stream
+      STATS_TABLE             = aws_dynamodb_table.job_stats.name
+
+      # Return once the recorder is launched; recorder_events records completion
+      DISPATCH_MODE      = "async"
+      # Message groups of one SQS batch dispatched concurrently
+      DISPATCH_WORKERS   = "10"
+
+      # FIFO message groups new jobs are spread over (groups are dispatched in parallel)
+      MESSAGE_GROUP_SHARDS = tostring(var.message_group_shards)
+      MESSAGE_GROUP_KEY    = var.message_group_key
+
       # VPC networking for Fargate
       SUBNET_IDS         = join(",", aws_public_subnet.public[*].id)
       SECURITY_GROUP_IDS = aws_security_group.ecs_tasks.id
@@ -34,8 +86,147 @@ resource "aws_lambda_function" "dispatch" {
 
 # Event source mapping from FIFO SQS → this Lambda
 resource "aws_lambda_event_source_mapping" "sqs_dispatch" {
-  event_source_arn = aws_sqs_queue.chronicle_jobs.arn
-  function_name    = aws_lambda_function.dispatch.arn
-  batch_size       = 1
-  enabled          = true
+  event_source_arn        = aws_sqs_queue.chronicle_jobs.arn
+  function_name           = aws_lambda_function.dispatch.arn
+  # Message groups are dispatched concurrently, each in order; a failed record and
+  # the later records of its group are returned to the queue
+  batch_size              = 10
+  function_response_types = ["ReportBatchItemFailures"]
+  enabled                 = true
+}
+
+# Package the recorder completion handler
+data "archive_file" "lambda_recorder_events" {
+  type        = "zip"
+  output_path = "${path.module}/lambda/recorder_events.zip"
+
+  source {
+    content  = file("${path.module}/lambda/recorder_events.py")
+    filename = "recorder_events.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/job_state.py")
+    filename = "job_state.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/active_recordings.py")
+    filename = "active_recordings.py"
+  }
+}
+
+# Records recorder exits so the dispatcher can return as soon as a task is launched
+resource "aws_lambda_function" "recorder_events" {
+  function_name    = "${var.environment}-recorder-events"
+  filename         = data.archive_file.lambda_recorder_events.output_path
+  source_code_hash = data.archive_file.lambda_recorder_events.output_base64sha256
+  handler          = "recorder_events.lambda_handler"
+  runtime          = "python3.9"
+  role             = aws_iam_role.lambda_exec_role.arn
+  timeout          = 30
+
+  environment {
+    variables = {
+      DDB_TABLE      = aws_dynamodb_table.jobs.name
+      CONTAINER_NAME = var.container_name
+      # The finished job's URL claim is released here
+      ACTIVE_RECORDINGS_TABLE = aws_dynamodb_table.active_recordings.name
+    }
+  }
+}
+
+# ECS task state changes for stopped recorder tasks → recorder_events
+resource "aws_cloudwatch_event_rule" "recorder_task_stopped" {
+  name        = "${var.environment}-recorder-task-stopped"
+  description = "Recorder Fargate task stopped"
+
+  event_pattern = jsonencode({
+    source        = ["aws.ecs"]
+    "detail-type" = ["ECS Task State Change"]
+    detail = {
+      clusterArn = [aws_ecs_cluster.this.arn]
+      group      = ["family:${var.task_family}"]
+      lastStatus = ["STOPPED"]
+    }
+  })
+}
+
+resource "aws_cloudwatch_event_target" "recorder_task_stopped" {
+  rule = aws_cloudwatch_event_rule.recorder_task_stopped.name
+  arn  = aws_lambda_function.recorder_events.arn
+}
+
+resource "aws_lambda_permission" "allow_recorder_events" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.recorder_events.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.recorder_task_stopped.arn
+}
+
+# Package the job stats stream processor
+data "archive_file" "lambda_stats_stream" {
+  type        = "zip"
+  output_path = "${path.module}/lambda/stats_stream.zip"
+
+  source {
+    content  = file("${path.module}/lambda/stats_stream.py")
+    filename = "stats_stream.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/job_stats.py")
+    filename = "job_stats.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/job_state.py")
+    filename = "job_state.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/clients.py")
+    filename = "clients.py"
+  }
+}
+
+# Keeps the job stats aggregates up to date from the jobs table's stream
+resource "aws_lambda_function" "stats_stream" {
+  function_name    = "${var.environment}-job-stats-stream"
+  filename         = data.archive_file.lambda_stats_stream.output_path
+  source_code_hash = data.archive_file.lambda_stats_stream.output_base64sha256
+  handler          = "stats_stream.lambda_handler"
+  runtime          = "python3.9"
+  role             = aws_iam_role.lambda_exec_role.arn
+  timeout          = 30
+
+  environment {
+    variables = {
+      STATS_TABLE = aws_dynamodb_table.job_stats.name
+    }
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "stats_stream" {
+  event_source_arn  = aws_dynamodb_table.jobs.stream_arn
+  function_name     = aws_lambda_function.stats_stream.arn
+  # Jobs that existed before are counted once with `python3 job_stats.py`
+  starting_position = "LATEST"
+  # Progress writes arrive every few seconds per job; batching them turns a
+  # burst into one update per stats item
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 10
+  enabled                            = true
+
+  # A record that keeps failing must not stall its shard: split the batch to
+  # isolate it, then skip it and leave a pointer to it on the failures queue
+  bisect_batch_on_function_error = true
+  maximum_retry_attempts         = 5
+
+  destination_config {
+    on_failure {
+      destination_arn = aws_sqs_queue.stats_stream_failures.arn
+    }
+  }
 }
@@ -0,0 +1,119 @@
+import os
+import time
+import logging
+import urllib.parse
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# A job owns its URL while it may still be downloading the stream; once it
+# is past RECORDING (or final) a new request for the URL starts a new job
+ACTIVE_STATUSES = ("PENDING", "STARTED", "DOWNLOADING", "RECORDING")
+
+# An entry whose job record does not exist yet is trusted for this long
+# (the record is written right after the claim)
+CLAIM_GRACE_SECONDS = 300
+
+# Entries expire through the table's TTL even if nothing replaces them
+ENTRY_TTL_SECONDS = int(os.environ.get("ACTIVE_RECORDING_TTL_SECONDS", str(2 * 86400)))
+
+# Query parameters that do not change which stream a URL points at
+IGNORED_PARAMS = ("si", "feature", "t", "pp", "ab_channel", "app")
+
+# Sites whose channel paths are case-insensitive
+CASE_INSENSITIVE_HOSTS = ("twitch.tv", "kick.com")
+
+# Attempts at claiming a URL whose entry changes under us
+CLAIM_ATTEMPTS = 3
+
+
+def normalize_url(url):
+    """Key identifying the stream a URL points at.
+
+    Scheme, www./m. prefixes, trailing slashes, fragments, tracking
+    parameters and parameter order are ignored (and the path's case on
+    CASE_INSENSITIVE_HOSTS), and YouTube's short (youtu.be/ID) and
+    /live/ID forms become watch?v=ID.
+    """
+    parsed = urllib.parse.urlsplit(url.strip())
+    host = (parsed.hostname or "").lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = parsed.path.rstrip("/")
+    if host in CASE_INSENSITIVE_HOSTS:
+        path = path.lower()
+    params = [(k, v) for k, v in urllib.parse.parse_qsl(parsed.query)
+              if k not in IGNORED_PARAMS and not k.startswith("utm_")]
+
+    segments = [s for s in path.split("/") if s]
+    if host == "youtu.be" and segments:
+        host, path, params = "youtube.com", "/watch", [("v", segments[0])] + params
+    elif host == "youtube.com" and len(segments) == 2 and segments[0] == "live":
+        path, params = "/watch", [("v", segments[1])] + params
+    if host == "youtube.com" and path == "/watch":
+        # Only the video ID selects the stream (list=, index= etc. do not)
+        params = [(k, v) for k, v in params if k == "v"][:1]
+
+    query = urllib.parse.urlencode(sorted(params))
+    return f"{host}{path}" + (f"?{query}" if query else "")
+
+
+def _live(jobs_table, entry):
+    """True if the job holding entry may still be recording its URL"""
+    item = jobs_table.get_item(
+        Key={"jobId": entry["jobId"]},
+        ProjectionExpression="#st",
+        ExpressionAttributeNames={"#st": "status"},
+        ConsistentRead=True,
+    ).get("Item")
+    if item is None:
+        return time.time() - int(entry.get("claimedAt", 0)) < CLAIM_GRACE_SECONDS
+    return item.get("status") in ACTIVE_STATUSES
+
+
+def claim(index_table, jobs_table, url, job_id):
+    """Make job_id the in-flight recording of url, unless another job already is.
+
+    Returns the ID of the job recording the URL: job_id if the claim
+    succeeded, otherwise the job this request should attach to. Every write
+    is conditional, so of two concurrent requests exactly one wins.
+    """
+    url_key = normalize_url(url)
+    now = int(time.time())
+    item = {"urlKey": url_key, "jobId": job_id, "url": url, "claimedAt": now, "ttl": now + ENTRY_TTL_SECONDS}
+    for _ in range(CLAIM_ATTEMPTS):
+        try:
+            index_table.put_item(Item=item, ConditionExpression="attribute_not_exists(urlKey)")
+            return job_id
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        entry = index_table.get_item(Key={"urlKey": url_key}, ConsistentRead=True).get("Item")
+        if entry is None:
+            # Released between our put and get; try again
+            continue
+        if entry["jobId"] == job_id or _live(jobs_table, entry):
+            return entry["jobId"]
+        # The entry's job has finished recording: take the URL over, unless
+        # another request got there first
+        try:
+            index_table.put_item(Item=item, ConditionExpression="jobId = :old",
+                                 ExpressionAttributeValues={":old": entry["jobId"]})
+            logger.info(f"{url_key}: job {entry['jobId']} is no longer recording, claimed by {job_id}")
+            return job_id
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    raise RuntimeError(f"Could not claim {url_key}: the active recording kept changing")
+
+
+def release(index_table, url, job_id):
+    """Give up job_id's claim on url (e.g. when its job could not be queued)"""
+    try:
+        index_table.delete_item(Key={"urlKey": normalize_url(url)}, ConditionExpression="jobId = :job",
+                                ExpressionAttributeValues={":job": job_id})
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
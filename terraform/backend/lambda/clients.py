@@ -0,0 +1,101 @@
+import os
+import time
+import logging
+import threading
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+# One config for every client: enough pooled connections for the dispatch
+# workers, kept-alive sockets between warm invocations, and adaptive retries
+# that back off on throttling instead of failing the record
+CONFIG = Config(
+    region_name=os.environ.get("AWS_REGION"),
+    max_pool_connections=int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "50")),
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=60,
+    retries={"max_attempts": 5, "mode": "adaptive"},
+)
+
+# Seconds a Docker connection is trusted before it is pinged again
+DOCKER_HEALTH_INTERVAL = 30
+
+_lock = threading.Lock()
+_clients = {}
+_thread = threading.local()
+_docker = None
+_docker_checked_at = 0.0
+
+
+def client(service):
+    """boto3 client for service, created on first use and reused for the life of the container"""
+    found = _clients.get(service)
+    if found is None:
+        with _lock:
+            found = _clients.get(service)
+            if found is None:
+                found = boto3.client(service, config=CONFIG, endpoint_url=os.environ.get("AWS_ENDPOINT_URL"))
+                _clients[service] = found
+    return found
+
+
+def table(name):
+    """DynamoDB Table for the calling thread.
+
+    Clients are thread safe but resources are not, so each thread keeps its
+    own resource; threads of a reused pool keep theirs across invocations.
+    """
+    tables = getattr(_thread, "tables", None)
+    if tables is None:
+        tables = _thread.tables = {}
+    if name not in tables:
+        resource = boto3.session.Session().resource(
+            "dynamodb", config=CONFIG, endpoint_url=os.environ.get("AWS_ENDPOINT_URL")
+        )
+        tables[name] = resource.Table(name)
+    return tables[name]
+
+
+def _connect_docker():
+    import docker
+    logger.info("Starting Docker client with HTTP connection")
+
+    # Always try Docker gateway IP first, which is more reliable in container environments
+    gateway_ip = "172.17.0.1"
+    docker_host = os.environ.get("DOCKER_HOST", f"tcp://{gateway_ip}:2375")
+
+    try:
+        logger.info(f"Connecting to Docker via gateway IP: {gateway_ip}")
+        connection = docker.DockerClient(base_url=f"tcp://{gateway_ip}:2375")
+        connection.ping()  # Test connection
+    except Exception as e:
+        logger.warning(f"Could not connect to Docker via gateway IP: {e}")
+        # Try the configured DOCKER_HOST as fallback
+        logger.info(f"Trying to connect to Docker via DOCKER_HOST: {docker_host}")
+        connection = docker.DockerClient(base_url=docker_host)
+    return connection
+
+
+def docker_client():
+    """Cached Docker client for local recorder containers.
+
+    The connection is pinged at most every DOCKER_HEALTH_INTERVAL seconds and
+    rebuilt (gateway IP first, then DOCKER_HOST) when the ping fails.
+    """
+    global _docker, _docker_checked_at
+    with _lock:
+        now = time.monotonic()
+        if _docker is not None and now - _docker_checked_at >= DOCKER_HEALTH_INTERVAL:
+            try:
+                _docker.ping()
+                _docker_checked_at = now
+            except Exception as e:
+                logger.warning(f"Cached Docker connection failed its health check: {e}")
+                _docker = None
+        if _docker is None:
+            _docker = _connect_docker()
+            _docker_checked_at = now
+        return _docker
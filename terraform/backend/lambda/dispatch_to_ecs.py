@@ -3,7 +3,15 @@ import json
 import logging
 import time
 import datetime
-import boto3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import clients
+import job_state
+import job_queries
+import job_stats
+import active_recordings
+import message_groups
+import s3_uploader
 
 # Configure root logger
 logger = logging.getLogger()
@@ -15,267 +23,441 @@ formatter = logging.Formatter(
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
-# Initialize AWS clients
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=os.environ.get("AWS_REGION")
-)
-table = dynamodb.Table(os.environ["DDB_TABLE"])
-s3 = boto3.client(
-    "s3",
-    region_name=os.environ.get("AWS_REGION")
-)
-
+ddb_table      = os.environ["DDB_TABLE"]
 ecs_cluster    = os.environ.get("ECS_CLUSTER")
 ecs_task_def   = os.environ.get("ECS_TASK_DEF")
 container_name = os.environ.get("CONTAINER_NAME")
 s3_bucket      = os.environ.get("S3_BUCKET")
 ttl_days       = int(os.environ.get("TTL_DAYS", "30"))
+# "async" returns as soon as the recorder is launched and leaves completion to
+# recorder_events (ECS task state changes / local Docker events);
+# "wait" blocks until the recorder exits, as the dispatcher originally did
+dispatch_mode  = os.environ.get("DISPATCH_MODE", "async")
+# SQS records dispatched concurrently per invocation
+dispatch_workers = int(os.environ.get("DISPATCH_WORKERS", "10"))
+# URL -> job currently recording it; unset turns off coalescing of duplicate requests
+active_recordings_table = os.environ.get("ACTIVE_RECORDINGS_TABLE")
+# Aggregates maintained by stats_stream from the jobs table's stream
+stats_table = os.environ.get("STATS_TABLE")
 
+# Label used to find local recorder containers from Docker events
+JOB_LABEL = "chronicle.jobId"
 
-def lambda_handler(event, context):
-    # Check if event is from API Gateway
-    if event.get('httpMethod'):
-        return handle_api_request(event, context)
-    # Otherwise handle SQS event as before
-    
-    # startup log
-    logger.info("START handler; event: %s", json.dumps(event))
-    logger.info("ENDPOINT_URL: %s", os.environ.get("AWS_ENDPOINT_URL"))
+# Worker threads (and the per-thread DynamoDB resources they hold) are kept
+# for the life of the container instead of being rebuilt on every invocation
+_pool = None
+
+
+def worker_pool():
+    """Thread pool that dispatches the records of an SQS batch"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=max(1, dispatch_workers))
+    return _pool
+
+
+def start_local_recorder(job_id, url, filename, s3_key):
+    """Launch the recorder as a detached local Docker container"""
+    client = clients.docker_client()
+
+    logger.info("Starting local container for job %s", job_id)
+    # make sure /downloads exists on the host (or bind a tmpdir of your choice)
+    LOCAL_DOWNLOADS_DIR="/tmp/downloads"
+    os.makedirs(LOCAL_DOWNLOADS_DIR, exist_ok=True)
+    return client.containers.run(
+        image=container_name,
+        command=[url, filename],
+        network="chronicle-network",
+        labels={JOB_LABEL: job_id},
+        volumes={
+            # mount a downloads dir so /downloads inside the container works
+            f"{LOCAL_DOWNLOADS_DIR}": {
+                "bind": "/downloads",
+                "mode": "rw"
+            },
+            # Mount the shared volume for transmission seeding
+            "chronicle_downloads": {
+                "bind": "/var/downloads",
+                "mode": "rw"
+            },
+        },
+        environment={
+            "JOB_ID":       job_id,
+            "DDB_TABLE":    ddb_table,
+            "S3_BUCKET":    s3_bucket,
+            "S3_KEY":       s3_key,
+            "TTL_DAYS":     str(ttl_days),
+            # Make sure we use localstack's container name inside the container network
+            "AWS_ENDPOINT_URL": "http://chronicle-localstack:4566",
+            "AWS_REGION": "us-west-1",
+            "AWS_ACCESS_KEY_ID": "test",
+            "AWS_SECRET_ACCESS_KEY": "test",
+        },
+        detach=True,
+    )
 
-    # test Docker SDK import
+
+def start_ecs_recorder(ecs, job_id, url, filename, s3_key):
+    """Launch the recorder as a Fargate task and return its task ARN"""
+    logger.info("Dispatching ECS run_task for job %s", job_id)
+    resp = ecs.run_task(
+        cluster=ecs_cluster,
+        launchType="FARGATE",
+        taskDefinition=ecs_task_def,
+        startedBy="chronicle-dispatch",
+        overrides={
+            "containerOverrides": [{
+                "name":        container_name,
+                "command":     [url, filename],
+                "environment": [
+                    # recorder_events reads JOB_ID back from the task state change event
+                    {"name": "JOB_ID",    "value": job_id},
+                    {"name": "S3_BUCKET", "value": s3_bucket},
+                    {"name": "S3_KEY",    "value": s3_key},
+                ],
+            }]
+        },
+        networkConfiguration={
+            "awsvpcConfiguration": {
+                "subnets":        os.environ.get("SUBNET_IDS", "").split(","),
+                "securityGroups": os.environ.get("SECURITY_GROUP_IDS", "").split(","),
+                "assignPublicIp": "ENABLED",
+            }
+        },
+    )
+    failures = resp.get("failures", [])
+    if failures:
+        raise RuntimeError("ECS run_task failures: %s" % failures)
+    return resp["tasks"][0]["taskArn"]
+
+
+def record_dispatch(job, attribute, value):
+    """Store the container ID / task ARN so completion events can be matched to the job"""
+    # Attribute-only, so it cannot undo a status the recorder has already written.
+    # The recorder is running by now: failing the job here would let a
+    # redelivery launch a second one, and completion is matched on the job ID
+    # (task overrides / container label) either way
     try:
-        import docker    # noqa: F401
-        logger.info("Docker SDK import succeeded")
+        job.update({attribute: value, "dispatchedAt": int(time.time())}, flush=True)
     except Exception as e:
-        logger.error("Docker SDK import failed: %s", e, exc_info=True)
-        # re-raise if you want the Lambda to fail here:
-        raise
+        logger.error("Job %s: could not store %s %s: %s", job.job_id, attribute, value, e)
 
-    for record in event.get("Records", []):
-        try:
-            body = json.loads(record["body"])
-            job_id   = body["jobId"]
-            url      = body["url"]
-            filename = body["filename"]
-            s3_key   = body["s3Key"]
-            logger.info(
-                "Processing job %s: url=%s, filename=%s, s3Key=%s",
-                job_id, url, filename, s3_key
-            )
-        except (KeyError, json.JSONDecodeError) as e:
-            logger.error("Malformed SQS record: %s", e, exc_info=True)
-            continue
-
-        # Write initial status to DynamoDB
-        now = int(time.time())
-        table.put_item(Item={
-            "jobId":     job_id,
+
+def release_recording(url, job_id):
+    """Drop the job's claim on url once it has a final status; a failure is only logged"""
+    if not active_recordings_table:
+        return
+    try:
+        active_recordings.release(clients.table(active_recordings_table), url, job_id)
+    except Exception as e:
+        logger.error("Job %s: could not release its active recording: %s", job_id, e)
+
+
+def dispatch_record(record, ecs=None):
+    """Dispatch the job in one SQS record; raises if the job failed so the message is retried"""
+    try:
+        body = json.loads(record["body"])
+        job_id   = body["jobId"]
+        url      = body["url"]
+        filename = body["filename"]
+        s3_key   = body["s3Key"]
+        logger.info(
+            "Processing job %s: url=%s, filename=%s, s3Key=%s",
+            job_id, url, filename, s3_key
+        )
+    except (KeyError, json.JSONDecodeError) as e:
+        logger.error("Malformed SQS record: %s", e, exc_info=True)
+        return
+
+    # Claim the job for this dispatch. STARTED is only accepted from PENDING,
+    # FAILED or no record, so a redelivered message for a job whose recorder
+    # was already launched (visibility timeout, retry) is dropped
+    now = int(time.time())
+    job = job_state.JobState(clients.table(ddb_table), job_id)
+    if not job.transition(
+        "STARTED",
+        {
             "url":       url,
             "filename":  filename,
             "s3Key":     s3_key,
-            "status":    "STARTED",
-            "createdAt": now,
             "startedAt": now,
             "ttl":       now + ttl_days * 86400,
-        })
+        },
+        set_once={"createdAt": now},
+        flush=True,
+    ):
+        logger.info("Job %s has already been dispatched, not dispatching it again", job_id)
+        return
 
-        try:
-            endpoint = os.environ.get("AWS_ENDPOINT_URL")
-            if endpoint:
-                # local Docker path - use Docker over HTTP instead of Unix socket
-                import docker
-                logger.info("Starting Docker client with HTTP connection")
-                
-                # Always try Docker gateway IP first, which is more reliable in container environments
-                gateway_ip = "172.17.0.1"
-                docker_host = os.environ.get("DOCKER_HOST", f"tcp://{gateway_ip}:2375")
-                
-                try:
-                    logger.info(f"Connecting to Docker via gateway IP: {gateway_ip}")
-                    client = docker.DockerClient(base_url=f"tcp://{gateway_ip}:2375")
-                    client.ping()  # Test connection
-                except Exception as e:
-                    logger.warning(f"Could not connect to Docker via gateway IP: {e}")
-                    # Try the configured DOCKER_HOST as fallback
-                    logger.info(f"Trying to connect to Docker via DOCKER_HOST: {docker_host}")
-                    client = docker.DockerClient(base_url=docker_host)
+    try:
+        endpoint = os.environ.get("AWS_ENDPOINT_URL")
+        if endpoint:
+            # local Docker path - use Docker over HTTP instead of Unix socket
+            container = start_local_recorder(job_id, url, filename, s3_key)
+            record_dispatch(job, "containerId", container.id)
+
+            if dispatch_mode != "wait":
+                logger.info("Job %s dispatched to container %s", job_id, container.id)
+                return
+
+            result = container.wait()
+            exit_code = result.get("StatusCode", -1)
+
+            logs = container.logs(stdout=True, stderr=True).decode("utf-8", errors="replace")
+            logger.info("=== chronicle-recorder container logs start ===\n%s\n=== chronicle-recorder container logs end ===", logs)
+
+
+            if exit_code != 0:
+                raise RuntimeError("Local container exited with code %d" % exit_code)
                 
-                logger.info("Starting local container for job %s", job_id)
-                # make sure /downloads exists on the host (or bind a tmpdir of your choice)
-                LOCAL_DOWNLOADS_DIR="/tmp/downloads"
-                os.makedirs(LOCAL_DOWNLOADS_DIR, exist_ok=True)
-                container = client.containers.run(
-                    image=container_name,
-                    command=[url, filename],
-                    network="chronicle-network",
-                    volumes={
-                        # mount a downloads dir so /downloads inside the container works
-                        f"{LOCAL_DOWNLOADS_DIR}": {
-                            "bind": "/downloads",
-                            "mode": "rw"
-                        },
-                        # Mount the shared volume for transmission seeding
-                        "chronicle_downloads": {
-                            "bind": "/var/downloads",
-                            "mode": "rw"
-                        },
-                    },
-                    environment={
-                        "JOB_ID":       job_id,
-                        "DDB_TABLE":    os.environ["DDB_TABLE"],
-                        "S3_BUCKET":    s3_bucket,
-                        "S3_KEY":       s3_key,
-                        "TTL_DAYS":     str(ttl_days),
-                        # Make sure we use localstack's container name inside the container network
-                        "AWS_ENDPOINT_URL": "http://chronicle-localstack:4566",
-                        "AWS_REGION": "us-west-1",
-                        "AWS_ACCESS_KEY_ID": "test",
-                        "AWS_SECRET_ACCESS_KEY": "test",
-                    },
-                    detach=True,
-                )
+            # Explicitly update job status to COMPLETED regardless of what the container tried to do
+            logger.info("Container completed successfully, ensuring job status is COMPLETED")
+            try:
+                job.transition("COMPLETED", {
+                    "finishedAt": datetime.datetime.now().isoformat() + "Z",
+                    "torrentFile": f"watch/{filename}.torrent",
+                })
+                logger.info("Successfully updated job status to COMPLETED in Lambda")
+            except Exception as e:
+                logger.error("Failed to update job status to COMPLETED: %s", e)
                 
-                result = container.wait()
-                exit_code = result.get("StatusCode", -1)
-
-                logs = container.logs(stdout=True, stderr=True).decode("utf-8", errors="replace")
-                logger.info("=== chronicle-recorder container logs start ===\n%s\n=== chronicle-recorder container logs end ===", logs)
-
-
-                if exit_code != 0:
-                    raise RuntimeError("Local container exited with code %d" % exit_code)
-                    
-                # Explicitly update job status to COMPLETED regardless of what the container tried to do
-                logger.info("Container completed successfully, ensuring job status is COMPLETED")
-                try:
-                    table.update_item(
-                        Key={"jobId": job_id},
-                        UpdateExpression="SET #st = :s, finishedAt = :ft, torrentFile = :tf",
-                        ExpressionAttributeNames={"#st": "status"},
-                        ExpressionAttributeValues={
-                            ":s": "COMPLETED",
-                            ":ft": datetime.datetime.now().isoformat() + "Z",
-                            ":tf": f"watch/{filename}.torrent"
-                        },
-                    )
-                    logger.info("Successfully updated job status to COMPLETED in Lambda")
-                except Exception as e:
-                    logger.error("Failed to update job status to COMPLETED: %s", e)
-                    
-            else:
-                # ECS / Fargate path
-                ecs = boto3.client("ecs")
-                logger.info("Dispatching ECS run_task for job %s", job_id)
-                resp = ecs.run_task(
-                    cluster=ecs_cluster,
-                    launchType="FARGATE",
-                    taskDefinition=ecs_task_def,
-                    overrides={
-                        "containerOverrides": [{
-                            "name":        container_name,
-                            "command":     [url, filename],
-                            "environment": [
-                                {"name": "S3_BUCKET", "value": s3_bucket},
-                                {"name": "S3_KEY",    "value": s3_key},
-                            ],
-                        }]
-                    },
-                    networkConfiguration={
-                        "awsvpcConfiguration": {
-                            "subnets":        os.environ.get("SUBNET_IDS", "").split(","),
-                            "securityGroups": os.environ.get("SECURITY_GROUP_IDS", "").split(","),
-                            "assignPublicIp": "ENABLED",
-                        }
-                    },
-                )
-                failures = resp.get("failures", [])
-                if failures:
-                    raise RuntimeError("ECS run_task failures: %s" % failures)
-
-                task_arn = resp["tasks"][0]["taskArn"]
-                waiter = ecs.get_waiter("tasks_stopped")
-                waiter.wait(cluster=ecs_cluster, tasks=[task_arn])
-                desc = ecs.describe_tasks(cluster=ecs_cluster, tasks=[task_arn])
-                exit_code = desc["tasks"][0]["containers"][0].get("exitCode", -1)
-                if exit_code != 0:
-                    raise RuntimeError("ECS task exited with code %d" % exit_code)
-
-            # fetch output and upload to S3, if any
-            local_path = "/tmp/%s" % filename
-            if os.path.exists(local_path):
-                s3.upload_file(local_path, s3_bucket, s3_key)
-                os.remove(local_path)
-
-            # mark success
-            table.update_item(
-                Key={"jobId": job_id},
-                UpdateExpression="SET #st = :s, #ttl = :t",
-                ExpressionAttributeNames={
-                    "#st": "status",
-                    "#ttl": "ttl"
-                },
-                ExpressionAttributeValues={
-                    ":s": "COMPLETED",
-                    ":t": datetime.datetime.now().isoformat() + "Z"
-                },
-            )
+        else:
+            # ECS / Fargate path
+            task_arn = start_ecs_recorder(ecs, job_id, url, filename, s3_key)
+            record_dispatch(job, "taskArn", task_arn)
 
-            logger.info("Job %s completed successfully", job_id)
+            if dispatch_mode != "wait":
+                logger.info("Job %s dispatched to task %s", job_id, task_arn)
+                return
 
-        except Exception as e:
-            logger.exception("Job %s failed", job_id)
-            table.update_item(
-                Key={"jobId": job_id},
-                UpdateExpression="SET #st = :s, #err = :e",
-                ExpressionAttributeNames={"#st": "status", "#err": "error"},
-                ExpressionAttributeValues={
-                    ":s": "FAILED",
-                    ":e": str(e)
-                },
-            )
-            # bubble up so SQS can DLQ
-            raise
+            waiter = ecs.get_waiter("tasks_stopped")
+            waiter.wait(cluster=ecs_cluster, tasks=[task_arn])
+            desc = ecs.describe_tasks(cluster=ecs_cluster, tasks=[task_arn])
+            exit_code = desc["tasks"][0]["containers"][0].get("exitCode", -1)
+            if exit_code != 0:
+                raise RuntimeError("ECS task exited with code %d" % exit_code)
+
+        # fetch output and upload to S3, if any
+        local_path = "/tmp/%s" % filename
+        if os.path.exists(local_path):
+            s3_uploader.upload_file(clients.client("s3"), local_path, s3_bucket, s3_key,
+                                    checkpoint_path=local_path + ".upload")
+            os.remove(local_path)
+
+        # mark success (skipped if the job is already COMPLETED)
+        job.transition("COMPLETED")
+        release_recording(url, job_id)
+
+        logger.info("Job %s completed successfully", job_id)
+
+    except Exception as e:
+        logger.exception("Job %s failed", job_id)
+        job.transition("FAILED", {"error": str(e)})
+        release_recording(url, job_id)
+        # bubble up so only this message is retried (and eventually DLQ'd)
+        raise
+
+
+def dispatch_group(records, ecs=None):
+    """Dispatch the records of one message group in order.
+
+    Returns the records that were not dispatched: the first one that failed
+    and every later one, so the group is retried from where it stopped and
+    its messages are never dispatched out of order.
+    """
+    for i, record in enumerate(records):
+        try:
+            dispatch_record(record, ecs)
+        except Exception:
+            if i + 1 < len(records):
+                logger.warning("Message %s failed, returning %d later message(s) of its group to the queue",
+                               record["messageId"], len(records) - i - 1)
+            return records[i:]
+    return []
+
+
+def message_group(record):
+    """FIFO message group of an SQS record (each record is its own group on a standard queue)"""
+    return record.get("attributes", {}).get("MessageGroupId") or record["messageId"]
+
+
+def lambda_handler(event, context):
+    # Check if event is from API Gateway
+    if event.get('httpMethod'):
+        return handle_api_request(event, context)
+    # Otherwise handle SQS event as before
+    
+    # startup log
+    logger.info("START handler; event: %s", json.dumps(event))
+    logger.info("ENDPOINT_URL: %s", os.environ.get("AWS_ENDPOINT_URL"))
 
-    return {"status": "processed"}
+    # The docker SDK is only imported (by clients.docker_client) on the local path
+
+    records = event.get("Records", [])
+    # boto3 clients are thread safe, so one warm ECS client serves every worker
+    ecs = None if os.environ.get("AWS_ENDPOINT_URL") else clients.client("ecs")
+
+    # Message groups are dispatched in parallel, each group's records in order
+    # on one worker (SQS delivers a group's records in order within the batch)
+    groups = {}
+    for record in records:
+        groups.setdefault(message_group(record), []).append(record)
+
+    # Report only the messages not dispatched so the ones already dispatched are not retried
+    failures = []
+    futures = [worker_pool().submit(dispatch_group, group, ecs) for group in groups.values()]
+    for future in as_completed(futures):
+        failures.extend({"itemIdentifier": record["messageId"]} for record in future.result())
+
+    logger.info("Dispatched %d of %d records", len(records) - len(failures), len(records))
+    return {"batchItemFailures": failures}
 
 
 def handle_api_request(event, context):
     http_method = event['httpMethod']
     path = event.get('path', '')
     
-    # GET /jobs - List all jobs
+    # GET /jobs - One page of jobs, newest first, or the jobs changed since a watermark
+    # Query params: status (comma-separated), since (epoch seconds), limit, cursor
+    #               changedSince (epoch seconds, from the previous response's changedSince)
     if http_method == 'GET' and path == '/jobs':
-        # Query DynamoDB for all jobs
-        result = table.scan()
+        params = event.get('queryStringParameters') or {}
+        try:
+            statuses = [s for s in params.get('status', '').split(',') if s]
+            if params.get('changedSince') is not None:
+                items, watermark = job_queries.changed_jobs(
+                    clients.table(ddb_table),
+                    since=params['changedSince'],
+                    statuses=statuses,
+                )
+                body = {'items': items, 'changedSince': watermark}
+            else:
+                items, next_cursor = job_queries.list_jobs(
+                    clients.table(ddb_table),
+                    statuses=statuses,
+                    since=params.get('since'),
+                    limit=params.get('limit', job_queries.DEFAULT_LIMIT),
+                    cursor=params.get('cursor'),
+                )
+                body = {
+                    'items': items,
+                    'nextCursor': next_cursor,
+                    'changedSince': job_queries.feed_watermark(),
+                }
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'error': str(e)})
+            }
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps(result.get('Items', []))
+            'body': json.dumps(body, default=job_queries.json_default)
         }
     
+    # GET /stats - Jobs per status, totals and per-day counters for the last `days` days,
+    # read from a fixed number of aggregate items instead of scanning the jobs table
+    if http_method == 'GET' and path == '/stats':
+        if not stats_table:
+            return {
+                'statusCode': 503,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'error': 'Job statistics are not enabled (STATS_TABLE is not set)'})
+            }
+        params = event.get('queryStringParameters') or {}
+        try:
+            stats = job_stats.read_stats(clients.client('dynamodb'), stats_table,
+                                         days=params.get('days', job_stats.DEFAULT_DAYS))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'error': str(e)})
+            }
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps(stats)
+        }
+
     # POST /jobs - Create new job
     if http_method == 'POST' and path == '/jobs':
-        body = json.loads(event['body'])
-        job_id = body.get('jobId')
-        url = body.get('url')
-        filename = body.get('filename')
-        
+        try:
+            body = json.loads(event.get('body') or '{}')
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'error': 'The request body must be a JSON object'})
+            }
+        missing = [field for field in ('jobId', 'url', 'filename')
+                   if not isinstance(body.get(field), str) or not body[field].strip()]
+        if missing:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'error': f"Missing or invalid fields: {', '.join(missing)}"})
+            }
+        job_id = body['jobId']
+        url = body['url']
+        filename = body['filename']
+        s3_key = f"recordings/{datetime.datetime.now().strftime('%Y/%m/%d')}/{filename}"
+
+        # One recorder per live stream: a request for a URL that is already
+        # being recorded attaches to that job instead of queueing another
+        job = None
+        if active_recordings_table and url:
+            recording_job_id = active_recordings.claim(
+                clients.table(active_recordings_table), clients.table(ddb_table), url, job_id)
+            if recording_job_id != job_id:
+                logger.info("Job %s coalesced into job %s, which is recording %s", job_id, recording_job_id, url)
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json'},
+                    'body': json.dumps({'success': True, 'jobId': recording_job_id, 'coalesced': True})
+                }
+            # The claim is only trusted briefly without a job record, so write it now
+            now = int(time.time())
+            job = job_state.JobState(clients.table(ddb_table), job_id)
+            if not job.transition(
+                "PENDING",
+                {"url": url, "filename": filename, "s3Key": s3_key, "ttl": now + ttl_days * 86400},
+                set_once={"createdAt": now},
+                flush=True,
+            ):
+                # The job ID belongs to a job that is already past PENDING;
+                # queueing it again would only be dropped by the dispatcher
+                return {
+                    'statusCode': 409,
+                    'headers': {'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': f"Job {job_id} already exists"})
+                }
+
         # Create SQS message
-        sqs = boto3.client('sqs')
-        sqs.send_message(
-            QueueUrl=os.environ.get('SQS_QUEUE_URL'),
-            MessageBody=json.dumps({
-                'jobId': job_id,
-                'url': url,
-                'filename': filename,
-                's3Key': f"recordings/{datetime.datetime.now().strftime('%Y/%m/%d')}/{filename}"
-            }),
-            MessageGroupId='default'
-        )
-        
+        try:
+            clients.client('sqs').send_message(
+                QueueUrl=os.environ.get('SQS_QUEUE_URL'),
+                MessageBody=json.dumps({
+                    'jobId': job_id,
+                    'url': url,
+                    'filename': filename,
+                    's3Key': s3_key
+                }),
+                # Sharded groups: unrelated recordings are dispatched in parallel
+                MessageGroupId=message_groups.message_group_id(job_id, url)
+            )
+        except Exception as e:
+            if job:
+                # Let the next request for the URL start a recording
+                job.transition("FAILED", {"error": f"Could not queue the job: {e}"})
+                active_recordings.release(clients.table(active_recordings_table), url, job_id)
+            raise
+
         return {
             'statusCode': 201,
             'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'success': True})
+            'body': json.dumps({'success': True, 'jobId': job_id, 'coalesced': False})
         }
@@ -0,0 +1,50 @@
+import os
+import logging
+
+import docker
+
+from recorder_events import record_recorder_exit
+
+logger = logging.getLogger(__name__)
+
+# Local stand-in for the ECS task state change rule: recorder containers
+# started by dispatch_to_ecs carry this label, and their exit is recorded
+# through recorder_events so the dispatcher never blocks on container.wait()
+JOB_LABEL = "chronicle.jobId"
+
+
+def handle_exit(client, container_id, job_id, exit_code):
+    """Log the container's output and record its exit code on the job"""
+    try:
+        logs = client.containers.get(container_id).logs(stdout=True, stderr=True)
+        logger.info("=== chronicle-recorder container logs start (%s) ===\n%s\n"
+                    "=== chronicle-recorder container logs end ===",
+                    job_id, logs.decode("utf-8", errors="replace"))
+    except docker.errors.NotFound:
+        logger.warning("Container %s for job %s was already removed", container_id, job_id)
+    record_recorder_exit(job_id, exit_code)
+
+
+def reconcile(client):
+    """Record exits that happened while the watcher was not running"""
+    for container in client.containers.list(all=True, filters={"label": JOB_LABEL, "status": "exited"}):
+        exit_code = container.attrs.get("State", {}).get("ExitCode", -1)
+        handle_exit(client, container.id, container.labels[JOB_LABEL], exit_code)
+
+
+def main():
+    client = docker.DockerClient(base_url=os.environ.get("DOCKER_HOST", "unix:///var/run/docker.sock"))
+    reconcile(client)
+
+    logger.info("Watching Docker events for recorder containers")
+    events = client.events(decode=True, filters={"type": "container", "event": "die", "label": JOB_LABEL})
+    for event in events:
+        attributes = event.get("Actor", {}).get("Attributes", {})
+        try:
+            handle_exit(client, event["id"], attributes[JOB_LABEL], int(attributes.get("exitCode", -1)))
+        except Exception:
+            logger.exception("Failed to record exit for container %s", event.get("id"))
+
+
+if __name__ == "__main__":
+    main()
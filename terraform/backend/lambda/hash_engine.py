@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+import resource
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import torrent
+
+logger = logging.getLogger(__name__)
+
+# Pieces handed to a worker per task when hashing a file from disk
+PIECES_PER_TASK = 16
+READ_SIZE = 1024 * 1024
+
+
+def default_workers():
+    """Number of hashing workers to use when the caller does not say"""
+    return int(os.environ.get("HASH_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (ru_maxrss is in KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Set after the first failed attempt so the process pool is only probed once per process
+processes_unavailable = False
+
+
+def make_executor(workers, prefer_processes=True):
+    """Create a process pool, falling back to threads where processes are unavailable.
+
+    Lambda has no /dev/shm, so multiprocessing primitives fail there. hashlib
+    releases the GIL while hashing large buffers, so a thread pool still
+    spreads SHA-1 work across the available cores.
+    """
+    global processes_unavailable
+    if prefer_processes and workers > 1 and not processes_unavailable:
+        try:
+            # Imported here: multiprocessing is slow to import and unused on the thread path
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=workers)
+            # Force worker start-up so a missing semaphore implementation surfaces now
+            executor.submit(int).result()
+            return executor, "process"
+        except (OSError, NotImplementedError, ImportError) as e:
+            processes_unavailable = True
+            logger.warning(f"Process pool unavailable ({e}), hashing with threads")
+    return ThreadPoolExecutor(max_workers=workers), "thread"
+
+
+def _hash_file_range(path, offset, length, piece_length):
+    """Hash length bytes of path starting at offset into concatenated piece digests"""
+    digests = []
+    buf = bytearray(min(READ_SIZE, piece_length))
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            piece = hashlib.sha1()
+            piece_remaining = min(piece_length, remaining)
+            remaining -= piece_remaining
+            while piece_remaining > 0:
+                n = f.readinto(view[:min(len(buf), piece_remaining)])
+                if not n:
+                    raise IOError(f"Unexpected end of file in {path}")
+                piece.update(view[:n])
+                piece_remaining -= n
+            digests.append(piece.digest())
+    return b"".join(digests)
+
+
+def _sha1_digest(data):
+    return hashlib.sha1(data).digest()
+
+
+class HashResult:
+    """Piece hashes for one input plus the throughput achieved producing them"""
+
+    def __init__(self, pieces, piece_length, length, seconds, workers, mode):
+        self.pieces = pieces
+        self.piece_length = piece_length
+        self.length = length
+        self.seconds = seconds
+        self.workers = workers
+        self.mode = mode
+
+    @property
+    def mb_per_s(self):
+        return (self.length / 1e6) / self.seconds if self.seconds else 0.0
+
+    def report(self):
+        """Human-readable throughput line for logs and benchmarks"""
+        return (
+            f"hashed {self.length / 1e6:.1f} MB in {self.seconds:.2f}s "
+            f"({self.mb_per_s:.1f} MB/s) with {self.workers} {self.mode} worker(s), "
+            f"{len(self.pieces) // 20} pieces of {self.piece_length} bytes"
+        )
+
+
+def hash_file(path, piece_length=None, workers=None, offset=0, length=None):
+    """Hash a file on disk, spreading contiguous piece ranges across a worker pool.
+
+    offset must be piece-aligned; length defaults to the rest of the file.
+    """
+    if length is None:
+        length = os.path.getsize(path) - offset
+    piece_length = piece_length or torrent.piece_length_for_size(offset + length)
+    workers = workers or default_workers()
+    task_size = piece_length * PIECES_PER_TASK
+    end = offset + length
+
+    started = time.monotonic()
+    executor, mode = make_executor(workers)
+    with executor:
+        futures = [
+            executor.submit(_hash_file_range, path, start, min(task_size, end - start), piece_length)
+            for start in range(offset, end, task_size)
+        ]
+        pieces = b"".join(f.result() for f in futures)
+    result = HashResult(pieces, piece_length, length, time.monotonic() - started, workers, mode)
+    logger.info(result.report())
+    return result
+
+
+class ParallelPieceHasher:
+    """Drop-in for torrent.PieceHasher that hashes completed pieces on a worker pool.
+
+    Suited to streamed input (e.g. S3 bodies) where bytes arrive in order.
+    At most max_inflight pieces are buffered, which bounds memory to
+    max_inflight * piece_length.
+    """
+
+    def __init__(self, piece_length=torrent.DEFAULT_PIECE_LENGTH, workers=None, max_inflight=None):
+        self.piece_length = piece_length
+        self.length = 0
+        self.workers = workers or default_workers()
+        self.max_inflight = max_inflight or self.workers * 2
+        # Pieces are already in memory, so threads avoid copying them to other processes
+        self._executor, self.mode = make_executor(self.workers, prefer_processes=False)
+        self._pending = deque()
+        self._done = []
+        self._buffer = bytearray()
+        self._started = time.monotonic()
+
+    def _submit(self, piece):
+        if len(self._pending) >= self.max_inflight:
+            self._done.append(self._pending.popleft().result())
+        self._pending.append(self._executor.submit(_sha1_digest, piece))
+
+    def update(self, data):
+        """Feed the next chunk of the stream"""
+        self.length += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.piece_length:
+            self._submit(bytes(self._buffer[:self.piece_length]))
+            del self._buffer[:self.piece_length]
+
+    def digest(self):
+        """Wait for outstanding pieces and return the concatenated SHA-1 digests"""
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        while self._pending:
+            self._done.append(self._pending.popleft().result())
+        self._executor.shutdown()
+        return b"".join(self._done)
+
+    def result(self):
+        """Finish hashing and return a HashResult with throughput figures"""
+        pieces = self.digest()
+        return HashResult(pieces, self.piece_length, self.length,
+                          time.monotonic() - self._started, self.workers, self.mode)
+
+
+def main(argv=None):
+    """Create a .torrent for a local file (used by the recorder container)"""
+    parser = argparse.ArgumentParser(description="Create a torrent with the parallel hashing engine")
+    parser.add_argument("path")
+    parser.add_argument("-o", "--output", help="where to write the .torrent")
+    parser.add_argument("-t", "--tracker", action="append", default=[])
+    parser.add_argument("-w", "--web-seed", action="append", default=[], help="HTTP URL of the file (BEP 19)")
+    parser.add_argument("-c", "--comment")
+    parser.add_argument("--piece-length", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="only hash the file and print the throughput report")
+    args = parser.parse_args(argv)
+
+    result = hash_file(args.path, args.piece_length, args.workers)
+    print(result.report())
+    if args.benchmark:
+        return 0
+    if not args.output:
+        parser.error("--output is required unless --benchmark is given")
+
+    torrent_bytes = torrent.build_torrent(
+        name=os.path.basename(args.path),
+        length=result.length,
+        piece_length=result.piece_length,
+        pieces=result.pieces,
+        trackers=args.tracker,
+        comment=args.comment,
+        web_seeds=args.web_seed
+    )
+    with open(args.output, "wb") as f:
+        f.write(torrent_bytes)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import base64
+import logging
+import argparse
+import datetime
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import job_state
+
+logger = logging.getLogger(__name__)
+
+# GSI on the jobs table: partition "status", sort "createdAt" (epoch seconds)
+STATUS_INDEX = "status-createdAt-index"
+
+# GSI for the change feed: partition "status", sort "lastUpdatedAt" (epoch seconds).
+# Every writer stamps lastUpdatedAt, so a job re-enters the index whenever it changes.
+UPDATED_INDEX = "status-lastUpdatedAt-index"
+
+# Every status a job can be in; listing without a status filter queries each partition
+JOB_STATUSES = job_state.STATUSES
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# The index is eventually consistent and writers' clocks differ slightly, so
+# each feed watermark overlaps the previous one; clients merge by jobId.
+FEED_OVERLAP = 10
+
+# Upper bound for createdAt when no cursor is given (year 2286)
+MAX_CREATED_AT = 9999999999
+
+# Sort keys of the indexes; DynamoDB rejects writes to an item whose key
+# attribute has another type than the index, so they must be numbers
+INDEX_SORT_KEYS = ("createdAt", "lastUpdatedAt")
+
+
+def json_default(value):
+    """json.dumps hook for the Decimals boto3 returns for DynamoDB numbers"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_cursor(created_at, seen_ids):
+    """Opaque cursor: the createdAt of the last item returned plus the IDs already returned at it"""
+    payload = json.dumps({"c": created_at, "s": sorted(seen_ids)}, default=json_default)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(payload["c"]), set(payload["s"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _query_status(table, status, since, upper, want):
+    """Newest-first items of one status with since <= createdAt <= upper.
+
+    Follows LastEvaluatedKey until want items are collected, so the 1 MB
+    query page never silently truncates a result. Returns (items, exhausted).
+    """
+    items = []
+    kwargs = {
+        "IndexName": STATUS_INDEX,
+        "KeyConditionExpression": Key("status").eq(status) & Key("createdAt").between(since, upper),
+        "ScanIndexForward": False,
+        "Limit": want,
+    }
+    while True:
+        response = table.query(**kwargs)
+        items.extend(response.get("Items", []))
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return items, True
+        if len(items) >= want:
+            return items, False
+        kwargs["ExclusiveStartKey"] = last_key
+        kwargs["Limit"] = want - len(items)
+
+
+def list_jobs(table, statuses=None, since=None, limit=DEFAULT_LIMIT, cursor=None):
+    """Return one page of jobs, newest first, and the cursor for the next page (or None).
+
+    Reads at most limit (+ ties) items per status partition from the
+    status/createdAt index instead of scanning the table.
+    """
+    statuses = statuses or JOB_STATUSES
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    since = int(since or 0)
+    upper, seen = decode_cursor(cursor) if cursor else (MAX_CREATED_AT, set())
+    if since > upper:
+        return [], None
+
+    candidates = []
+    more = False
+    for status in statuses:
+        items, exhausted = _query_status(table, status, since, upper, limit + len(seen))
+        more = more or not exhausted
+        candidates.extend(
+            item for item in items
+            if not (int(item["createdAt"]) == upper and item["jobId"] in seen)
+        )
+
+    candidates.sort(key=lambda item: (item["createdAt"], item["jobId"]), reverse=True)
+    page = candidates[:limit]
+    more = more or len(candidates) > limit
+    if not page or not more:
+        return page, None
+
+    last_created = int(page[-1]["createdAt"])
+    next_seen = {item["jobId"] for item in page if int(item["createdAt"]) == last_created}
+    if last_created == upper:
+        next_seen |= seen
+    return page, encode_cursor(last_created, next_seen)
+
+
+def feed_watermark(since=0):
+    """changedSince value a client should send on its next poll of the change feed"""
+    return max(int(since or 0), int(time.time()) - FEED_OVERLAP)
+
+
+def changed_jobs(table, since, statuses=None):
+    """Return every job whose lastUpdatedAt is after since, and the next watermark.
+
+    Only the jobs written since the previous poll are read, so the cost of
+    a poll follows the number of in-flight jobs rather than the job history.
+    """
+    since = int(since)
+    if since < 0:
+        raise ValueError("changedSince must be a non-negative epoch time")
+    watermark = feed_watermark(since)
+
+    changed = []
+    for status in statuses or JOB_STATUSES:
+        kwargs = {
+            "IndexName": UPDATED_INDEX,
+            "KeyConditionExpression": Key("status").eq(status) & Key("lastUpdatedAt").gt(since),
+        }
+        while True:
+            response = table.query(**kwargs)
+            changed.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    changed.sort(key=lambda item: item["lastUpdatedAt"], reverse=True)
+    return changed, watermark
+
+
+def epoch_seconds(value):
+    """Epoch seconds of a number, numeric string or ISO 8601 time (UTC if it has no zone)"""
+    if isinstance(value, (int, float, Decimal)):
+        return int(value)
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    parsed = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp())
+
+
+def migrate_timestamps(table, dry_run=False):
+    """Rewrite string createdAt/lastUpdatedAt values as epoch-second numbers.
+
+    Jobs written before the indexes existed stored ISO strings. Such items
+    are left out of the indexes, and once an index exists every write to
+    them fails with a key type mismatch, so this has to run before the
+    indexes are created. A value that is not a time at all is removed. Each
+    update is conditional on the old value, so a job written in the meantime
+    is left alone. Returns (scanned, migrated, skipped).
+    """
+    scanned = migrated = skipped = 0
+    kwargs = {
+        "ProjectionExpression": "jobId, " + ", ".join(f"#k{i}" for i in range(len(INDEX_SORT_KEYS))),
+        "ExpressionAttributeNames": {f"#k{i}": name for i, name in enumerate(INDEX_SORT_KEYS)},
+    }
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get("Items", []):
+            scanned += 1
+            stale = {name: item[name] for name in INDEX_SORT_KEYS if isinstance(item.get(name), str)}
+            if not stale:
+                continue
+            converted = {}
+            for name, value in stale.items():
+                try:
+                    converted[name] = epoch_seconds(value)
+                except ValueError:
+                    logger.warning(f"Job {item['jobId']}: {name} {value!r} is not a time, removing it")
+                    converted[name] = None
+            if not dry_run:
+                names, values, assignments, removals, conditions = {}, {}, [], [], []
+                for i, (name, value) in enumerate(converted.items()):
+                    names[f"#a{i}"] = name
+                    values[f":o{i}"] = stale[name]
+                    conditions.append(f"#a{i} = :o{i}")
+                    if value is None:
+                        removals.append(f"#a{i}")
+                    else:
+                        values[f":n{i}"] = value
+                        assignments.append(f"#a{i} = :n{i}")
+                expression = " ".join(filter(None, [
+                    "SET " + ", ".join(assignments) if assignments else "",
+                    "REMOVE " + ", ".join(removals) if removals else "",
+                ]))
+                try:
+                    table.update_item(
+                        Key={"jobId": item["jobId"]},
+                        UpdateExpression=expression,
+                        ConditionExpression=" AND ".join(conditions),
+                        ExpressionAttributeNames=names,
+                        ExpressionAttributeValues=values,
+                    )
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+                    skipped += 1
+                    continue
+            logger.info(f"Job {item['jobId']}: {stale} -> {converted}")
+            migrated += 1
+        if "LastEvaluatedKey" not in response:
+            return scanned, migrated, skipped
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def main(argv=None):
+    """Migrate the jobs table's timestamps to numbers (run once, before adding the indexes)"""
+    import boto3
+
+    parser = argparse.ArgumentParser(description="Convert ISO createdAt/lastUpdatedAt of existing jobs to epoch seconds")
+    parser.add_argument("--table", default=os.environ.get("DDB_TABLE"))
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args(argv)
+    if not args.table:
+        parser.error("--table or DDB_TABLE is required")
+
+    dynamodb = boto3.resource(
+        "dynamodb",
+        region_name=os.environ.get("AWS_REGION"),
+        endpoint_url=os.environ.get("AWS_ENDPOINT_URL")
+    )
+    scanned, migrated, skipped = migrate_timestamps(dynamodb.Table(args.table), dry_run=args.dry_run)
+    print(f"Scanned {scanned} jobs: {migrated} {'to migrate' if args.dry_run else 'migrated'}, {skipped} skipped")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# Forward order of a job's life; a job only moves to a later status.
+# FAILED can follow any of these, and COMPLETED/FAILED are final.
+STATUS_ORDER = (
+    "PENDING",
+    "STARTED",
+    "DOWNLOADING",
+    "RECORDING",
+    "UPLOADING",
+    "CREATING_TORRENT",
+    "UPLOADING_TORRENT",
+    "SEEDING",
+    "COMPLETED",
+)
+TERMINAL_STATUSES = ("COMPLETED", "FAILED")
+STATUSES = STATUS_ORDER + ("FAILED",)
+
+# Statuses a job record may be created in
+INITIAL_STATUSES = ("PENDING", "STARTED")
+
+# An SQS redelivery may restart a job whose previous attempt failed
+RESTARTS = {"STARTED": ("FAILED",)}
+
+# Statuses that claim the job for one writer: they cannot follow themselves,
+# so of two dispatches of the same job only the first launches a recorder
+CLAIM_STATUSES = ("STARTED",)
+
+# Non-final transitions are held this long so quick successions become one write
+COALESCE_SECONDS = float(os.environ.get("JOB_STATE_COALESCE_SECONDS", "1.0"))
+
+
+def allowed_predecessors(status):
+    """Statuses a job may be in for a write of status to be accepted"""
+    if status not in STATUSES:
+        raise ValueError(f"Unknown job status: {status}")
+    open_statuses = [s for s in STATUS_ORDER if s not in TERMINAL_STATUSES]
+    if status in TERMINAL_STATUSES:
+        allowed = open_statuses
+    else:
+        allowed = open_statuses[:open_statuses.index(status) + 1]
+    if status in CLAIM_STATUSES:
+        allowed = [s for s in allowed if s != status]
+    return tuple(allowed) + RESTARTS.get(status, ())
+
+
+def can_transition(current, status):
+    """True if a job in status current may move to status"""
+    return current in allowed_predecessors(status)
+
+
+class JobState:
+    """Single writer for one job's record in the jobs table.
+
+    Every status write is conditional on the stored status being an allowed
+    predecessor, so a late or duplicate writer (a retried Lambda, a recorder
+    that outlived its task) can never move a job backwards or out of a final
+    status. Transitions to the status already written are skipped, and
+    non-final transitions are held for coalesce_seconds so a quick run of
+    them reaches DynamoDB as a single update_item.
+    """
+
+    def __init__(self, table, job_id, status=None, coalesce_seconds=COALESCE_SECONDS):
+        self.table = table
+        self.job_id = job_id
+        # Last status known to be stored (None until this writer has written one)
+        self.status = status
+        self.coalesce_seconds = coalesce_seconds
+        self.rejected = False
+        self._pending_status = None
+        # First status of the pending batch; the write is conditioned on its predecessors
+        self._batch_from = None
+        self._attributes = {}
+        self._set_once = {}
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def transition(self, status, attributes=None, set_once=None, flush=False):
+        """Move the job to status, setting attributes with it.
+
+        set_once attributes are only written if the record does not have
+        them yet (e.g. createdAt). Final statuses and flush=True write
+        immediately; anything else is written within coalesce_seconds.
+        Returns False if the transition was rejected.
+        """
+        with self._lock:
+            if self.rejected:
+                return False
+            current = self._pending_status or self.status
+            if status == current and not attributes and not set_once and not flush:
+                return True
+            if current is not None and not can_transition(current, status):
+                logger.warning(f"Job {self.job_id}: ignoring transition {current} -> {status}")
+                return False
+            if self._pending_status is None:
+                self._batch_from = status
+            self._pending_status = status
+            self._attributes.update(attributes or {})
+            self._set_once.update(set_once or {})
+            if flush or status in TERMINAL_STATUSES or not self.coalesce_seconds:
+                return self.flush()
+            self._schedule()
+            return True
+
+    def update(self, attributes, flush=False):
+        """Set attributes without changing the status (coalesced like a transition)"""
+        with self._lock:
+            if self.rejected:
+                return False
+            self._attributes.update(attributes)
+            if flush or not self.coalesce_seconds:
+                return self.flush()
+            self._schedule()
+            return True
+
+    def flush(self):
+        """Write whatever is pending now; returns False if the write was rejected"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending_status is None and not self._attributes and not self._set_once:
+                return not self.rejected
+            status, batch_from = self._pending_status, self._batch_from
+            attributes, set_once = self._attributes, self._set_once
+            self._pending_status, self._batch_from = None, None
+            self._attributes, self._set_once = {}, {}
+            try:
+                self._write(status, batch_from, attributes, set_once)
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                self.rejected = True
+                logger.info(f"Job {self.job_id}: write of {status or 'attributes'} rejected, "
+                            f"the job has moved on or does not exist")
+                return False
+            if status:
+                self.status = status
+            return True
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.coalesce_seconds, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Job {self.job_id}: error writing job state: {e}")
+
+    def _write(self, status, batch_from, attributes, set_once):
+        names = {"#st": "status"}
+        values = {":lu": int(time.time())}
+        assignments = ["lastUpdatedAt = :lu"]
+        for i, (name, value) in enumerate(attributes.items()):
+            names[f"#a{i}"] = name
+            values[f":a{i}"] = value
+            assignments.append(f"#a{i} = :a{i}")
+        for i, (name, value) in enumerate(set_once.items()):
+            names[f"#o{i}"] = name
+            values[f":o{i}"] = value
+            assignments.append(f"#o{i} = if_not_exists(#o{i}, :o{i})")
+
+        if status:
+            assignments.insert(0, "#st = :st")
+            values[":st"] = status
+            # The transitions in the batch were checked as they were made, so the
+            # stored status only has to allow the first of them
+            allowed = allowed_predecessors(batch_from)
+            placeholders = []
+            for i, predecessor in enumerate(allowed):
+                values[f":p{i}"] = predecessor
+                placeholders.append(f":p{i}")
+            condition = f"#st IN ({', '.join(placeholders)})"
+            if batch_from in INITIAL_STATUSES:
+                condition = f"attribute_not_exists(#st) OR {condition}"
+        else:
+            # Attribute-only updates never create a record
+            condition = "attribute_exists(#st)"
+
+        self.table.update_item(
+            Key={"jobId": self.job_id},
+            UpdateExpression="SET " + ", ".join(assignments),
+            ConditionExpression=condition,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+        logger.info(f"Job {self.job_id}: wrote {status or 'attributes'} "
+                    f"({', '.join(list(attributes) + list(set_once)) or 'no attributes'})")
+
+
+def _parse_assignments(pairs, convert):
+    attributes = {}
+    for pair in pairs:
+        name, sep, value = pair.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"expected name=value, got {pair!r}")
+        attributes[name] = convert(value)
+    return attributes
+
+
+def main(argv=None):
+    """Write a job status from a shell script (used by the recorder container)"""
+    import boto3
+
+    parser = argparse.ArgumentParser(description="Move a job to a new status through the job state machine")
+    parser.add_argument("job_id")
+    parser.add_argument("status", choices=STATUSES)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="string attribute to write with the status")
+    parser.add_argument("--number", action="append", default=[], metavar="NAME=VALUE",
+                        help="numeric attribute to write with the status")
+    parser.add_argument("--set-once", action="append", default=[], metavar="NAME=VALUE",
+                        help="string attribute written only if the job does not have it yet")
+    args = parser.parse_args(argv)
+
+    dynamodb = boto3.resource(
+        "dynamodb",
+        region_name=os.environ.get("AWS_REGION"),
+        endpoint_url=os.environ.get("AWS_ENDPOINT_URL")
+    )
+    table = dynamodb.Table(os.environ["DDB_TABLE"])
+
+    attributes = _parse_assignments(args.set, str)
+    attributes.update(_parse_assignments(args.number, int))
+    job = JobState(table, args.job_id, coalesce_seconds=0)
+    # A rejected transition is not an error for the caller: the job has already moved on
+    job.transition(args.status, attributes, _parse_assignments(args.set_once, str), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
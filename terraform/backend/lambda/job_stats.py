@@ -0,0 +1,232 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+import datetime
+from decimal import Decimal
+from collections import defaultdict
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+import job_state
+
+logger = logging.getLogger(__name__)
+
+# Aggregate items in the stats table, keyed by statKey:
+#   status#<STATUS>   jobs: jobs currently in the status
+#   day#<YYYY-MM-DD>  created, completed, failed, bytesRecorded, recordings,
+#                     recordingSeconds: what happened that day (UTC)
+#   totals            the same counters over all days
+STATUS_PREFIX = "status#"
+DAY_PREFIX = "day#"
+TOTALS_KEY = "totals"
+
+# Days GET /stats returns by default, and at most
+DEFAULT_DAYS = 7
+MAX_DAYS = 90
+
+# DynamoDB limits: items per transaction and keys per BatchGetItem
+TRANSACTION_ITEMS = 100
+BATCH_GET_KEYS = 100
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+def _timestamp(value):
+    """Epoch seconds of an epoch number or an ISO 8601 string, or None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return float(value)
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def recording_seconds(job):
+    """How long a finished job recorded its stream, or None if it cannot tell"""
+    start = _timestamp(job.get("recordingAt")) or _timestamp(job.get("startedAt"))
+    end = _timestamp(job.get("uploadingAt")) or _timestamp(job.get("finishedAt"))
+    if start is None or end is None or end < start:
+        return None
+    return int(end - start)
+
+
+def day_key(epoch_seconds):
+    return DAY_PREFIX + datetime.datetime.utcfromtimestamp(epoch_seconds).strftime("%Y-%m-%d")
+
+
+def job_deltas(old, new, when, deltas=None):
+    """Add the counter changes of one job write (old/new images, None if absent) to deltas.
+
+    deltas maps statKey -> {counter: change}; when (epoch seconds) picks the day.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: defaultdict(int))
+    old = old or {}
+    day = day_key(when)
+    old_status, new_status = old.get("status"), (new or {}).get("status")
+    if old_status != new_status:
+        if old_status:
+            deltas[STATUS_PREFIX + old_status]["jobs"] -= 1
+        if new_status:
+            deltas[STATUS_PREFIX + new_status]["jobs"] += 1
+
+    if new is None:
+        # Expired by TTL: it leaves its status, but stays in the history
+        return deltas
+    changes = {}
+    if not old:
+        changes["created"] = 1
+    if new_status != old_status and new_status in job_state.TERMINAL_STATUSES:
+        changes[new_status.lower()] = 1
+        if new_status == "COMPLETED":
+            seconds = recording_seconds(new)
+            if seconds is not None:
+                changes["recordings"] = 1
+                changes["recordingSeconds"] = seconds
+    recorded = int(new.get("bytesDownloaded", 0)) - int(old.get("bytesDownloaded", 0))
+    if recorded > 0:
+        changes["bytesRecorded"] = recorded
+    for key in (day, TOTALS_KEY):
+        for name, value in changes.items():
+            deltas[key][name] += value
+    return deltas
+
+
+def stream_deltas(records):
+    """Counter changes of a batch of DynamoDB Streams records of the jobs table"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        change = record.get("dynamodb", {})
+        images = [
+            {k: _deserializer.deserialize(v) for k, v in change[name].items()} if name in change else None
+            for name in ("OldImage", "NewImage")
+        ]
+        job_deltas(images[0], images[1], float(change.get("ApproximateCreationDateTime", time.time())), deltas)
+    return deltas
+
+
+def apply(dynamodb_client, table_name, deltas, token=None, updated_at=None):
+    """ADD the counter changes to the stats items.
+
+    The updates go out as transactions, so a batch is counted entirely or
+    not at all. With token (derived from the batch), a retry of the same
+    batch within DynamoDB's 10 minute idempotency window is not counted twice.
+    A retry must send identical requests, so with a token pass updated_at
+    from the batch too (batch_time) rather than the time of the attempt.
+    """
+    updates = []
+    now = int(updated_at if updated_at is not None else time.time())
+    for key, counters in sorted(deltas.items()):
+        counters = {name: value for name, value in counters.items() if value}
+        if not counters:
+            continue
+        names = {"#lu": "lastUpdatedAt"}
+        values = {":lu": _serializer.serialize(now)}
+        adds = []
+        for i, (name, value) in enumerate(sorted(counters.items())):
+            names[f"#c{i}"] = name
+            values[f":c{i}"] = _serializer.serialize(value)
+            adds.append(f"#c{i} :c{i}")
+        updates.append({"Update": {
+            "TableName": table_name,
+            "Key": {"statKey": {"S": key}},
+            "UpdateExpression": "SET #lu = :lu ADD " + ", ".join(adds),
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+        }})
+    for n, start in enumerate(range(0, len(updates), TRANSACTION_ITEMS)):
+        request = {"TransactItems": updates[start:start + TRANSACTION_ITEMS]}
+        if token:
+            request["ClientRequestToken"] = f"{token}-{n}"
+        dynamodb_client.transact_write_items(**request)
+    return len(updates)
+
+
+def batch_time(records):
+    """Epoch seconds of the latest change in a batch of stream records (the same for every retry of it)"""
+    times = [float(r["dynamodb"]["ApproximateCreationDateTime"])
+             for r in records if "ApproximateCreationDateTime" in r.get("dynamodb", {})]
+    return int(max(times)) if times else None
+
+
+def batch_token(records):
+    """Idempotency token for a batch of stream records (the same for every retry of it)"""
+    digest = hashlib.sha256("".join(r.get("eventID", "") for r in records).encode()).hexdigest()
+    return digest[:32]
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def _average(item):
+    recordings = item.get("recordings", 0)
+    return round(item.get("recordingSeconds", 0) / recordings) if recordings else None
+
+
+def read_stats(dynamodb_client, table_name, days=DEFAULT_DAYS, now=None):
+    """Counts by status, totals and the last days, from a fixed number of stats items"""
+    days = max(1, min(int(days), MAX_DAYS))
+    now = now if now is not None else time.time()
+    day_keys = [day_key(now - i * 86400) for i in range(days)]
+    keys = [STATUS_PREFIX + s for s in job_state.STATUSES] + [TOTALS_KEY] + day_keys
+
+    items = {}
+    for start in range(0, len(keys), BATCH_GET_KEYS):
+        pending = {table_name: {"Keys": [{"statKey": {"S": k}} for k in keys[start:start + BATCH_GET_KEYS]]}}
+        while pending:
+            response = dynamodb_client.batch_get_item(RequestItems=pending)
+            for raw in response.get("Responses", {}).get(table_name, []):
+                item = {k: _plain(_deserializer.deserialize(v)) for k, v in raw.items()}
+                items[item["statKey"]] = item
+            pending = response.get("UnprocessedKeys") or None
+
+    totals = items.get(TOTALS_KEY, {})
+    counters = ("created", "completed", "failed", "bytesRecorded", "recordings", "recordingSeconds")
+    return {
+        "byStatus": {s: items.get(STATUS_PREFIX + s, {}).get("jobs", 0) for s in job_state.STATUSES},
+        "totals": dict({c: totals.get(c, 0) for c in counters}, averageRecordingSeconds=_average(totals)),
+        "days": [
+            dict({c: items.get(k, {}).get(c, 0) for c in counters},
+                 day=k[len(DAY_PREFIX):], averageRecordingSeconds=_average(items.get(k, {})))
+            for k in day_keys
+        ],
+    }
+
+
+def main(argv=None):
+    """Count the jobs already in the table into the stats (run once, after the stream is enabled)"""
+    import boto3
+
+    parser = argparse.ArgumentParser(description="Backfill the job stats from a scan of the jobs table")
+    parser.add_argument("--jobs-table", default=os.environ.get("DDB_TABLE"))
+    parser.add_argument("--stats-table", default=os.environ.get("STATS_TABLE"))
+    args = parser.parse_args(argv)
+    if not args.jobs_table or not args.stats_table:
+        parser.error("--jobs-table/DDB_TABLE and --stats-table/STATS_TABLE are required")
+
+    client = boto3.client("dynamodb", region_name=os.environ.get("AWS_REGION"),
+                          endpoint_url=os.environ.get("AWS_ENDPOINT_URL"))
+    deltas = defaultdict(lambda: defaultdict(int))
+    scanned = 0
+    for page in client.get_paginator("scan").paginate(TableName=args.jobs_table):
+        for raw in page["Items"]:
+            job = {k: _deserializer.deserialize(v) for k, v in raw.items()}
+            job_deltas(None, job, _timestamp(job.get("createdAt")) or time.time(), deltas)
+            scanned += 1
+    written = apply(client, args.stats_table, deltas)
+    print(f"Counted {scanned} jobs into {written} stats items")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import os
+import zlib
+import urllib.parse
+
+import active_recordings
+
+# SQS FIFO hands out one batch per message group at a time, and the dispatcher
+# runs a batch's records of one group in order (dispatch_to_ecs.dispatch_group),
+# holding back the rest of the group when one fails: jobs in the same group are
+# dispatched in order, and different groups in parallel. Jobs are spread over
+# this many groups
+MESSAGE_GROUP_SHARDS = int(os.environ.get("MESSAGE_GROUP_SHARDS", "16"))
+
+# What keeps jobs in order: "job" (only redeliveries of one job), "channel"
+# (recordings of the same channel / stream) or "host" (everything from one site)
+MESSAGE_GROUP_KEY = os.environ.get("MESSAGE_GROUP_KEY", "job")
+
+# Leading path segments that are followed by the channel's name or ID
+CHANNEL_PATHS = ("channel", "c", "user")
+
+
+def channel(url):
+    """Best-effort channel of a stream URL: host plus the channel part of the path
+    (youtube.com/@name, twitch.tv/name, youtube.com/channel/ID) or the video ID.
+
+    Works on active_recordings.normalize_url's key, so URL spellings that
+    name the same stream (www., youtu.be links, case) share a channel.
+    """
+    path, _, query = active_recordings.normalize_url(url).partition("?")
+    host, _, path = path.partition("/")
+    video = urllib.parse.parse_qs(query).get("v")
+    if video:
+        return f"{host}/{video[0]}"
+    segments = [s for s in path.split("/") if s]
+    if len(segments) > 1 and segments[0] in CHANNEL_PATHS:
+        return f"{host}/{segments[0]}/{segments[1]}"
+    return f"{host}/{segments[0]}" if segments else host
+
+
+def group_key(job_id, url, key=MESSAGE_GROUP_KEY):
+    """What a job is ordered by, before sharding"""
+    if key == "job":
+        if not job_id:
+            raise ValueError("A job ID is required")
+        return job_id
+    if key == "channel":
+        return channel(url)
+    if key == "host":
+        return channel(url).split("/", 1)[0]
+    raise ValueError(f"Unknown MESSAGE_GROUP_KEY {key!r} (expected job, channel or host)")
+
+
+def message_group_id(job_id, url, shards=MESSAGE_GROUP_SHARDS, key=MESSAGE_GROUP_KEY):
+    """MessageGroupId of a job: its group key hashed onto one of shards groups.
+
+    CRC32 rather than hash() so every producer (and every Lambda container)
+    puts the same key in the same group.
+    """
+    basis = group_key(job_id, url or "", key)
+    return f"shard-{zlib.crc32(basis.encode('utf-8')) % max(shards, 1)}"
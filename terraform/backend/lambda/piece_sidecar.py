@@ -0,0 +1,214 @@
+import os
+import sys
+import time
+import struct
+import logging
+import argparse
+
+from botocore.exceptions import ClientError
+
+import torrent
+
+logger = logging.getLogger(__name__)
+
+# Sidecars are stored next to their object, and under the object's content
+# checksum so an identical upload can reuse them
+SUFFIX = ".pieces"
+CHECKSUM_PREFIX = "pieces/"
+# Piece hashes of objects whose hashing spans several Lambda invocations
+CHECKPOINT_PREFIX = "pieces/partial/"
+
+# magic, format version, piece length, content length, SHA-256 (zeros if unknown);
+# the 20-byte SHA-1 piece hashes follow
+MAGIC = b"CTPS"
+VERSION = 1
+HEADER = struct.Struct(">4sBQQ32s")
+
+
+def sidecar_key(s3_key):
+    """Key of the sidecar stored next to s3_key"""
+    return s3_key + SUFFIX
+
+
+def content_checksum(head):
+    """Checksum identifying an object's content, from its head_object response
+    (or any dict with its ETag and ContentLength).
+
+    The ETag is S3's own checksum of the bytes (an MD5, or an MD5 of the part
+    MD5s for multipart uploads), so identical uploads made with the same part
+    size share it; the size is included to rule out collisions between part sizes.
+    """
+    etag = head['ETag'].strip('"')
+    return f"{etag}-{head['ContentLength']}"
+
+
+def checksum_key(head):
+    """Key of the sidecar shared by every object with the same content as head"""
+    return f"{CHECKSUM_PREFIX}{content_checksum(head)}{SUFFIX}"
+
+
+class Sidecar:
+    """Piece hashes of one object, enough to rebuild its torrent without reading it"""
+
+    def __init__(self, piece_length, length, pieces, sha256=None):
+        self.piece_length = piece_length
+        self.length = length
+        self.pieces = pieces
+        self.sha256 = sha256
+
+    @classmethod
+    def from_result(cls, result, sha256=None):
+        """Sidecar for a hash_engine.HashResult"""
+        return cls(result.piece_length, result.length, bytes(result.pieces), sha256)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Sidecar is truncated")
+        magic, version, piece_length, length, sha256 = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} piece sidecar")
+        pieces = bytes(data[HEADER.size:])
+        if not piece_length or len(pieces) != -(-length // piece_length) * 20:
+            raise ValueError(f"Sidecar has {len(pieces) // 20} pieces for {length} bytes")
+        return cls(piece_length, length, pieces, sha256.hex() if any(sha256) else None)
+
+    def to_bytes(self):
+        sha256 = bytes.fromhex(self.sha256) if self.sha256 else bytes(32)
+        return HEADER.pack(MAGIC, VERSION, self.piece_length, self.length, sha256) + self.pieces
+
+    def build_torrent(self, name, trackers=(), comment=None, web_seeds=()):
+        """Build the torrent from the stored piece hashes"""
+        return torrent.build_torrent(name, self.length, self.piece_length, self.pieces, trackers, comment,
+                                     web_seeds)
+
+
+def _get(s3_client, bucket, key):
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None, {}
+        raise
+    return Sidecar.from_bytes(response['Body'].read()), response.get('Metadata', {})
+
+
+def load(s3_client, bucket, s3_key, head):
+    """Return the Sidecar for the object described by head, or None if it has to be hashed.
+
+    A sidecar next to the object is only used if it was made from the current
+    version of it (same ETag); otherwise one made from identical content is
+    looked up by checksum and copied next to the object for next time.
+    """
+    try:
+        sidecar, metadata = _get(s3_client, bucket, sidecar_key(s3_key))
+        if sidecar and metadata.get('source-etag') == head['ETag'] and sidecar.length == head['ContentLength']:
+            return sidecar
+        sidecar, _ = _get(s3_client, bucket, checksum_key(head))
+        if sidecar and sidecar.length == head['ContentLength']:
+            logger.info(f"Reusing piece hashes of identical content {content_checksum(head)} for {s3_key}")
+            _put(s3_client, bucket, sidecar_key(s3_key), sidecar, head)
+            return sidecar
+    except Exception as e:
+        # A missing or unreadable sidecar only costs a rehash
+        logger.warning(f"Could not load piece sidecar for {s3_key}: {e}")
+    return None
+
+
+def save(s3_client, bucket, s3_key, head, sidecar):
+    """Store the sidecar next to the object and under its content checksum"""
+    try:
+        _put(s3_client, bucket, sidecar_key(s3_key), sidecar, head)
+        _put(s3_client, bucket, checksum_key(head), sidecar, head)
+        logger.info(f"Stored {len(sidecar.pieces) // 20} piece hashes for {s3_key}")
+    except Exception as e:
+        # Not critical: the next regeneration falls back to hashing the object
+        logger.warning(f"Could not store piece sidecar for {s3_key}: {e}")
+
+
+def checkpoint_key(head):
+    """Key of the in-progress hashes of the object described by head"""
+    return f"{CHECKPOINT_PREFIX}{content_checksum(head)}{SUFFIX}"
+
+
+def load_checkpoint(s3_client, bucket, head):
+    """Return the hashes of the first whole pieces of the object, or None to start from byte 0"""
+    try:
+        sidecar, metadata = _get(s3_client, bucket, checkpoint_key(head))
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable hashing checkpoint {checkpoint_key(head)}: {e}")
+        return None
+    if (sidecar and metadata.get('source-etag') == head['ETag']
+            and sidecar.length < head['ContentLength'] and sidecar.length % sidecar.piece_length == 0):
+        return sidecar
+    return None
+
+
+def save_checkpoint(s3_client, bucket, head, sidecar):
+    """Store the hashes of the pieces done so far (the sidecar must end on a piece boundary)"""
+    _put(s3_client, bucket, checkpoint_key(head), sidecar, head)
+    logger.info(f"Checkpointed {len(sidecar.pieces) // 20} piece hashes ({sidecar.length} bytes)")
+
+
+def delete_checkpoint(s3_client, bucket, head):
+    try:
+        s3_client.delete_object(Bucket=bucket, Key=checkpoint_key(head))
+    except Exception as e:
+        # Left behind, it is ignored once a full sidecar exists
+        logger.warning(f"Could not delete hashing checkpoint {checkpoint_key(head)}: {e}")
+
+
+def _put(s3_client, bucket, key, sidecar, head):
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=sidecar.to_bytes(),
+        ContentType="application/octet-stream",
+        Metadata={"source-etag": head['ETag']}
+    )
+
+
+def main(argv=None):
+    """Rebuild an object's torrent from its sidecar and upload it to the watch folder"""
+    import boto3
+    import torrent_index
+    import tracker_config
+
+    parser = argparse.ArgumentParser(description="Regenerate a torrent from its stored piece hashes")
+    parser.add_argument("bucket")
+    parser.add_argument("key", help="key of the recording whose torrent is rebuilt")
+    parser.add_argument("-t", "--tracker", action="append",
+                        help="tracker URL, one tier each (repeatable; default: $TRACKERS or tracker-config.json)")
+    parser.add_argument("-w", "--web-seed", action="append",
+                        help="web seed base URL (repeatable; default: $WEB_SEED_URLS or tracker-config.json)")
+    parser.add_argument("-c", "--comment", help="torrent comment (default: 'File from S3: <key>')")
+    parser.add_argument("-o", "--output", help="torrent key to write (default: the watch folder)")
+    args = parser.parse_args(argv)
+
+    s3_client = boto3.client(
+        "s3",
+        region_name=os.environ.get("AWS_REGION"),
+        endpoint_url=os.environ.get("AWS_ENDPOINT_URL")
+    )
+    head = s3_client.head_object(Bucket=args.bucket, Key=args.key)
+    started = time.monotonic()
+    sidecar = load(s3_client, args.bucket, args.key, head)
+    if sidecar is None:
+        print(f"No usable piece sidecar for s3://{args.bucket}/{args.key}", file=sys.stderr)
+        return 1
+    config = tracker_config.load()
+    torrent_bytes = sidecar.build_torrent(os.path.basename(args.key),
+                                          tracker_config.announce_tiers(config, args.tracker),
+                                          args.comment or f"File from S3: {args.key}",
+                                          tracker_config.web_seeds(args.bucket, args.key, config, args.web_seed))
+    output = args.output or torrent_index.watch_torrent_key(args.key)
+    s3_client.put_object(Bucket=args.bucket, Key=output, Body=torrent_bytes,
+                         ContentType="application/x-bittorrent")
+    print(f"Rebuilt s3://{args.bucket}/{output} from {len(sidecar.pieces) // 20} piece hashes "
+          f"in {(time.monotonic() - started) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import os
+import sys
+import glob
+import time
+import signal
+import logging
+import argparse
+import datetime
+
+import job_state
+
+logger = logging.getLogger(__name__)
+
+# Sampling starts at MIN_INTERVAL and doubles up to MAX_INTERVAL while the
+# ingest rate holds steady; a rate change of more than STEADY_TOLERANCE
+# drops it back to MIN_INTERVAL
+MIN_INTERVAL = 5.0
+MAX_INTERVAL = 60.0
+STEADY_TOLERANCE = 0.2
+
+# A heartbeat is written at least this often even when nothing changed, well
+# inside the idle threshold util/check_and_fix_job_status.sh applies
+KEEPALIVE_INTERVAL = 120.0
+
+
+class ProgressAgent:
+    """Report a recording's progress on its job item from one long-lived process.
+
+    Each write carries the bytes recorded so far plus the instantaneous and
+    average ingest rate (bytes/s). Samples with no new bytes are not written
+    unless KEEPALIVE_INTERVAL has passed, and writes go through the job
+    state machine, so the agent stops once the job has moved past RECORDING.
+    """
+
+    def __init__(self, job, path, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self.job = job
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.started = time.monotonic()
+        self.last_sample = (self.started, 0)
+        self.last_rate = None
+        self.last_write = None
+        self.written_bytes = None
+
+    def size(self):
+        """Bytes recorded so far, following yt-dlp's .part name until it is renamed.
+
+        While yt-dlp downloads separate video and audio formats, the path
+        only appears at the final merge; until then the per-format files
+        (<name>.f<format>.<ext>[.part]) are counted instead.
+        """
+        for candidate in (self.path, self.path + ".part"):
+            try:
+                return os.path.getsize(candidate)
+            except FileNotFoundError:
+                continue
+        total = 0
+        for candidate in glob.glob(glob.escape(os.path.splitext(self.path)[0]) + ".f*"):
+            if "-Frag" in candidate:
+                # Fragments are appended to the format's .part file and deleted
+                continue
+            try:
+                total += os.path.getsize(candidate)
+            except FileNotFoundError:
+                continue
+        return total
+
+    def _adapt(self, rate):
+        steady = (
+            self.last_rate is not None
+            and abs(rate - self.last_rate) <= STEADY_TOLERANCE * max(self.last_rate, 1)
+        )
+        self.interval = min(self.interval * 2, self.max_interval) if steady else self.min_interval
+        self.last_rate = rate
+
+    def sample(self):
+        """Measure progress and write it if it changed; returns False once the job has moved on"""
+        now = time.monotonic()
+        size = self.size()
+        previous_at, previous_size = self.last_sample
+        rate = (size - previous_size) / (now - previous_at) if now > previous_at else 0.0
+        average = size / (now - self.started) if now > self.started else 0.0
+        self.last_sample = (now, size)
+        self._adapt(rate)
+
+        keepalive_due = self.last_write is None or now - self.last_write >= KEEPALIVE_INTERVAL
+        if size == self.written_bytes and not keepalive_due:
+            return True
+        written = self.job.transition("RECORDING", {
+            "lastHeartbeat": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "bytesDownloaded": size,
+            "ingestRate": int(rate),
+            "avgIngestRate": int(average),
+        }, flush=True)
+        self.last_write = now
+        self.written_bytes = size
+        logger.info(f"{size} bytes, {rate / 1e6:.2f} MB/s now, {average / 1e6:.2f} MB/s average, "
+                    f"next sample in {self.interval:.0f}s")
+        return written
+
+
+def run(agent, pid=None):
+    """Sample until the recorder process exits, SIGTERM arrives or the job moves on"""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    while not stopping:
+        try:
+            if not agent.sample():
+                logger.info(f"Job {agent.job.job_id} is no longer RECORDING, stopping")
+                return
+        except Exception as e:
+            # A failed write must not end progress reporting for the rest of the recording
+            logger.warning(f"Error reporting progress: {e}")
+        deadline = time.monotonic() + agent.interval
+        while not stopping and time.monotonic() < deadline:
+            if pid is not None and not _pid_alive(pid):
+                return
+            time.sleep(1)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def main(argv=None):
+    """Report recording progress for a job (used by the recorder container)"""
+    import boto3
+
+    parser = argparse.ArgumentParser(description="Write a recording's progress to its job item")
+    parser.add_argument("job_id")
+    parser.add_argument("path", help="file being recorded")
+    parser.add_argument("--pid", type=int, help="stop once this process exits")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL)
+    parser.add_argument("--max-interval", type=float, default=MAX_INTERVAL)
+    args = parser.parse_args(argv)
+
+    # One client for the whole recording, so every write reuses the same connection
+    dynamodb = boto3.resource(
+        "dynamodb",
+        region_name=os.environ.get("AWS_REGION"),
+        endpoint_url=os.environ.get("AWS_ENDPOINT_URL")
+    )
+    table = dynamodb.Table(os.environ["DDB_TABLE"])
+
+    job = job_state.JobState(table, args.job_id, status="RECORDING", coalesce_seconds=0)
+    run(ProgressAgent(job, args.path, args.min_interval, args.max_interval), args.pid)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import os
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Most records handled at once by one invocation, whatever the budget allows
+MAX_CONCURRENT_RECORDS = int(os.environ.get("MAX_CONCURRENT_RECORDS", "4"))
+
+# Share of the function's memory, or of the free space in /tmp, records may claim
+MEMORY_BUDGET_FRACTION = float(os.environ.get("MEMORY_BUDGET_FRACTION", "0.5"))
+DISK_BUDGET_FRACTION = float(os.environ.get("DISK_BUDGET_FRACTION", "0.8"))
+
+
+def memory_budget(fraction=MEMORY_BUDGET_FRACTION):
+    """Bytes of memory the records of one invocation may use between them"""
+    memory_mb = int(os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "1024"))
+    return int(memory_mb * 1024 * 1024 * fraction)
+
+
+def disk_budget(path, fraction=DISK_BUDGET_FRACTION):
+    """Bytes of the free space at path the records of one invocation may use between them"""
+    return int(shutil.disk_usage(path).free * fraction)
+
+
+class Budget:
+    """Capacity (bytes of memory or disk) shared by the records in flight.
+
+    A record waits until its cost fits next to the others; one that exceeds
+    the whole budget still runs, once nothing else is in flight.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, cost):
+        with self._cond:
+            while self.used and self.used + cost > self.capacity:
+                self._cond.wait()
+            self.used += cost
+
+    def release(self, cost):
+        with self._cond:
+            self.used -= cost
+            self._cond.notify_all()
+
+
+def run(items, work, cost, budget, max_workers=MAX_CONCURRENT_RECORDS):
+    """Call work(item) for every item, up to max_workers at once and within budget.
+
+    Items start in order. An exception from one item is logged and does not
+    affect the others.
+    """
+    def run_one(item, item_cost):
+        try:
+            work(item)
+        except Exception as e:
+            logger.error(f"Error processing {item}: {e}")
+        finally:
+            budget.release(item_cost)
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        for item in items:
+            item_cost = cost(item)
+            budget.acquire(item_cost)
+            executor.submit(run_one, item, item_cost)
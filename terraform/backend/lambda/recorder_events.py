@@ -0,0 +1,113 @@
+import os
+import json
+import logging
+import datetime
+import boto3
+
+import job_state
+import active_recordings
+
+# Configure root logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s %(levelname)s [%(funcName)s] %(message)s'
+)
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+# Initialize AWS clients
+dynamodb = boto3.resource(
+    "dynamodb",
+    region_name=os.environ.get("AWS_REGION"),
+    endpoint_url=os.environ.get("AWS_ENDPOINT_URL")
+)
+table = dynamodb.Table(os.environ["DDB_TABLE"])
+# URL -> job recording it (dispatch_to_ecs); the claim is released once the recorder stops
+active_recordings_table = os.environ.get("ACTIVE_RECORDINGS_TABLE")
+index_table = dynamodb.Table(active_recordings_table) if active_recordings_table else None
+
+container_name = os.environ.get("CONTAINER_NAME", "chronicle-recorder")
+
+
+def record_recorder_exit(job_id, exit_code, reason=None):
+    """Mark a job finished once its recorder has stopped.
+
+    The recorder normally writes its own final status; this only fills in
+    what it could not (e.g. a crash or an OOM kill). The job state machine
+    rejects the write for a job that already reached COMPLETED or FAILED.
+    """
+    job = job_state.JobState(table, job_id)
+    finished = {"finishedAt": datetime.datetime.now().isoformat() + "Z"}
+    if exit_code == 0:
+        recorded = job.transition("COMPLETED", set_once=finished)
+    else:
+        recorded = job.transition(
+            "FAILED",
+            {"error": reason or "Recorder exited with code %d" % exit_code},
+            set_once=finished,
+        )
+    if recorded:
+        logger.info("Job %s recorder exited with code %s", job_id, exit_code)
+    else:
+        logger.info("Job %s already has a final status, ignoring exit code %s", job_id, exit_code)
+    # Either way the job is final now, so a new request for its URL starts a new job
+    release_recording(job_id)
+
+
+def release_recording(job_id):
+    """Drop the job's claim on its URL in the active recordings table.
+
+    A failure is only logged: the claim is also taken over once the job is
+    seen to be final, and expires through the table's TTL.
+    """
+    if index_table is None:
+        return
+    try:
+        item = table.get_item(
+            Key={"jobId": job_id},
+            ProjectionExpression="#u",
+            ExpressionAttributeNames={"#u": "url"},
+        ).get("Item")
+        if item and item.get("url"):
+            active_recordings.release(index_table, item["url"], job_id)
+    except Exception as e:
+        logger.error("Job %s: could not release its active recording: %s", job_id, e)
+
+
+def job_id_from_task(detail):
+    """Read the JOB_ID the dispatcher passed in the task's container overrides"""
+    for override in detail.get("overrides", {}).get("containerOverrides", []):
+        for env in override.get("environment", []):
+            if env.get("name") == "JOB_ID":
+                return env.get("value")
+    return None
+
+
+def exit_code_from_task(detail):
+    """Exit code of the recorder container, or -1 if it never ran"""
+    for container in detail.get("containers", []):
+        if container.get("name") == container_name:
+            return container.get("exitCode", -1)
+    return -1
+
+
+def lambda_handler(event, context):
+    """EventBridge handler for ECS Task State Change events of recorder tasks"""
+    logger.info("START handler; event: %s", json.dumps(event))
+    detail = event.get("detail", {})
+    if detail.get("lastStatus") != "STOPPED":
+        return {"status": "ignored"}
+
+    job_id = job_id_from_task(detail)
+    if not job_id:
+        logger.warning("Task %s has no JOB_ID override, skipping", detail.get("taskArn"))
+        return {"status": "ignored"}
+
+    exit_code = exit_code_from_task(detail)
+    reason = None
+    if exit_code != 0:
+        reason = detail.get("stoppedReason") or "ECS task exited with code %d" % exit_code
+    record_recorder_exit(job_id, exit_code, reason)
+    return {"status": "processed"}
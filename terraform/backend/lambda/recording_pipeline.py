@@ -0,0 +1,147 @@
+import os
+import sys
+import hashlib
+import logging
+import argparse
+
+import torrent
+import hash_engine
+import s3_uploader
+import piece_sidecar
+import tracker_config
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1024 * 1024
+
+# Recordings are usually a few GB; the final size is unknown while recording,
+# so pieces are sized for this expected size unless told otherwise
+EXPECTED_SIZE = 8 * 1024 ** 3
+
+# Bytes at the start of the file re-hashed on finish, since muxers
+# rewrite the header (segment size, seek head, duration) when they close
+HEAD_REHASH_BYTES = 4 * 1024 * 1024
+
+
+class ContentDigests:
+    """Torrent piece hashes and the whole-file SHA-256 of one stream of bytes.
+
+    Fed by s3_uploader.LiveUpload from the reads it makes for the upload,
+    so the recording is read from disk once for all three. Muxers rewrite
+    the header when they close: finish() re-hashes the head pieces, and
+    recomputes the SHA-256 with one more sequential read, since a running
+    digest cannot be patched.
+    """
+
+    def __init__(self, piece_length=None, workers=None):
+        self.piece_length = piece_length or torrent.piece_length_for_size(EXPECTED_SIZE)
+        self.workers = workers
+        self.pieces = None
+        self.reset()
+
+    def reset(self):
+        """Start over (the file was replaced or truncated)"""
+        if self.pieces:
+            # Stops the old hasher's workers
+            self.pieces.digest()
+        self.pieces = hash_engine.ParallelPieceHasher(self.piece_length, self.workers)
+        self.sha256 = hashlib.sha256()
+        self.head = bytearray()
+
+    def update(self, data):
+        """Feed the next bytes of the file"""
+        if len(self.head) < HEAD_REHASH_BYTES:
+            self.head += data[:HEAD_REHASH_BYTES - len(self.head)]
+        self.pieces.update(data)
+        self.sha256.update(data)
+
+    def finish(self, path):
+        """Return (HashResult, SHA-256 hex digest) for the file as it is on disk now"""
+        result = self.pieces.result()
+        sha256 = self.sha256.hexdigest()
+        with open(path, "rb") as f:
+            head = f.read(len(self.head))
+        if head != self.head:
+            logger.info(f"{path}: header was rewritten on close, re-hashing it")
+            head_length = min(-(-len(head) // self.piece_length) * self.piece_length, result.length)
+            head_pieces = hash_engine.hash_file(path, self.piece_length, 1, 0, head_length).pieces
+            result.pieces = head_pieces + result.pieces[len(head_pieces):]
+            sha256 = file_sha256(path)
+        logger.info(f"{path}: {result.report()}, sha256 {sha256}")
+        return result, sha256
+
+
+def file_sha256(path):
+    """SHA-256 of a file on disk"""
+    digest = hashlib.sha256()
+    with open(path, "rb", buffering=0) as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    """Upload, piece-hash and checksum a recording in one read (used by the recorder container)"""
+    import boto3
+    from botocore.config import Config
+
+    parser = argparse.ArgumentParser(
+        description="Upload a recording while it is written, building its torrent and SHA-256 from the same reads")
+    parser.add_argument("path")
+    parser.add_argument("bucket")
+    parser.add_argument("key")
+    parser.add_argument("--follow", type=int, required=True, metavar="PID",
+                        help="process writing the file; the pipeline finishes once it exits")
+    parser.add_argument("--checkpoint", help="upload resume state file (default: <path>.upload)")
+    parser.add_argument("--part-size", type=int, default=s3_uploader.DEFAULT_PART_SIZE)
+    parser.add_argument("--concurrency", type=int, default=s3_uploader.DEFAULT_CONCURRENCY)
+    parser.add_argument("--piece-length", type=int)
+    parser.add_argument("-o", "--torrent-output", required=True, help="where to write the .torrent")
+    parser.add_argument("-t", "--tracker", action="append",
+                        help="tracker URL, one tier each (repeatable; default: $TRACKERS or tracker-config.json)")
+    parser.add_argument("-w", "--web-seed", action="append",
+                        help="web seed base URL (repeatable; default: $WEB_SEED_URLS or tracker-config.json)")
+    parser.add_argument("-c", "--comment")
+    parser.add_argument("--sha256-output", required=True, help="file the SHA-256 hex digest is written to")
+    args = parser.parse_args(argv)
+
+    s3_client = boto3.client(
+        "s3",
+        region_name=os.environ.get("AWS_REGION"),
+        endpoint_url=os.environ.get("AWS_ENDPOINT_URL"),
+        config=Config(max_pool_connections=max(args.concurrency, 10), retries={"mode": "adaptive"}),
+    )
+    digests = ContentDigests(args.piece_length)
+    live = s3_uploader.LiveUpload(s3_client, args.path, args.bucket, args.key, args.part_size,
+                                  args.concurrency, args.checkpoint, consumer=digests)
+    uploaded = s3_uploader.follow(live, args.follow)
+    if uploaded is None:
+        logger.info(f"Stopped before {args.path} was complete; the upload is left open for a resume")
+        return 1
+
+    result, sha256 = digests.finish(args.path)
+    config = tracker_config.load()
+    torrent_bytes = torrent.build_torrent(
+        name=os.path.basename(args.path),
+        length=result.length,
+        piece_length=result.piece_length,
+        pieces=result.pieces,
+        trackers=tracker_config.announce_tiers(config, args.tracker),
+        comment=args.comment,
+        web_seeds=tracker_config.web_seeds(args.bucket, args.key, config, args.web_seed)
+    )
+    with open(args.torrent_output, "wb") as f:
+        f.write(torrent_bytes)
+    # Lets the torrent be regenerated later (new trackers, lost torrent) without rehashing
+    piece_sidecar.save(s3_client, args.bucket, args.key, {"ETag": uploaded.etag, "ContentLength": result.length},
+                       piece_sidecar.Sidecar.from_result(result, sha256))
+    with open(args.sha256_output, "w") as f:
+        f.write(sha256 + "\n")
+    print(uploaded.report())
+    print(result.report())
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
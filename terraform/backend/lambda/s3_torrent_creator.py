@@ -2,11 +2,18 @@ import os
 import json
 import logging
 import time
+import uuid
 import urllib.parse
-import tempfile
-import subprocess
 import boto3
-from botocore.exceptions import ClientError
+
+import clients
+import torrent
+import job_state
+import hash_engine
+import torrent_index
+import piece_sidecar
+import tracker_config
+import record_pool
 
 # Configure root logger
 logger = logging.getLogger()
@@ -19,124 +26,227 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 # Environment variables
-TRACKERS = os.environ.get('TRACKERS', 'udp://23.252.56.60:6969')
+# Announce tiers and web seed base URLs from tracker-config.json ($TRACKERS and
+# $WEB_SEED_URLS override them), read once per container
+TRACKER_CONFIG = tracker_config.load()
+ANNOUNCE_TIERS = tracker_config.announce_tiers(TRACKER_CONFIG)
 s3_bucket_name = os.environ.get('S3_BUCKET')
+# Size of each ranged GET and of the chunks read from its body while hashing
+RANGE_SIZE = int(os.environ.get('RANGE_SIZE', str(16 * 1024 * 1024)))
+READ_CHUNK_SIZE = 1024 * 1024
+# Hashing stops at a piece boundary when less than this is left of the invocation;
+# progress is checkpointed to S3 and a new invocation carries on from there
+CONTINUATION_MARGIN_MS = int(os.environ.get('CONTINUATION_MARGIN_MS', '60000'))
+
+# Objects are processed on record_pool worker threads, which each get their
+# own jobs Table from clients.table (boto3 resources are not thread safe)
+ddb_table = os.environ["DDB_TABLE"]
 
 # Initialize AWS clients
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=os.environ.get("AWS_REGION")
-)
-table = dynamodb.Table(os.environ["DDB_TABLE"])
 s3_client = boto3.client(
     "s3",
     region_name=os.environ.get("AWS_REGION")
 )
+# Reused across warm invocations so known torrents and the watch folder are not looked up again
+index = torrent_index.TorrentIndex(s3_client)
+# Created on first use: only invocations that hand over to a continuation need it
+lambda_client = None
+
+# Returned by create_torrent_file when the work was handed to a new invocation
+CONTINUED = "CONTINUED"
 
-def update_job_status(job_id, status, details=None):
-    """Update DynamoDB with torrent creation status"""
+def update_job_status(job, status, details=None):
+    """Move the job to status through the shared job state machine"""
     try:
-        update_expression = "SET #status = :status, lastUpdatedAt = :time"
-        expression_attr_names = {"#status": "status"}
-        expression_attr_values = {
-            ":status": status,
-            ":time": int(time.time())
-        }
-        
-        if details:
-            update_expression += ", details = :details"
-            expression_attr_values[":details"] = json.dumps(details)
-
-        table.update_item(
-            Key={"jobId": job_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_attr_names,
-            ExpressionAttributeValues=expression_attr_values
-        )
-        logger.info(f"Updated job {job_id} status to {status}")
+        attributes = {"details": json.dumps(details)} if details else None
+        job.transition(status, attributes)
     except Exception as e:
         logger.error(f"Error updating DynamoDB: {e}")
 
-def create_torrent_file(local_file_path, s3_key):
-    """Create a torrent file from the downloaded S3 file"""
-    torrent_filename = os.path.basename(local_file_path) + '.torrent'
-    torrent_path = os.path.join(tempfile.gettempdir(), torrent_filename)
-    
+def iter_s3_object(bucket, key, size, etag, offset=0):
+    """Yield the object's bytes from offset on using ranged GETs, pinned to a single ETag"""
+    while offset < size:
+        end = min(offset + RANGE_SIZE, size) - 1
+        response = s3_client.get_object(
+            Bucket=bucket,
+            Key=key,
+            Range=f"bytes={offset}-{end}",
+            IfMatch=etag
+        )
+        for chunk in response['Body'].iter_chunks(READ_CHUNK_SIZE):
+            offset += len(chunk)
+            yield chunk
+        if offset <= end:
+            raise IOError(f"Short read for s3://{bucket}/{key} at offset {offset}")
+
+def hash_object(s3_bucket, s3_key, head, job, remaining_ms=None):
+    """Hash the object from its checkpoint on and return its piece_sidecar.Sidecar.
+
+    If the invocation runs short of time (remaining_ms() below
+    CONTINUATION_MARGIN_MS) the sidecar covers only part of the object and
+    has been checkpointed to S3 for the next invocation.
+    """
+    size = head['ContentLength']
+    checkpoint = piece_sidecar.load_checkpoint(s3_client, s3_bucket, head)
+    if checkpoint:
+        logger.info(f"Resuming {s3_key} at byte {checkpoint.length} of {size}")
+        start, piece_length, pieces = checkpoint.length, checkpoint.piece_length, checkpoint.pieces
+    else:
+        start, piece_length, pieces = 0, torrent.piece_length_for_size(size), b""
+
+    hasher = hash_engine.ParallelPieceHasher(piece_length)
+    offset = start
+    stop_at = size
+    for chunk in iter_s3_object(s3_bucket, s3_key, size, head['ETag'], start):
+        chunk = chunk[:stop_at - offset]
+        hasher.update(chunk)
+        offset += len(chunk)
+        if offset >= stop_at:
+            break
+        if stop_at == size and remaining_ms and remaining_ms() < CONTINUATION_MARGIN_MS:
+            # Finish the current piece so the checkpoint only holds whole pieces
+            stop_at = min(-(-offset // piece_length) * piece_length, size)
+            if offset >= stop_at:
+                break
+    result = hasher.result()
+    logger.info(f"{s3_key}: {result.report()}, peak RSS {hash_engine.peak_rss_mb():.0f} MB")
+    sidecar = piece_sidecar.Sidecar(piece_length, offset, pieces + result.pieces)
+
+    if offset < size:
+        if offset == start:
+            raise IOError(f"No progress hashing {s3_key} in this invocation, not continuing")
+        piece_sidecar.save_checkpoint(s3_client, s3_bucket, head, sidecar)
+        job.update({"hashedBytes": offset}, flush=True)
+    elif checkpoint:
+        piece_sidecar.delete_checkpoint(s3_client, s3_bucket, head)
+    return sidecar
+
+def hashing_memory(size):
+    """Bytes hash_object buffers for an object of size bytes (the in-flight pieces plus a read)"""
+    piece_length = torrent.piece_length_for_size(size)
+    return piece_length * (2 * hash_engine.default_workers() + 1) + READ_CHUNK_SIZE
+
+def continue_in_new_invocation(context, s3_bucket, s3_key, job_id):
+    """Invoke this function again (asynchronously) to carry on from the checkpoint"""
+    global lambda_client
+    if lambda_client is None:
+        lambda_client = boto3.client("lambda", region_name=os.environ.get("AWS_REGION"))
+    lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps({"continuation": {"bucket": s3_bucket, "key": s3_key, "jobId": job_id}})
+    )
+    logger.info(f"Handed {s3_key} over to a new invocation")
+
+def create_torrent_file(s3_bucket, s3_key, job, context=None):
+    """Create torrent bytes from the object's piece sidecar, or by hashing it as it streams in.
+
+    Returns CONTINUED if hashing did not fit in this invocation and was handed over.
+    """
     try:
-        # Create tracker arguments from comma-separated list
-        tracker_args = []
-        for tracker in TRACKERS.split(','):
-            tracker = tracker.strip()
-            if tracker:
-                tracker_args.extend(['-t', tracker])
-        
-        # Create the torrent file using transmission-create
-        cmd = [
-            'transmission-create',
-            '-o', torrent_path,
-            '-c', f"File from S3: {s3_key}"
-        ]
-        cmd.extend(tracker_args)
-        cmd.append(local_file_path)
-        
-        logger.info(f"Running command: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            logger.error(f"Error creating torrent: {result.stderr}")
-            return None
-        
-        logger.info(f"Created torrent file at {torrent_path}")
-        return torrent_path
+        head = s3_client.head_object(Bucket=s3_bucket, Key=s3_key)
+        name = os.path.basename(s3_key)
+        comment = f"File from S3: {s3_key}"
+        web_seeds = tracker_config.web_seeds(s3_bucket, s3_key, TRACKER_CONFIG)
+
+        sidecar = piece_sidecar.load(s3_client, s3_bucket, s3_key, head)
+        if sidecar:
+            torrent_bytes = sidecar.build_torrent(name, ANNOUNCE_TIERS, comment, web_seeds)
+            logger.info(f"Rebuilt torrent for {s3_key} from its piece sidecar ({len(torrent_bytes)} byte torrent)")
+            return torrent_bytes
+
+        sidecar = hash_object(s3_bucket, s3_key, head, job,
+                              context.get_remaining_time_in_millis if context else None)
+        if sidecar.length < head['ContentLength']:
+            continue_in_new_invocation(context, s3_bucket, s3_key, job.job_id)
+            return CONTINUED
+
+        piece_sidecar.save(s3_client, s3_bucket, s3_key, head, sidecar)
+        torrent_bytes = sidecar.build_torrent(name, ANNOUNCE_TIERS, comment, web_seeds)
+        logger.info(f"Created torrent for {s3_key} ({head['ContentLength']} bytes, {len(torrent_bytes)} byte torrent)")
+        return torrent_bytes
     except Exception as e:
         logger.error(f"Error creating torrent: {e}")
         return None
 
-def ensure_watch_folder_exists(bucket_name):
-    """Create the watch folder in S3 if it doesn't exist"""
+def process_object(s3_bucket, s3_key, context=None, job_id=None):
+    """Create and upload the torrent for one new S3 object, tracking it as a job.
+
+    job_id is set when continuing the job of an earlier invocation.
+    """
+    watch_torrent_s3_key = torrent_index.watch_torrent_key(s3_key)
+    table = clients.table(ddb_table)
+    if job_id:
+        job = job_state.JobState(table, job_id, status="CREATING_TORRENT")
+    else:
+        # Unique per object and event, so no two objects share a job record
+        job_id = f"s3-torrent-{uuid.uuid4()}"
+        
+        # Create the job record; coalesced with the CREATING_TORRENT transition below
+        job = job_state.JobState(table, job_id)
+        try:
+            now = int(time.time())
+            job.transition(
+                "STARTED",
+                {"s3Key": s3_key, "s3Bucket": s3_bucket, "startedAt": now},
+                set_once={"createdAt": now}
+            )
+        except Exception as e:
+            logger.error(f"Error creating DynamoDB record: {e}")
+    
+    # Stream the object from S3 and hash it
     try:
-        # Check if folder exists by listing objects with prefix
-        response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix="watch/",
-            MaxKeys=1
+        update_job_status(job, "CREATING_TORRENT", {"s3_key": s3_key})
+        torrent_bytes = create_torrent_file(s3_bucket, s3_key, job, context)
+        if torrent_bytes == CONTINUED:
+            return
+        if not torrent_bytes:
+            update_job_status(job, "FAILED", {"error": "Failed to create torrent file"})
+            return
+        
+        # Upload torrent back to S3
+        update_job_status(job, "UPLOADING_TORRENT")
+        
+        # Store torrent in the "watch" subfolder
+        logger.info(f"Uploading torrent to S3 watch folder: {watch_torrent_s3_key}")
+        s3_client.put_object(
+            Bucket=s3_bucket,
+            Key=watch_torrent_s3_key,
+            Body=torrent_bytes,
+            ContentType='application/x-bittorrent'
         )
+        index.add(s3_bucket, watch_torrent_s3_key)
+        
+        # Set public read access if needed
+        # s3_client.put_object_acl(Bucket=s3_bucket, Key=watch_torrent_s3_key, ACL='public-read')
+        
+        # Success
+        update_job_status(job, "COMPLETED", {
+            "torrent_s3_key": watch_torrent_s3_key,
+            "original_s3_key": s3_key
+        })
+        logger.info(f"Successfully created and uploaded torrent for {s3_key}")
         
-        # If folder doesn't exist, create it
-        if 'Contents' not in response or not response['Contents']:
-            logger.info(f"Creating watch folder in bucket {bucket_name}")
-            # Create an empty object with the folder name as the key
-            s3_client.put_object(
-                Bucket=bucket_name,
-                Key="watch/"
-            )
-            logger.info(f"Watch folder created in bucket {bucket_name}")
-        else:
-            logger.info(f"Watch folder already exists in bucket {bucket_name}")
-            
     except Exception as e:
-        logger.error(f"Error ensuring watch folder exists: {e}")
-        # Don't raise the exception, as this is not critical for the main flow
+        logger.error(f"Error processing {s3_key}: {e}")
+        update_job_status(job, "FAILED", {"error": str(e)})
 
 def lambda_handler(event, context):
     """Lambda handler for S3 event triggers"""
     logger.info(f"START handler; event: {json.dumps(event)}")
     
-    # Check if transmission-create is available
-    try:
-        result = subprocess.run(
-            ['transmission-create', '--version'],
-            capture_output=True, text=True
-        )
-        logger.info(f"transmission-create version: {result.stdout.strip()}")
-    except Exception as e:
-        logger.error(f"transmission-create not available: {e}")
+    # A continuation of an object an earlier invocation ran out of time on
+    continuation = event.get('continuation')
+    if continuation:
+        process_object(continuation['bucket'], continuation['key'], context, continuation['jobId'])
         return {
-            'statusCode': 500,
-            'body': json.dumps('transmission-create not available')
+            'statusCode': 200,
+            'body': json.dumps('Torrent creation continued')
         }
     
-    # Process each record in the event
+    # Collect the new objects in the event, grouped by bucket, with their sizes
+    objects = {}
+    sizes = {}
     for record in event.get('Records', []):
         # Skip if not an S3 event
         if record.get('eventSource') != 'aws:s3':
@@ -146,104 +256,35 @@ def lambda_handler(event, context):
         s3_bucket = record['s3']['bucket']['name']
         s3_key = urllib.parse.unquote_plus(record['s3']['object']['key'])
         
-        # Ensure the watch folder exists
-        ensure_watch_folder_exists(s3_bucket)
-        
-        # Skip torrent files
-        if s3_key.endswith('.torrent'):
+        # Skip torrent files and piece sidecars
+        if s3_key.endswith(('.torrent', piece_sidecar.SUFFIX)):
             logger.info(f"Skipping torrent file: {s3_key}")
             continue
-            
-        # Skip if torrent already exists in original location or watch folder
-        torrent_s3_key = s3_key + '.torrent'
-        watch_torrent_s3_key = f"watch/{os.path.basename(s3_key)}.torrent"
-        
-        torrent_exists = False
-        try:
-            # Check original location
-            s3_client.head_object(Bucket=s3_bucket, Key=torrent_s3_key)
-            logger.info(f"Torrent already exists for {s3_key} at {torrent_s3_key}, skipping")
-            torrent_exists = True
-        except ClientError as e:
-            if e.response['Error']['Code'] != '404':
-                logger.error(f"Error checking if torrent exists: {e}")
-                continue
-                
-        if not torrent_exists:
-            try:
-                # Check watch folder
-                s3_client.head_object(Bucket=s3_bucket, Key=watch_torrent_s3_key)
-                logger.info(f"Torrent already exists for {s3_key} in watch folder at {watch_torrent_s3_key}, skipping")
-                torrent_exists = True
-            except ClientError as e:
-                if e.response['Error']['Code'] != '404':
-                    logger.error(f"Error checking if torrent exists in watch folder: {e}")
-                    continue
-        
-        if torrent_exists:
-            continue
-        
-        job_id = f"s3-torrent-{int(time.time())}-{os.path.basename(s3_key)}"
-        
-        # Create initial record in DynamoDB
-        try:
-            now = int(time.time())
-            table.put_item(Item={
-                "jobId": job_id,
-                "s3Key": s3_key,
-                "s3Bucket": s3_bucket,
-                "status": "STARTED",
-                "createdAt": now,
-                "startedAt": now
-            })
-        except Exception as e:
-            logger.error(f"Error creating DynamoDB record: {e}")
+        objects.setdefault(s3_bucket, []).append(s3_key)
+        sizes[(s3_bucket, s3_key)] = record['s3']['object'].get('size', 0)
+    
+    records = []
+    for s3_bucket, s3_keys in objects.items():
+        # Ensure the watch folder exists
+        index.ensure_watch_folder(s3_bucket)
         
-        # Download the file from S3
-        try:
-            file_extension = os.path.splitext(s3_key)[1]
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-                local_file_path = tmp_file.name
-            
-            logger.info(f"Downloading {s3_key} to {local_file_path}")
-            update_job_status(job_id, "DOWNLOADING", {"s3_key": s3_key})
-            s3_client.download_file(s3_bucket, s3_key, local_file_path)
-            
-            # Create torrent file
-            update_job_status(job_id, "CREATING_TORRENT")
-            torrent_path = create_torrent_file(local_file_path, s3_key)
-            if not torrent_path:
-                update_job_status(job_id, "FAILED", {"error": "Failed to create torrent file"})
+        # Skip objects whose torrent already exists in the original location or watch folder
+        existing = index.existing(s3_bucket, s3_keys)
+        for s3_key in s3_keys:
+            if s3_key in existing:
+                logger.info(f"Torrent already exists for {s3_key} at {existing[s3_key]}, skipping")
                 continue
-            
-            # Upload torrent back to S3
-            update_job_status(job_id, "UPLOADING_TORRENT")
-            
-            # Store torrent in the "watch" subfolder
-            logger.info(f"Uploading torrent to S3 watch folder: {watch_torrent_s3_key}")
-            s3_client.upload_file(torrent_path, s3_bucket, watch_torrent_s3_key)
-            
-            # Set public read access if needed
-            # s3_client.put_object_acl(Bucket=s3_bucket, Key=watch_torrent_s3_key, ACL='public-read')
-            
-            # Success
-            update_job_status(job_id, "COMPLETED", {
-                "torrent_s3_key": watch_torrent_s3_key,
-                "original_s3_key": s3_key
-            })
-            logger.info(f"Successfully created and uploaded torrent for {s3_key}")
-            
-        except Exception as e:
-            logger.error(f"Error processing {s3_key}: {e}")
-            update_job_status(job_id, "FAILED", {"error": str(e)})
-        finally:
-            # Clean up temporary files
-            if 'local_file_path' in locals() and os.path.exists(local_file_path):
-                os.unlink(local_file_path)
-            if 'torrent_path' in locals() and torrent_path and os.path.exists(torrent_path):
-                os.unlink(torrent_path)
+            records.append((s3_bucket, s3_key))
+    
+    # Hash several objects at once, as many as fit in the function's memory
+    record_pool.run(
+        records,
+        lambda record: process_object(record[0], record[1], context),
+        lambda record: hashing_memory(sizes[record]),
+        record_pool.Budget(record_pool.memory_budget())
+    )
     
     return {
         'statusCode': 200,
         'body': json.dumps('Torrent creation completed')
-    } 
\ No newline at end of file
+    }
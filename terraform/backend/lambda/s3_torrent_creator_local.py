@@ -2,11 +2,22 @@ import os
 import json
 import logging
 import time
+import uuid
 import urllib.parse
 import tempfile
 import boto3
 from botocore.exceptions import ClientError
 
+import clients
+import torrent
+import job_state
+import hash_engine
+import torrent_index
+import piece_sidecar
+import tracker_config
+import record_pool
+import s3_uploader
+
 # Configure root logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -18,43 +29,36 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 # Environment variables
-TRACKERS = os.environ.get('TRACKERS', 'udp://23.252.56.60:6969')
+# Announce tiers and web seed base URLs from tracker-config.json ($TRACKERS and
+# $WEB_SEED_URLS override them), read once per container
+TRACKER_CONFIG = tracker_config.load()
+ANNOUNCE_TIERS = tracker_config.announce_tiers(TRACKER_CONFIG)
 s3_bucket_name = os.environ.get('S3_BUCKET')
 
+# Size of each read from the downloaded file while hashing
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Objects are processed on record_pool worker threads, which each get their
+# own jobs Table from clients.table (boto3 resources are not thread safe)
+ddb_table = os.environ.get("DDB_TABLE", "jobs")
+
 # Initialize AWS clients
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=os.environ.get("AWS_REGION", "us-west-1"),
-    endpoint_url=os.environ.get("AWS_ENDPOINT_URL", "http://localhost:4566")
-)
-table = dynamodb.Table(os.environ.get("DDB_TABLE", "jobs"))
 s3_client = boto3.client(
     "s3",
     region_name=os.environ.get("AWS_REGION", "us-west-1"),
     endpoint_url=os.environ.get("AWS_ENDPOINT_URL", "http://localhost:4566")
 )
+# Reused across warm invocations so known torrents and the watch folder are not looked up again
+index = torrent_index.TorrentIndex(s3_client)
 
-def update_job_status(job_id, status, details=None):
-    """Update DynamoDB with torrent creation status"""
-    try:
-        update_expression = "SET #status = :status, lastUpdatedAt = :time"
-        expression_attr_names = {"#status": "status"}
-        expression_attr_values = {
-            ":status": status,
-            ":time": int(time.time())
-        }
-        
-        if details:
-            update_expression += ", details = :details"
-            expression_attr_values[":details"] = json.dumps(details)
+# Set once the jobs table is known to exist; warm invocations skip describe_table
+table_checked = False
 
-        table.update_item(
-            Key={"jobId": job_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_attr_names,
-            ExpressionAttributeValues=expression_attr_values
-        )
-        logger.info(f"Updated job {job_id} status to {status}")
+def update_job_status(job, status, details=None):
+    """Move the job to status through the shared job state machine"""
+    try:
+        attributes = {"details": json.dumps(details)} if details else None
+        job.transition(status, attributes)
     except ClientError as e:
         error_code = e.response['Error']['Code']
         error_message = e.response['Error']['Message']
@@ -62,47 +66,98 @@ def update_job_status(job_id, status, details=None):
     except Exception as e:
         logger.error(f"Error updating DynamoDB: {str(e)}")
 
-def create_torrent_file_mock(local_file_path, s3_key):
-    """Mock creating a torrent file (for LocalStack testing only)"""
-    torrent_filename = os.path.basename(local_file_path) + '.torrent'
-    torrent_path = os.path.join(tempfile.gettempdir(), torrent_filename)
+def iter_file(path):
+    """Read a local file in READ_CHUNK_SIZE chunks"""
+    with open(path, 'rb', buffering=0) as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            yield chunk
+
+def create_torrent_file(local_file_path, s3_bucket, s3_key, head, sidecar=None):
+    """Create a torrent with the same builder as the Lambda creator, from the sidecar if there is one"""
+    torrent_path = None
     
     try:
-        # Create a simple mock torrent file 
-        with open(torrent_path, 'w') as f:
-            f.write(f"d8:announce{len(TRACKERS.split(',')[0])}:{TRACKERS.split(',')[0]}10:created by16:Chronicle Torrent4:infod6:lengthi{os.path.getsize(local_file_path)}e4:name{len(os.path.basename(local_file_path))}:{os.path.basename(local_file_path)}12:piece lengthi16384eee")
+        # Unique per record, since records with the same file name can run at once
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.torrent') as tmp_file:
+            torrent_path = tmp_file.name
+        comment = f"File from S3: {s3_key}"
+        web_seeds = tracker_config.web_seeds(s3_bucket, s3_key, TRACKER_CONFIG)
+        if sidecar:
+            torrent_bytes = sidecar.build_torrent(os.path.basename(s3_key), ANNOUNCE_TIERS, comment, web_seeds)
+            logger.info(f"Rebuilt torrent for {s3_key} from its piece sidecar")
+        else:
+            torrent_bytes, result = torrent.create_torrent(
+                name=os.path.basename(s3_key),
+                size=os.path.getsize(local_file_path),
+                chunks=iter_file(local_file_path),
+                trackers=ANNOUNCE_TIERS,
+                comment=comment,
+                web_seeds=web_seeds
+            )
+            logger.info(f"{s3_key}: {result.report()}, peak RSS {hash_engine.peak_rss_mb():.0f} MB")
+            piece_sidecar.save(s3_client, s3_bucket, s3_key, head, piece_sidecar.Sidecar.from_result(result))
+        with open(torrent_path, 'wb') as f:
+            f.write(torrent_bytes)
         
-        logger.info(f"Created mock torrent file at {torrent_path}")
+        logger.info(f"Created torrent file at {torrent_path} ({len(torrent_bytes)} bytes)")
         return torrent_path
     except Exception as e:
-        logger.error(f"Error creating mock torrent file: {str(e)}")
+        logger.error(f"Error creating torrent file: {str(e)}")
+        if torrent_path and os.path.exists(torrent_path):
+            os.unlink(torrent_path)
         return None
 
 def check_dynamodb_table():
-    """Verify DynamoDB table exists and create it if missing"""
-    table_name = os.environ.get("DDB_TABLE", "jobs")
+    """Verify DynamoDB table exists and create it if missing (once per container)"""
+    global table_checked
+    if table_checked:
+        return True
+    table_name = ddb_table
+    dynamodb = clients.client("dynamodb")
     try:
         # Check if table exists
-        dynamodb.meta.client.describe_table(TableName=table_name)
+        dynamodb.describe_table(TableName=table_name)
         logger.info(f"DynamoDB table {table_name} exists")
+        table_checked = True
         return True
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceNotFoundException':
             logger.warning(f"DynamoDB table {table_name} not found, creating...")
             try:
                 # Create table if it doesn't exist
-                table = dynamodb.create_table(
+                dynamodb.create_table(
                     TableName=table_name,
                     KeySchema=[
                         {'AttributeName': 'jobId', 'KeyType': 'HASH'}
                     ],
                     AttributeDefinitions=[
-                        {'AttributeName': 'jobId', 'AttributeType': 'S'}
+                        {'AttributeName': 'jobId', 'AttributeType': 'S'},
+                        {'AttributeName': 'status', 'AttributeType': 'S'},
+                        {'AttributeName': 'createdAt', 'AttributeType': 'N'},
+                        {'AttributeName': 'lastUpdatedAt', 'AttributeType': 'N'}
                     ],
+                    GlobalSecondaryIndexes=[{
+                        'IndexName': 'status-createdAt-index',
+                        'KeySchema': [
+                            {'AttributeName': 'status', 'KeyType': 'HASH'},
+                            {'AttributeName': 'createdAt', 'KeyType': 'RANGE'}
+                        ],
+                        'Projection': {'ProjectionType': 'ALL'},
+                        'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+                    }, {
+                        'IndexName': 'status-lastUpdatedAt-index',
+                        'KeySchema': [
+                            {'AttributeName': 'status', 'KeyType': 'HASH'},
+                            {'AttributeName': 'lastUpdatedAt', 'KeyType': 'RANGE'}
+                        ],
+                        'Projection': {'ProjectionType': 'ALL'},
+                        'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+                    }],
                     ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
                 )
-                table.meta.client.get_waiter('table_exists').wait(TableName=table_name)
+                dynamodb.get_waiter('table_exists').wait(TableName=table_name)
                 logger.info(f"Created DynamoDB table {table_name}")
+                table_checked = True
                 return True
             except Exception as create_error:
                 logger.error(f"Failed to create DynamoDB table: {str(create_error)}")
@@ -111,31 +166,118 @@ def check_dynamodb_table():
             logger.error(f"Error checking DynamoDB table: {e.response['Error']['Code']} - {e.response['Error']['Message']}")
             return False
 
-def ensure_watch_folder_exists(bucket_name):
-    """Create the watch folder in S3 if it doesn't exist"""
+def process_object(s3_bucket, s3_key):
+    """Download one new S3 object, create its torrent and upload it, tracking it as a job"""
+    watch_torrent_s3_key = torrent_index.watch_torrent_key(s3_key)
+    # Unique per object and event, so no two objects share a job record
+    job_id = f"s3-torrent-{uuid.uuid4()}"
+    
+    # Create initial record in DynamoDB
     try:
-        # Check if folder exists by listing objects with prefix
-        response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix="watch/",
-            MaxKeys=1
+        now = int(time.time())
+        
+        # Create the job record; it is coalesced with the quick transitions that
+        # follow, and the conditional write leaves a job that already moved on alone
+        job = job_state.JobState(clients.table(ddb_table), job_id)
+        job.transition(
+            "STARTED",
+            {"s3Key": s3_key, "s3Bucket": s3_bucket, "startedAt": now},
+            set_once={"createdAt": now}
         )
+        # Only queued here: the record reaches DynamoDB with the first flush
+        logger.info(f"Job {job_id} for {s3_key} started (record written within {job.coalesce_seconds}s)")
+    except ClientError as e:
+        logger.error(f"DynamoDB error creating job: {e.response['Error']['Code']} - {e.response['Error']['Message']}")
+        return
+    except Exception as e:
+        logger.error(f"Error creating DynamoDB record: {str(e)}")
+        return
+    
+    # Download the file from S3
+    local_file_path = None
+    torrent_path = None
+    
+    try:
+        # Piece hashes stored for this object (or identical content) make the download unnecessary
+        head = s3_client.head_object(Bucket=s3_bucket, Key=s3_key)
+        sidecar = piece_sidecar.load(s3_client, s3_bucket, s3_key, head)
+        if sidecar is None:
+            file_extension = os.path.splitext(s3_key)[1]
+            with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
+                local_file_path = tmp_file.name
+        
+            logger.info(f"Downloading {s3_key} to {local_file_path}")
+            update_job_status(job, "DOWNLOADING", {"s3_key": s3_key})
+        
+            try:
+                s3_client.download_file(s3_bucket, s3_key, local_file_path)
+            except ClientError as e:
+                error_msg = f"S3 download error: {e.response['Error']['Code']} - {e.response['Error']['Message']}"
+                logger.error(error_msg)
+                update_job_status(job, "FAILED", {"error": error_msg})
+                return
+        
+            # Check if file was downloaded successfully
+            if not os.path.exists(local_file_path) or os.path.getsize(local_file_path) == 0:
+                error_msg = f"Downloaded file is empty or missing: {local_file_path}"
+                logger.error(error_msg)
+                update_job_status(job, "FAILED", {"error": error_msg})
+                return
+        
+        # Create the torrent file from the sidecar or the downloaded copy
+        update_job_status(job, "CREATING_TORRENT")
+        torrent_path = create_torrent_file(local_file_path, s3_bucket, s3_key, head, sidecar)
+        if not torrent_path:
+            update_job_status(job, "FAILED", {"error": "Failed to create torrent file"})
+            return
+        
+        # Check if torrent file was created successfully
+        if not os.path.exists(torrent_path) or os.path.getsize(torrent_path) == 0:
+            error_msg = "Generated torrent file is empty or missing"
+            logger.error(error_msg)
+            update_job_status(job, "FAILED", {"error": error_msg})
+            return
+        
+        # Upload torrent back to S3
+        update_job_status(job, "UPLOADING_TORRENT")
+        
+        # Store torrent in the "watch" subfolder
+        logger.info(f"Uploading torrent to S3 watch folder: {watch_torrent_s3_key}")
+        
+        try:
+            # The batch lookup already skipped objects with a torrent; a concurrent
+            # creator can only race us to an equivalent torrent, so just upload
+            s3_uploader.upload_file(s3_client, torrent_path, s3_bucket, watch_torrent_s3_key,
+                                    extra_args={"ContentType": "application/x-bittorrent"})
+            index.add(s3_bucket, watch_torrent_s3_key)
+        except ClientError as e:
+            error_msg = f"S3 upload error: {e.response['Error']['Code']} - {e.response['Error']['Message']}"
+            logger.error(error_msg)
+            update_job_status(job, "FAILED", {"error": error_msg})
+            return
+        
+        # Success
+        update_job_status(job, "COMPLETED", {
+            "torrent_s3_key": watch_torrent_s3_key,
+            "original_s3_key": s3_key
+        })
+        logger.info(f"Successfully created and uploaded torrent for {s3_key}")
         
-        # If folder doesn't exist, create it
-        if 'Contents' not in response or not response['Contents']:
-            logger.info(f"Creating watch folder in bucket {bucket_name}")
-            # Create an empty object with the folder name as the key
-            s3_client.put_object(
-                Bucket=bucket_name,
-                Key="watch/"
-            )
-            logger.info(f"Watch folder created in bucket {bucket_name}")
-        else:
-            logger.info(f"Watch folder already exists in bucket {bucket_name}")
-            
     except Exception as e:
-        logger.error(f"Error ensuring watch folder exists: {str(e)}")
-        # Don't raise the exception, as this is not critical for the main flow
+        logger.error(f"Error processing {s3_key}: {str(e)}")
+        update_job_status(job, "FAILED", {"error": str(e)})
+    finally:
+        # Clean up temporary files
+        try:
+            if local_file_path and os.path.exists(local_file_path):
+                os.unlink(local_file_path)
+                logger.debug(f"Removed temporary file: {local_file_path}")
+            
+            if torrent_path and os.path.exists(torrent_path):
+                os.unlink(torrent_path)
+                logger.debug(f"Removed temporary torrent file: {torrent_path}")
+        except Exception as cleanup_error:
+            logger.warning(f"Error cleaning up temporary files: {str(cleanup_error)}")
 
 def lambda_handler(event, context):
     """Lambda handler for S3 event triggers"""
@@ -149,7 +291,9 @@ def lambda_handler(event, context):
             'body': json.dumps('Failed to verify DynamoDB table')
         }
     
-    # Process each record in the event
+    # Collect the new objects in the event, grouped by bucket, with their sizes
+    objects = {}
+    sizes = {}
     for record in event.get('Records', []):
         # Skip if not an S3 event
         if record.get('eventSource') != 'aws:s3':
@@ -160,172 +304,33 @@ def lambda_handler(event, context):
         s3_bucket = record['s3']['bucket']['name']
         s3_key = urllib.parse.unquote_plus(record['s3']['object']['key'])
         
-        # Ensure the watch folder exists
-        ensure_watch_folder_exists(s3_bucket)
-        
-        # Skip torrent files
-        if s3_key.endswith('.torrent'):
+        # Skip torrent files and piece sidecars
+        if s3_key.endswith(('.torrent', piece_sidecar.SUFFIX)):
             logger.info(f"Skipping torrent file: {s3_key}")
             continue
-            
-        # Skip if torrent already exists in original location or watch folder
-        torrent_s3_key = s3_key + '.torrent'
-        watch_torrent_s3_key = f"watch/{os.path.basename(s3_key)}.torrent"
-        
-        torrent_exists = False
-        try:
-            # Check original location
-            s3_client.head_object(Bucket=s3_bucket, Key=torrent_s3_key)
-            logger.info(f"Torrent already exists for {s3_key} at {torrent_s3_key}, skipping")
-            torrent_exists = True
-        except ClientError as e:
-            if e.response['Error']['Code'] != '404':
-                logger.error(f"Error checking if torrent exists: {e.response['Error']['Code']} - {e.response['Error']['Message']}")
-                continue
-                
-        if not torrent_exists:
-            try:
-                # Check watch folder
-                s3_client.head_object(Bucket=s3_bucket, Key=watch_torrent_s3_key)
-                logger.info(f"Torrent already exists for {s3_key} in watch folder at {watch_torrent_s3_key}, skipping")
-                torrent_exists = True
-            except ClientError as e:
-                if e.response['Error']['Code'] != '404':
-                    logger.error(f"Error checking if torrent exists in watch folder: {e.response['Error']['Code']} - {e.response['Error']['Message']}")
-                    continue
-        
-        if torrent_exists:
-            continue
-        
-        job_id = f"s3-torrent-{int(time.time())}-{os.path.basename(s3_key)}"
-        
-        # Create initial record in DynamoDB
-        try:
-            now = int(time.time())
-            
-            # Check if job already exists
-            try:
-                response = table.get_item(Key={"jobId": job_id})
-                if 'Item' in response:
-                    logger.info(f"Job {job_id} already exists, skipping creation")
-                    continue
-            except ClientError as e:
-                if e.response['Error']['Code'] != 'ResourceNotFoundException':
-                    logger.error(f"Error checking job existence: {e.response['Error']['Code']} - {e.response['Error']['Message']}")
-                    continue
-            
-            # Create the job record
-            table.put_item(Item={
-                "jobId": job_id,
-                "s3Key": s3_key,
-                "s3Bucket": s3_bucket,
-                "status": "STARTED",
-                "createdAt": now,
-                "startedAt": now
-            })
-            logger.info(f"Created job record {job_id} for {s3_key}")
-        except ClientError as e:
-            logger.error(f"DynamoDB error creating job: {e.response['Error']['Code']} - {e.response['Error']['Message']}")
-            continue
-        except Exception as e:
-            logger.error(f"Error creating DynamoDB record: {str(e)}")
-            continue
-        
-        # Download the file from S3
-        local_file_path = None
-        torrent_path = None
+        objects.setdefault(s3_bucket, []).append(s3_key)
+        sizes[(s3_bucket, s3_key)] = record['s3']['object'].get('size', 0)
+    
+    records = []
+    for s3_bucket, s3_keys in objects.items():
+        # Ensure the watch folder exists
+        index.ensure_watch_folder(s3_bucket)
         
-        try:
-            file_extension = os.path.splitext(s3_key)[1]
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-                local_file_path = tmp_file.name
-            
-            logger.info(f"Downloading {s3_key} to {local_file_path}")
-            update_job_status(job_id, "DOWNLOADING", {"s3_key": s3_key})
-            
-            try:
-                s3_client.download_file(s3_bucket, s3_key, local_file_path)
-            except ClientError as e:
-                error_msg = f"S3 download error: {e.response['Error']['Code']} - {e.response['Error']['Message']}"
-                logger.error(error_msg)
-                update_job_status(job_id, "FAILED", {"error": error_msg})
-                continue
-            
-            # Check if file was downloaded successfully
-            if not os.path.exists(local_file_path) or os.path.getsize(local_file_path) == 0:
-                error_msg = f"Downloaded file is empty or missing: {local_file_path}"
-                logger.error(error_msg)
-                update_job_status(job_id, "FAILED", {"error": error_msg})
+        # Skip objects whose torrent already exists in the original location or watch folder
+        existing = index.existing(s3_bucket, s3_keys)
+        for s3_key in s3_keys:
+            if s3_key in existing:
+                logger.info(f"Torrent already exists for {s3_key} at {existing[s3_key]}, skipping")
                 continue
-            
-            # Create mock torrent file (for LocalStack testing)
-            update_job_status(job_id, "CREATING_TORRENT")
-            torrent_path = create_torrent_file_mock(local_file_path, s3_key)
-            if not torrent_path:
-                update_job_status(job_id, "FAILED", {"error": "Failed to create torrent file"})
-                continue
-            
-            # Check if torrent file was created successfully
-            if not os.path.exists(torrent_path) or os.path.getsize(torrent_path) == 0:
-                error_msg = "Generated torrent file is empty or missing"
-                logger.error(error_msg)
-                update_job_status(job_id, "FAILED", {"error": error_msg})
-                continue
-            
-            # Upload torrent back to S3
-            update_job_status(job_id, "UPLOADING_TORRENT")
-            
-            # Store torrent in the "watch" subfolder
-            logger.info(f"Uploading torrent to S3 watch folder: {watch_torrent_s3_key}")
-            
-            try:
-                # Check one more time if torrent already exists (race condition check)
-                try:
-                    s3_client.head_object(Bucket=s3_bucket, Key=watch_torrent_s3_key)
-                    logger.info(f"Torrent now exists for {s3_key} (created by another process), skipping upload")
-                    update_job_status(job_id, "COMPLETED", {
-                        "torrent_s3_key": watch_torrent_s3_key,
-                        "original_s3_key": s3_key,
-                        "note": "Torrent already exists, skipped upload"
-                    })
-                    continue
-                except ClientError as e:
-                    if e.response['Error']['Code'] != '404':
-                        error_msg = f"Error checking if torrent exists before upload: {e.response['Error']['Code']} - {e.response['Error']['Message']}"
-                        logger.error(error_msg)
-                        update_job_status(job_id, "FAILED", {"error": error_msg})
-                        continue
-                
-                # Upload the torrent file
-                s3_client.upload_file(torrent_path, s3_bucket, watch_torrent_s3_key)
-            except ClientError as e:
-                error_msg = f"S3 upload error: {e.response['Error']['Code']} - {e.response['Error']['Message']}"
-                logger.error(error_msg)
-                update_job_status(job_id, "FAILED", {"error": error_msg})
-                continue
-            
-            # Success
-            update_job_status(job_id, "COMPLETED", {
-                "torrent_s3_key": watch_torrent_s3_key,
-                "original_s3_key": s3_key
-            })
-            logger.info(f"Successfully created and uploaded torrent for {s3_key}")
-            
-        except Exception as e:
-            logger.error(f"Error processing {s3_key}: {str(e)}")
-            update_job_status(job_id, "FAILED", {"error": str(e)})
-        finally:
-            # Clean up temporary files
-            try:
-                if local_file_path and os.path.exists(local_file_path):
-                    os.unlink(local_file_path)
-                    logger.debug(f"Removed temporary file: {local_file_path}")
-                
-                if torrent_path and os.path.exists(torrent_path):
-                    os.unlink(torrent_path)
-                    logger.debug(f"Removed temporary torrent file: {torrent_path}")
-            except Exception as cleanup_error:
-                logger.warning(f"Error cleaning up temporary files: {str(cleanup_error)}")
+            records.append((s3_bucket, s3_key))
+    
+    # Download and hash several objects at once, as many as fit in the free space of /tmp
+    record_pool.run(
+        records,
+        lambda record: process_object(*record),
+        lambda record: sizes[record],
+        record_pool.Budget(record_pool.disk_budget(tempfile.gettempdir()))
+    )
     
     return {
         'statusCode': 200,
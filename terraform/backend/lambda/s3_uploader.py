@@ -0,0 +1,479 @@
+import os
+import sys
+import json
+import time
+import signal
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+MiB = 1024 * 1024
+
+# S3 limits: every part but the last is at least 5 MiB, and an upload has at most 10000 parts
+MIN_PART_SIZE = 5 * MiB
+MAX_PARTS = 10000
+
+DEFAULT_PART_SIZE = int(os.environ.get("S3_UPLOAD_PART_SIZE", str(64 * MiB)))
+DEFAULT_CONCURRENCY = int(os.environ.get("S3_UPLOAD_CONCURRENCY", "8"))
+
+# A part of a growing file is only uploaded once the write head is this far
+# past it, since muxers seek back to patch cluster sizes they just wrote
+SETTLE_BYTES = 32 * MiB
+
+POLL_INTERVAL = 2.0
+
+
+def part_size_for(size, part_size=None):
+    """Part size to use for a file of size bytes: the requested size, grown to stay within MAX_PARTS"""
+    part_size = max(part_size or DEFAULT_PART_SIZE, MIN_PART_SIZE)
+    if size > part_size * MAX_PARTS:
+        # Whole MiB, so a resumed upload computes the same part size
+        part_size = -(-size // (MAX_PARTS * MiB)) * MiB
+    return part_size
+
+
+class UploadResult:
+    """Outcome of one upload plus the throughput achieved"""
+
+    def __init__(self, size, parts, seconds, concurrency, resumed_parts=0, etag=None):
+        self.size = size
+        self.parts = parts
+        self.seconds = seconds
+        self.concurrency = concurrency
+        self.resumed_parts = resumed_parts
+        self.etag = etag
+
+    @property
+    def mb_per_s(self):
+        return (self.size / 1e6) / self.seconds if self.seconds else 0.0
+
+    def report(self):
+        """Human-readable throughput line for logs"""
+        resumed = f", {self.resumed_parts} resumed" if self.resumed_parts else ""
+        return (
+            f"uploaded {self.size / 1e6:.1f} MB in {self.seconds:.2f}s "
+            f"({self.mb_per_s:.1f} MB/s) as {self.parts} part(s){resumed} "
+            f"with {self.concurrency} stream(s)"
+        )
+
+
+class MultipartUpload:
+    """One S3 multipart upload that survives a crash of the uploading process.
+
+    The upload ID is kept in a small JSON checkpoint next to the source. A
+    restarted uploader with the same checkpoint asks S3 which parts it
+    already holds (list_parts) and only sends the rest.
+    """
+
+    def __init__(self, s3_client, bucket, key, part_size, checkpoint_path=None, extra_args=None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.checkpoint_path = checkpoint_path
+        self.extra_args = extra_args or {}
+        self.upload_id = None
+        self.parts = {}
+        self.resumed_parts = 0
+        self._lock = threading.Lock()
+
+    def start(self, fingerprint=None):
+        """Resume the checkpointed upload if it matches fingerprint, otherwise create a new one"""
+        state = self._load_checkpoint()
+        if state and state.get("fingerprint") == fingerprint and state.get("partSize") == self.part_size:
+            try:
+                self.parts = self._list_parts(state["uploadId"])
+                self.upload_id = state["uploadId"]
+                self.resumed_parts = len(self.parts)
+                logger.info(f"Resuming upload of s3://{self.bucket}/{self.key} "
+                            f"with {self.resumed_parts} part(s) already uploaded")
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'NoSuchUpload':
+                    raise
+                logger.info(f"Checkpointed upload for {self.key} no longer exists, starting over")
+
+        response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.extra_args)
+        self.upload_id = response['UploadId']
+        self.parts = {}
+        self._save_checkpoint({
+            "bucket": self.bucket,
+            "key": self.key,
+            "uploadId": self.upload_id,
+            "partSize": self.part_size,
+            "fingerprint": fingerprint,
+        })
+
+    def _list_parts(self, upload_id):
+        parts = {}
+        kwargs = {"Bucket": self.bucket, "Key": self.key, "UploadId": upload_id}
+        while True:
+            response = self.s3_client.list_parts(**kwargs)
+            for part in response.get('Parts', []):
+                parts[part['PartNumber']] = {"ETag": part['ETag'], "Size": part['Size']}
+            if not response.get('IsTruncated'):
+                return parts
+            kwargs["PartNumberMarker"] = response['NextPartNumberMarker']
+
+    def has_part(self, number, size):
+        with self._lock:
+            part = self.parts.get(number)
+        return part is not None and part["Size"] == size
+
+    def upload_part(self, number, data):
+        """Upload one part and log its throughput"""
+        started = time.monotonic()
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=data
+        )
+        seconds = time.monotonic() - started
+        with self._lock:
+            self.parts[number] = {"ETag": response['ETag'], "Size": len(data)}
+        mb = len(data) / 1e6
+        logger.info(f"{self.key} part {number}: {mb:.1f} MB in {seconds:.2f}s "
+                    f"({mb / seconds if seconds else 0.0:.1f} MB/s)")
+
+    def complete(self, part_count):
+        """Complete the upload from parts 1..part_count, drop the checkpoint and return the object's ETag"""
+        missing = [n for n in range(1, part_count + 1) if n not in self.parts]
+        if missing:
+            raise IOError(f"Cannot complete s3://{self.bucket}/{self.key}: parts {missing} missing")
+        response = self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": [
+                {"PartNumber": n, "ETag": self.parts[n]["ETag"]} for n in range(1, part_count + 1)
+            ]},
+        )
+        self._remove_checkpoint()
+        return response.get('ETag')
+
+    def abort(self):
+        """Abort the upload so S3 stops storing its parts"""
+        if self.upload_id:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        self._remove_checkpoint()
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path:
+            return None
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("bucket") != self.bucket or state.get("key") != self.key:
+            return None
+        return state
+
+    def _save_checkpoint(self, state):
+        if not self.checkpoint_path:
+            return
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _remove_checkpoint(self):
+        if self.checkpoint_path:
+            try:
+                os.remove(self.checkpoint_path)
+            except FileNotFoundError:
+                pass
+
+
+def _read_part(path, offset, length):
+    with open(path, "rb", buffering=0) as f:
+        f.seek(offset)
+        data = f.read(length)
+    if len(data) != length:
+        raise IOError(f"Unexpected end of file in {path} at offset {offset + len(data)}")
+    return data
+
+
+def upload_file(s3_client, path, bucket, key, part_size=None, concurrency=None,
+                checkpoint_path=None, extra_args=None):
+    """Upload path to s3://bucket/key with concurrent parts; returns an UploadResult.
+
+    Each worker reads its own part from disk just before sending it, so at
+    most concurrency parts are held in memory. Files no larger than one
+    part are sent with a single put_object. A failed upload is left open
+    with its checkpoint (default: path + ".upload") so a rerun resumes it.
+    """
+    started = time.monotonic()
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    extra_args = extra_args or {}
+    st = os.stat(path)
+    part_size = part_size_for(st.st_size, part_size)
+
+    if st.st_size <= part_size:
+        with open(path, "rb") as f:
+            response = s3_client.put_object(Bucket=bucket, Key=key, Body=f, **extra_args)
+        result = UploadResult(st.st_size, 1, time.monotonic() - started, 1, etag=response.get('ETag'))
+        logger.info(f"s3://{bucket}/{key}: {result.report()}")
+        return result
+
+    upload = MultipartUpload(s3_client, bucket, key, part_size,
+                             checkpoint_path or path + ".upload", extra_args)
+    upload.start(fingerprint={"size": st.st_size, "mtime": int(st.st_mtime)})
+
+    part_count = -(-st.st_size // part_size)
+
+    def send(number):
+        offset = (number - 1) * part_size
+        length = min(part_size, st.st_size - offset)
+        if not upload.has_part(number, length):
+            upload.upload_part(number, _read_part(path, offset, length))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # list() re-raises the first part failure; the upload stays open for a resume
+        list(executor.map(send, range(1, part_count + 1)))
+    etag = upload.complete(part_count)
+
+    result = UploadResult(st.st_size, part_count, time.monotonic() - started, concurrency,
+                          upload.resumed_parts, etag)
+    logger.info(f"s3://{bucket}/{key}: {result.report()}")
+    return result
+
+
+def _md5_etag(data):
+    return '"' + hashlib.md5(data).hexdigest() + '"'
+
+
+class LiveUpload:
+    """Upload a file as multipart parts while another process is still writing it.
+
+    Every full part that has settled is sent as soon as it is ready, so once
+    the writer is done only the tail part and CompleteMultipartUpload
+    remain. Muxers rewrite the file header when they close, so finish()
+    compares part 1 against what was uploaded and resends it if it changed.
+    The upload is checkpointed like upload_file's and resumed by a
+    restarted uploader as long as the file was not replaced.
+
+    A consumer (any object with update(data) and reset()) is fed every byte
+    of the file exactly once and in order, from the same reads that feed
+    the upload, so other per-byte work needs no read pass of its own.
+
+    Only a file that grows in place can be uploaded early: if the writer
+    produces it in one step at the end (yt-dlp merging separate video and
+    audio formats), every part is sent after the writer exits.
+    """
+
+    def __init__(self, s3_client, path, bucket, key, part_size=None, concurrency=None,
+                 checkpoint_path=None, extra_args=None, settle_bytes=SETTLE_BYTES, consumer=None):
+        self.s3_client = s3_client
+        self.path = path
+        self.bucket = bucket
+        self.key = key
+        # The final size is unknown, so the part size cannot adapt to it
+        self.part_size = max(part_size or DEFAULT_PART_SIZE, MIN_PART_SIZE)
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.checkpoint_path = checkpoint_path or path + ".upload"
+        self.extra_args = extra_args or {}
+        self.settle_bytes = settle_bytes
+        self.consumer = consumer
+        self.upload = None
+        self.inode = None
+        self.next_part = 1
+        self.futures = []
+        self.started = time.monotonic()
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def _stat(self):
+        """Return (path, stat) for the file, following yt-dlp's .part name until it is renamed"""
+        for candidate in (self.path, self.path + ".part"):
+            try:
+                return candidate, os.stat(candidate)
+            except FileNotFoundError:
+                continue
+        return None, None
+
+    def _restart(self, inode):
+        logger.info(f"{self.path} was replaced or truncated, restarting its upload")
+        self._drain()
+        if self.upload:
+            self.upload.abort()
+        self.upload = None
+        self.next_part = 1
+        self.inode = inode
+        if self.consumer:
+            self.consumer.reset()
+
+    def _drain(self):
+        """Wait for the parts in flight; re-raises the first failure"""
+        done, _ = wait(self.futures)
+        self.futures = []
+        for future in done:
+            future.result()
+
+    def _start(self):
+        self.upload = MultipartUpload(self.s3_client, self.bucket, self.key, self.part_size,
+                                      self.checkpoint_path, self.extra_args)
+        self.upload.start(fingerprint={"inode": self.inode, "live": True})
+
+    def _submit(self, path, number, length):
+        offset = (number - 1) * self.part_size
+        upload = self.upload
+        data = None
+        if self.consumer:
+            # Read here, in file order, so the consumer sees the bytes being uploaded
+            data = _read_part(path, offset, length)
+            self.consumer.update(data)
+
+        def send():
+            if not upload.has_part(number, length):
+                upload.upload_part(number, data if data is not None else _read_part(path, offset, length))
+
+        self.futures.append(self.executor.submit(send))
+
+    def poll(self):
+        """Queue every full part that has settled; returns the number of parts queued"""
+        path, st = self._stat()
+        if st is None:
+            return 0
+        if self.inode is not None and (st.st_ino != self.inode or st.st_size < (self.next_part - 1) * self.part_size):
+            self._restart(st.st_ino)
+        self.inode = st.st_ino
+
+        ready = max(st.st_size - self.settle_bytes, 0) // self.part_size
+        if ready < self.next_part:
+            return 0
+        if self.upload is None:
+            self._start()
+        # Keep at most concurrency parts queued so memory and open files stay bounded
+        done = [f for f in self.futures if f.done()]
+        for future in done:
+            future.result()
+        self.futures = [f for f in self.futures if f not in done]
+        queued = 0
+        while self.next_part <= ready and len(self.futures) < self.concurrency:
+            self._submit(path, self.next_part, self.part_size)
+            self.next_part += 1
+            queued += 1
+        return queued
+
+    def finish(self):
+        """Upload what is left once the writer is done and complete the upload"""
+        path, st = self._stat()
+        if st is None:
+            raise FileNotFoundError(self.path)
+        if self.inode is not None and (st.st_ino != self.inode or st.st_size < (self.next_part - 1) * self.part_size):
+            self._restart(st.st_ino)
+        self.inode = st.st_ino
+        self._drain()
+        live_parts = self.next_part - 1
+        part_count = max(-(-st.st_size // self.part_size), 1)
+
+        if self.upload is None and part_count == 1:
+            # A short recording: nothing settled while it was written, so send it in one request
+            self.executor.shutdown()
+            data = _read_part(path, 0, st.st_size)
+            if self.consumer:
+                self.consumer.update(data)
+            response = self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=data, **self.extra_args)
+            result = UploadResult(st.st_size, 1, time.monotonic() - self.started, 1, etag=response.get('ETag'))
+            logger.info(f"s3://{self.bucket}/{self.key}: {result.report()}")
+            return result
+        if self.upload is None:
+            self._start()
+
+        for number in range(self.next_part, part_count + 1):
+            offset = (number - 1) * self.part_size
+            self._submit(path, number, min(self.part_size, st.st_size - offset))
+        self.next_part = part_count + 1
+
+        # Resend the header part if the muxer rewrote it on close (part ETags are MD5s
+        # unless the bucket uses SSE-KMS, in which case it is always resent)
+        head = _read_part(path, 0, min(self.part_size, st.st_size))
+        if self.upload.parts[1]["ETag"] != _md5_etag(head):
+            self.futures.append(self.executor.submit(self.upload.upload_part, 1, head))
+        self._drain()
+        self.executor.shutdown()
+        etag = self.upload.complete(part_count)
+
+        result = UploadResult(st.st_size, part_count, time.monotonic() - self.started,
+                              self.concurrency, self.upload.resumed_parts, etag)
+        logger.info(f"s3://{self.bucket}/{self.key}: {result.report()} "
+                    f"({live_parts} part(s) sent while the file was being written)")
+        return result
+
+
+def follow(live, pid=None, interval=POLL_INTERVAL):
+    """Upload settled parts until the writer process exits, then finish the upload.
+
+    Returns None without completing the upload if SIGTERM is received, which
+    leaves it open (and checkpointed) for a later resume.
+    """
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    while not stopping:
+        try:
+            live.poll()
+        except OSError as e:
+            logger.warning(f"Error reading {live.path}: {e}")
+        if pid is not None and not _pid_alive(pid):
+            return live.finish()
+        time.sleep(interval)
+    live.executor.shutdown(cancel_futures=True)
+    return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def main(argv=None):
+    """Upload a local file to S3 (used by the recorder container)"""
+    import boto3
+    from botocore.config import Config
+
+    parser = argparse.ArgumentParser(description="Concurrent, resumable multipart upload to S3")
+    parser.add_argument("path")
+    parser.add_argument("bucket")
+    parser.add_argument("key")
+    parser.add_argument("--part-size", type=int, default=DEFAULT_PART_SIZE, help="bytes per part")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="parts sent at once")
+    parser.add_argument("--checkpoint", help="resume state file (default: <path>.upload)")
+    parser.add_argument("--content-type")
+    parser.add_argument("--follow", type=int, metavar="PID",
+                        help="upload the file while PID is still writing it, and finish once PID exits")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    s3_client = boto3.client(
+        "s3",
+        region_name=os.environ.get("AWS_REGION"),
+        endpoint_url=os.environ.get("AWS_ENDPOINT_URL"),
+        config=Config(max_pool_connections=max(args.concurrency, 10), retries={"mode": "adaptive"}),
+    )
+    extra_args = {"ContentType": args.content_type} if args.content_type else None
+    if args.follow:
+        live = LiveUpload(s3_client, args.path, args.bucket, args.key, args.part_size,
+                          args.concurrency, args.checkpoint, extra_args)
+        result = follow(live, args.follow, args.interval)
+        if result is None:
+            logger.info(f"Stopped before {args.path} was complete; the upload is left open for a resume")
+            return 1
+    else:
+        result = upload_file(s3_client, args.path, args.bucket, args.key, args.part_size,
+                             args.concurrency, args.checkpoint, extra_args)
+    print(result.report())
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(funcName)s] %(message)s")
+    sys.exit(main())
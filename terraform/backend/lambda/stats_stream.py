@@ -0,0 +1,33 @@
+import os
+import logging
+
+import clients
+import job_stats
+
+# Configure root logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s %(levelname)s [%(funcName)s] %(message)s'
+)
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+stats_table = os.environ["STATS_TABLE"]
+
+
+def lambda_handler(event, context):
+    """DynamoDB Streams handler for the jobs table: keeps the job stats items up to date.
+
+    A batch's changes are summed per stats item first, so a burst of
+    progress writes costs one update per item rather than one per write.
+    """
+    records = event.get("Records", [])
+    deltas = job_stats.stream_deltas(records)
+    # An error fails the whole batch; the stream retries it with the same token
+    # and the same requests, so a retry is never counted twice
+    written = job_stats.apply(clients.client("dynamodb"), stats_table, deltas,
+                              token=job_stats.batch_token(records), updated_at=job_stats.batch_time(records))
+    logger.info("Applied %d job changes to %d stats items", len(records), written)
+    return {"status": "processed", "records": len(records), "items": written}
@@ -0,0 +1,91 @@
+import os
+import sys
+import importlib
+
+import boto3
+import moto
+import pytest
+
+# The Lambda modules import each other as top-level modules, as they do in the deployment package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REGION = "us-east-1"
+BUCKET = "recordings-bucket"
+
+
+@pytest.fixture(autouse=True)
+def aws_environment(monkeypatch):
+    """Fake credentials, so no test can reach a real AWS account"""
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("AWS_ENDPOINT_URL", raising=False)
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+
+
+@pytest.fixture
+def dispatch(monkeypatch):
+    """dispatch_to_ecs, imported with the environment the Lambda is given"""
+    monkeypatch.setenv("DDB_TABLE", "jobs")
+    import dispatch_to_ecs
+    return importlib.reload(dispatch_to_ecs)
+
+
+@pytest.fixture
+def aws():
+    with moto.mock_aws():
+        yield
+
+
+@pytest.fixture
+def s3(aws):
+    """S3 client with the recordings bucket created"""
+    client = boto3.client("s3", region_name=REGION)
+    client.create_bucket(Bucket=BUCKET)
+    return client
+
+
+@pytest.fixture
+def dynamodb(aws):
+    return boto3.resource("dynamodb", region_name=REGION)
+
+
+@pytest.fixture
+def jobs_table(dynamodb):
+    """The jobs table with the indexes defined in dynamodb.tf"""
+    def index(name, range_key):
+        return {
+            "IndexName": name,
+            "KeySchema": [
+                {"AttributeName": "status", "KeyType": "HASH"},
+                {"AttributeName": range_key, "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+        }
+
+    return dynamodb.create_table(
+        TableName="jobs",
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[{"AttributeName": "jobId", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "jobId", "AttributeType": "S"},
+            {"AttributeName": "status", "AttributeType": "S"},
+            {"AttributeName": "createdAt", "AttributeType": "N"},
+            {"AttributeName": "lastUpdatedAt", "AttributeType": "N"},
+        ],
+        GlobalSecondaryIndexes=[
+            index("status-createdAt-index", "createdAt"),
+            index("status-lastUpdatedAt-index", "lastUpdatedAt"),
+        ],
+    )
+
+
+@pytest.fixture
+def index_table(dynamodb):
+    """The active recordings table from dynamodb.tf"""
+    return dynamodb.create_table(
+        TableName="active-recordings",
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[{"AttributeName": "urlKey", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "urlKey", "AttributeType": "S"}],
+    )
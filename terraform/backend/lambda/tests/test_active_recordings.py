@@ -0,0 +1,75 @@
+import pytest
+
+import active_recordings
+
+URL = "https://www.youtube.com/watch?v=abc123"
+
+
+def set_status(jobs_table, job_id, status):
+    jobs_table.put_item(Item={"jobId": job_id, "status": status, "createdAt": 1, "lastUpdatedAt": 1})
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=abc123",
+    "http://m.youtube.com/watch?v=abc123&t=42&feature=share",
+    "https://youtu.be/abc123?si=xyz",
+    "https://youtube.com/live/abc123/",
+    "https://www.youtube.com/watch?list=PL1&v=abc123#comments",
+])
+def test_spellings_of_one_stream_share_a_key(url):
+    assert active_recordings.normalize_url(url) == "youtube.com/watch?v=abc123"
+
+
+def test_normalize_url_keeps_what_selects_the_stream():
+    assert active_recordings.normalize_url("https://www.Twitch.tv/SomeOne/") == "twitch.tv/someone"
+    assert active_recordings.normalize_url("https://example.com/Live?b=2&a=1&utm_source=x") == "example.com/Live?a=1&b=2"
+
+
+def test_first_request_claims_the_url(index_table, jobs_table):
+    assert active_recordings.claim(index_table, jobs_table, URL, "job-1") == "job-1"
+
+    entry = index_table.get_item(Key={"urlKey": "youtube.com/watch?v=abc123"})["Item"]
+    assert entry["jobId"] == "job-1"
+
+
+def test_duplicate_request_attaches_to_the_recording_job(index_table, jobs_table):
+    active_recordings.claim(index_table, jobs_table, URL, "job-1")
+    set_status(jobs_table, "job-1", "RECORDING")
+
+    assert active_recordings.claim(index_table, jobs_table, "https://youtu.be/abc123", "job-2") == "job-1"
+
+
+def test_claim_is_trusted_briefly_before_its_job_record_exists(index_table, jobs_table, monkeypatch):
+    active_recordings.claim(index_table, jobs_table, URL, "job-1")
+
+    assert active_recordings.claim(index_table, jobs_table, URL, "job-2") == "job-1"
+
+    later = active_recordings.time.time() + active_recordings.CLAIM_GRACE_SECONDS + 1
+    monkeypatch.setattr(active_recordings.time, "time", lambda: later)
+    assert active_recordings.claim(index_table, jobs_table, URL, "job-3") == "job-3"
+
+
+@pytest.mark.parametrize("status", ["UPLOADING", "COMPLETED", "FAILED"])
+def test_url_is_taken_over_once_its_job_stopped_recording(index_table, jobs_table, status):
+    active_recordings.claim(index_table, jobs_table, URL, "job-1")
+    set_status(jobs_table, "job-1", status)
+
+    assert active_recordings.claim(index_table, jobs_table, URL, "job-2") == "job-2"
+    assert active_recordings.claim(index_table, jobs_table, URL, "job-3") == "job-2"
+
+
+def test_repeated_claim_by_the_same_job_is_idempotent(index_table, jobs_table):
+    active_recordings.claim(index_table, jobs_table, URL, "job-1")
+
+    assert active_recordings.claim(index_table, jobs_table, URL, "job-1") == "job-1"
+
+
+def test_release_only_drops_the_owners_claim(index_table, jobs_table):
+    active_recordings.claim(index_table, jobs_table, URL, "job-1")
+
+    active_recordings.release(index_table, URL, "job-2")
+    assert "Item" in index_table.get_item(Key={"urlKey": "youtube.com/watch?v=abc123"})
+
+    active_recordings.release(index_table, URL, "job-1")
+    assert "Item" not in index_table.get_item(Key={"urlKey": "youtube.com/watch?v=abc123"})
+    assert active_recordings.claim(index_table, jobs_table, URL, "job-2") == "job-2"
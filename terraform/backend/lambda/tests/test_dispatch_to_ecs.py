@@ -0,0 +1,116 @@
+import json
+import threading
+
+import boto3
+import pytest
+
+from conftest import REGION
+
+
+def sqs_record(message_id, group, job_id=None):
+    return {
+        "messageId": message_id,
+        "body": json.dumps({"jobId": job_id or message_id, "url": "https://example.com/live",
+                            "filename": "live.mp4", "s3Key": "recordings/live.mp4"}),
+        "attributes": {"MessageGroupId": group},
+    }
+
+
+class FakeDispatch:
+    """Replaces dispatch_record: remembers the order per group and fails the listed messages"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.dispatched = []
+        self._lock = threading.Lock()
+
+    def __call__(self, record, ecs=None):
+        if record["messageId"] in self.fail:
+            raise RuntimeError(f"{record['messageId']} failed")
+        with self._lock:
+            self.dispatched.append(record["messageId"])
+
+
+def handle(dispatch, records, monkeypatch, fail=()):
+    fake = FakeDispatch(fail)
+    monkeypatch.setattr(dispatch, "dispatch_record", fake)
+    monkeypatch.setenv("AWS_ENDPOINT_URL", "http://localstack:4566")
+    response = dispatch.lambda_handler({"Records": records}, None)
+    return fake, sorted(failure["itemIdentifier"] for failure in response["batchItemFailures"])
+
+
+def test_every_record_is_dispatched(dispatch, monkeypatch):
+    records = [sqs_record("a1", "shard-1"), sqs_record("b1", "shard-2"), sqs_record("a2", "shard-1")]
+
+    fake, failures = handle(dispatch, records, monkeypatch)
+
+    assert failures == []
+    assert sorted(fake.dispatched) == ["a1", "a2", "b1"]
+    assert [m for m in fake.dispatched if m.startswith("a")] == ["a1", "a2"]
+
+
+def test_failed_record_holds_back_the_rest_of_its_group(dispatch, monkeypatch):
+    records = [
+        sqs_record("a1", "shard-1"),
+        sqs_record("b1", "shard-2"),
+        sqs_record("a2", "shard-1"),
+        sqs_record("b2", "shard-2"),
+        sqs_record("a3", "shard-1"),
+    ]
+
+    fake, failures = handle(dispatch, records, monkeypatch, fail=["a2"])
+
+    # a3 must not run before the retry of a2; shard-2 is unaffected
+    assert failures == ["a2", "a3"]
+    assert sorted(fake.dispatched) == ["a1", "b1", "b2"]
+    assert [m for m in fake.dispatched if m.startswith("b")] == ["b1", "b2"]
+
+
+def test_records_without_a_group_fail_alone(dispatch, monkeypatch):
+    records = [{"messageId": m, "body": "{}"} for m in ("m1", "m2")]
+
+    fake, failures = handle(dispatch, records, monkeypatch, fail=["m1"])
+
+    assert failures == ["m1"]
+    assert fake.dispatched == ["m2"]
+
+
+def post_job(dispatch, job_id, url="https://www.twitch.tv/someone"):
+    return dispatch.lambda_handler({
+        "httpMethod": "POST",
+        "path": "/jobs",
+        "body": json.dumps({"jobId": job_id, "url": url, "filename": "someone.mp4"}),
+    }, None)
+
+
+@pytest.fixture
+def queue(dispatch, jobs_table, index_table, monkeypatch):
+    """The jobs queue, with dispatch_to_ecs coalescing requests through index_table"""
+    sqs = boto3.client("sqs", region_name=REGION)
+    queue_url = sqs.create_queue(QueueName="jobs.fifo", Attributes={
+        "FifoQueue": "true", "ContentBasedDeduplication": "true"})["QueueUrl"]
+    monkeypatch.setenv("SQS_QUEUE_URL", queue_url)
+    monkeypatch.setattr(dispatch, "active_recordings_table", index_table.name)
+
+    def queued():
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10).get("Messages", [])
+        return [json.loads(m["Body"])["jobId"] for m in messages]
+    return queued
+
+
+def test_new_job_is_queued(dispatch, jobs_table, queue):
+    response = post_job(dispatch, "job-1")
+
+    assert response["statusCode"] == 201
+    assert queue() == ["job-1"]
+    assert jobs_table.get_item(Key={"jobId": "job-1"})["Item"]["status"] == "PENDING"
+
+
+def test_existing_job_id_is_not_queued_again(dispatch, jobs_table, queue):
+    jobs_table.put_item(Item={"jobId": "job-1", "status": "COMPLETED", "createdAt": 1, "lastUpdatedAt": 1})
+
+    response = post_job(dispatch, "job-1")
+
+    assert response["statusCode"] == 409
+    assert queue() == []
+    assert jobs_table.get_item(Key={"jobId": "job-1"})["Item"]["status"] == "COMPLETED"
@@ -0,0 +1,60 @@
+import pytest
+
+import hash_engine
+import torrent
+from test_torrent import DATA, PIECE_LENGTH, SAMPLE_INFO_HASH, sample_pieces
+
+
+@pytest.fixture
+def sample_file(tmp_path):
+    path = tmp_path / "sample.mp4"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_hash_file_matches_serial_hashing(sample_file, workers, monkeypatch):
+    # One piece per task, so the pieces are spread over every worker
+    monkeypatch.setattr(hash_engine, "PIECES_PER_TASK", 1)
+
+    result = hash_engine.hash_file(sample_file, PIECE_LENGTH, workers)
+
+    assert result.pieces == sample_pieces()
+    assert result.length == len(DATA)
+
+
+def test_hash_file_range_from_a_piece_boundary(sample_file):
+    result = hash_engine.hash_file(sample_file, PIECE_LENGTH, 2, offset=2 * PIECE_LENGTH)
+
+    assert result.pieces == sample_pieces()[40:]
+    assert result.length == len(DATA) - 2 * PIECE_LENGTH
+
+
+@pytest.mark.parametrize("chunk_size", [1000, PIECE_LENGTH, 3 * PIECE_LENGTH + 7])
+def test_parallel_piece_hasher_matches_serial_hashing(chunk_size):
+    hasher = hash_engine.ParallelPieceHasher(PIECE_LENGTH, workers=4, max_inflight=2)
+    for i in range(0, len(DATA), chunk_size):
+        hasher.update(DATA[i:i + chunk_size])
+    result = hasher.result()
+
+    assert result.pieces == sample_pieces()
+    assert result.length == len(DATA)
+    assert result.mode == "thread"
+
+
+def test_create_torrent_has_the_known_info_hash():
+    chunks = (DATA[i:i + 100000] for i in range(0, len(DATA), 100000))
+
+    torrent_bytes, result = torrent.create_torrent("sample.mp4", len(DATA), chunks, piece_length=PIECE_LENGTH)
+
+    assert torrent.info_hash(torrent_bytes) == SAMPLE_INFO_HASH
+    assert result.pieces == sample_pieces()
+
+
+def test_main_writes_the_torrent(sample_file, tmp_path):
+    output = tmp_path / "sample.torrent"
+
+    assert hash_engine.main([sample_file, "-o", str(output), "--piece-length", str(PIECE_LENGTH),
+                             "--workers", "2", "-t", "udp://a:1/announce"]) == 0
+
+    assert torrent.info_hash(output.read_bytes()) == SAMPLE_INFO_HASH
@@ -0,0 +1,46 @@
+import pytest
+
+import job_queries
+
+
+def put_job(table, job_id, status, updated_at):
+    table.put_item(Item={
+        "jobId": job_id,
+        "status": status,
+        "createdAt": 100,
+        "lastUpdatedAt": updated_at,
+    })
+
+
+def test_changed_jobs_returns_only_jobs_written_after_since(jobs_table, monkeypatch):
+    monkeypatch.setattr(job_queries.time, "time", lambda: 1000)
+    put_job(jobs_table, "old", "COMPLETED", 400)
+    put_job(jobs_table, "boundary", "FAILED", 500)
+    put_job(jobs_table, "recording", "RECORDING", 600)
+    put_job(jobs_table, "pending", "PENDING", 700)
+
+    changed, watermark = job_queries.changed_jobs(jobs_table, 500)
+
+    assert [item["jobId"] for item in changed] == ["pending", "recording"]
+    assert watermark == 1000 - job_queries.FEED_OVERLAP
+
+
+def test_changed_jobs_filters_by_status(jobs_table):
+    put_job(jobs_table, "recording", "RECORDING", 600)
+    put_job(jobs_table, "pending", "PENDING", 700)
+
+    changed, _ = job_queries.changed_jobs(jobs_table, 0, statuses=["RECORDING"])
+
+    assert [item["jobId"] for item in changed] == ["recording"]
+
+
+def test_feed_watermark_overlaps_but_never_moves_back(monkeypatch):
+    monkeypatch.setattr(job_queries.time, "time", lambda: 1000)
+
+    assert job_queries.feed_watermark(0) == 1000 - job_queries.FEED_OVERLAP
+    assert job_queries.feed_watermark(995) == 995
+
+
+def test_changed_jobs_rejects_negative_since(jobs_table):
+    with pytest.raises(ValueError):
+        job_queries.changed_jobs(jobs_table, -1)
@@ -0,0 +1,118 @@
+import pytest
+
+import job_queries
+
+
+def put_jobs(table, jobs):
+    for job_id, status, created_at in jobs:
+        table.put_item(Item={
+            "jobId": job_id,
+            "status": status,
+            "createdAt": created_at,
+            "lastUpdatedAt": created_at,
+        })
+
+
+def all_pages(table, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page, cursor = job_queries.list_jobs(table, cursor=cursor, **kwargs)
+        pages.append([item["jobId"] for item in page])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    cursor = job_queries.encode_cursor(1700000000, {"b", "a"})
+    assert job_queries.decode_cursor(cursor) == (1700000000, {"a", "b"})
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30=", job_queries.encode_cursor(1, [])[:-4]])
+def test_decode_cursor_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        job_queries.decode_cursor(cursor)
+
+
+def test_list_jobs_pages_newest_first_across_statuses(jobs_table):
+    put_jobs(jobs_table, [
+        ("a", "PENDING", 100),
+        ("b", "RECORDING", 200),
+        ("c", "COMPLETED", 300),
+        ("d", "FAILED", 400),
+        ("e", "PENDING", 500),
+    ])
+
+    assert all_pages(jobs_table, limit=2) == [["e", "d"], ["c", "b"], ["a"]]
+
+
+def test_list_jobs_does_not_skip_or_repeat_ties(jobs_table):
+    # Ties on createdAt span page boundaries and status partitions
+    put_jobs(jobs_table, [
+        ("a", "PENDING", 100),
+        ("b", "RECORDING", 100),
+        ("c", "PENDING", 100),
+        ("d", "COMPLETED", 100),
+        ("e", "PENDING", 50),
+    ])
+
+    pages = all_pages(jobs_table, limit=2)
+
+    returned = [job_id for page in pages for job_id in page]
+    assert returned == ["d", "c", "b", "a", "e"]
+    assert all(len(page) <= 2 for page in pages)
+
+
+def test_list_jobs_filters_by_status_and_since(jobs_table):
+    put_jobs(jobs_table, [
+        ("a", "PENDING", 100),
+        ("b", "PENDING", 200),
+        ("c", "COMPLETED", 300),
+    ])
+
+    page, cursor = job_queries.list_jobs(jobs_table, statuses=["PENDING"], since=150)
+
+    assert [item["jobId"] for item in page] == ["b"]
+    assert cursor is None
+
+
+def test_list_jobs_clamps_limit(jobs_table):
+    put_jobs(jobs_table, [(f"job-{i}", "PENDING", i) for i in range(3)])
+
+    page, cursor = job_queries.list_jobs(jobs_table, limit=0)
+
+    assert [item["jobId"] for item in page] == ["job-2"]
+    assert cursor is not None
+
+
+@pytest.mark.parametrize("value,expected", [
+    (1700000000, 1700000000),
+    ("1700000000", 1700000000),
+    ("2023-11-14T22:13:20Z", 1700000000),
+    ("2023-11-14T22:13:20", 1700000000),
+    ("2023-11-15T00:13:20+02:00", 1700000000),
+])
+def test_epoch_seconds(value, expected):
+    assert job_queries.epoch_seconds(value) == expected
+
+
+def test_migrate_timestamps(dynamodb):
+    # Before the migration the table has no indexes, so it holds string timestamps
+    table = dynamodb.create_table(
+        TableName="legacy-jobs",
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[{"AttributeName": "jobId", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "jobId", "AttributeType": "S"}],
+    )
+    table.put_item(Item={"jobId": "iso", "createdAt": "2023-11-14T22:13:20Z", "lastUpdatedAt": 1700000100})
+    table.put_item(Item={"jobId": "epoch", "createdAt": 1700000000, "lastUpdatedAt": 1700000000})
+    table.put_item(Item={"jobId": "garbage", "createdAt": "yesterday"})
+
+    assert job_queries.migrate_timestamps(table, dry_run=True) == (3, 2, 0)
+    assert table.get_item(Key={"jobId": "iso"})["Item"]["createdAt"] == "2023-11-14T22:13:20Z"
+
+    assert job_queries.migrate_timestamps(table) == (3, 2, 0)
+    assert table.get_item(Key={"jobId": "iso"})["Item"]["createdAt"] == 1700000000
+    assert table.get_item(Key={"jobId": "iso"})["Item"]["lastUpdatedAt"] == 1700000100
+    assert "createdAt" not in table.get_item(Key={"jobId": "garbage"})["Item"]
+
+    assert job_queries.migrate_timestamps(table) == (3, 0, 0)
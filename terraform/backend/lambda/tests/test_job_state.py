@@ -0,0 +1,160 @@
+import time
+
+import pytest
+
+import job_state
+
+
+class CountingTable:
+    """Wraps a table to count update_item calls"""
+
+    def __init__(self, table):
+        self.table = table
+        self.updates = 0
+
+    def update_item(self, **kwargs):
+        self.updates += 1
+        return self.table.update_item(**kwargs)
+
+
+def stored(table, job_id):
+    return table.get_item(Key={"jobId": job_id}).get("Item")
+
+
+@pytest.mark.parametrize("current,status,allowed", [
+    ("PENDING", "STARTED", True),
+    ("RECORDING", "UPLOADING", True),
+    ("UPLOADING", "RECORDING", False),
+    ("RECORDING", "RECORDING", True),
+    ("RECORDING", "FAILED", True),
+    ("COMPLETED", "FAILED", False),
+    ("FAILED", "RECORDING", False),
+    ("STARTED", "STARTED", False),
+    ("FAILED", "STARTED", True),
+])
+def test_can_transition(current, status, allowed):
+    assert job_state.can_transition(current, status) is allowed
+
+
+def test_unknown_status_is_rejected():
+    with pytest.raises(ValueError):
+        job_state.allowed_predecessors("PAUSED")
+
+
+def test_transitions_write_status_and_attributes(jobs_table):
+    job = job_state.JobState(jobs_table, "job-1", coalesce_seconds=0)
+
+    assert job.transition("PENDING", {"url": "https://example.com"}, set_once={"createdAt": 100})
+    assert job.transition("RECORDING", set_once={"createdAt": 200})
+
+    item = stored(jobs_table, "job-1")
+    assert item["status"] == "RECORDING"
+    assert item["url"] == "https://example.com"
+    assert item["createdAt"] == 100
+    assert "lastUpdatedAt" in item
+
+
+def test_stale_writer_cannot_move_a_job_backwards(jobs_table):
+    job = job_state.JobState(jobs_table, "job-1", coalesce_seconds=0)
+    job.transition("PENDING")
+    job.transition("UPLOADING")
+    # A second writer that still believes the job is PENDING
+    late = job_state.JobState(jobs_table, "job-1", status="PENDING", coalesce_seconds=0)
+
+    assert late.transition("RECORDING") is False
+    assert late.rejected
+    assert late.transition("UPLOADING") is False
+    assert stored(jobs_table, "job-1")["status"] == "UPLOADING"
+
+
+def test_final_statuses_are_final(jobs_table):
+    job = job_state.JobState(jobs_table, "job-1", coalesce_seconds=0)
+    job.transition("PENDING")
+    job.transition("COMPLETED")
+
+    other = job_state.JobState(jobs_table, "job-1", status="RECORDING", coalesce_seconds=0)
+    assert other.transition("FAILED") is False
+    assert stored(jobs_table, "job-1")["status"] == "COMPLETED"
+
+
+def test_only_the_first_dispatch_claims_a_job(jobs_table):
+    job_state.JobState(jobs_table, "job-1", coalesce_seconds=0).transition("PENDING")
+
+    first = job_state.JobState(jobs_table, "job-1", coalesce_seconds=0)
+    second = job_state.JobState(jobs_table, "job-1", coalesce_seconds=0)
+
+    assert first.transition("STARTED", flush=True)
+    assert second.transition("STARTED", flush=True) is False
+
+
+def test_a_failed_job_can_be_restarted(jobs_table):
+    job = job_state.JobState(jobs_table, "job-1", coalesce_seconds=0)
+    job.transition("STARTED")
+    job.transition("FAILED")
+
+    retry = job_state.JobState(jobs_table, "job-1", coalesce_seconds=0)
+    assert retry.transition("STARTED", flush=True)
+    assert stored(jobs_table, "job-1")["status"] == "STARTED"
+
+
+def test_records_are_only_created_in_an_initial_status(jobs_table):
+    job = job_state.JobState(jobs_table, "job-1", coalesce_seconds=0)
+
+    assert job.transition("RECORDING") is False
+    assert stored(jobs_table, "job-1") is None
+
+
+def test_attribute_updates_never_create_a_record(jobs_table):
+    job = job_state.JobState(jobs_table, "missing", coalesce_seconds=0)
+
+    assert job.update({"progress": 5}) is False
+    assert stored(jobs_table, "missing") is None
+
+
+def test_quick_transitions_are_coalesced_into_one_write(jobs_table):
+    table = CountingTable(jobs_table)
+    job_state.JobState(jobs_table, "job-1", coalesce_seconds=0).transition("STARTED")
+    job = job_state.JobState(table, "job-1", status="STARTED", coalesce_seconds=60)
+
+    assert job.transition("DOWNLOADING")
+    assert job.transition("RECORDING", {"pid": 42})
+    assert job.update({"bytes": 1024})
+    assert table.updates == 0
+
+    assert job.flush()
+    assert table.updates == 1
+    item = stored(jobs_table, "job-1")
+    assert (item["status"], item["pid"], item["bytes"]) == ("RECORDING", 42, 1024)
+
+
+def test_repeating_the_current_status_is_not_written(jobs_table):
+    table = CountingTable(jobs_table)
+    job = job_state.JobState(table, "job-1", coalesce_seconds=0)
+    job.transition("PENDING")
+
+    assert job.transition("PENDING")
+    assert table.updates == 1
+
+
+def test_final_status_flushes_pending_transitions(jobs_table):
+    table = CountingTable(jobs_table)
+    job_state.JobState(jobs_table, "job-1", coalesce_seconds=0).transition("STARTED")
+    job = job_state.JobState(table, "job-1", status="STARTED", coalesce_seconds=60)
+
+    job.transition("RECORDING")
+    job.transition("COMPLETED")
+
+    assert table.updates == 1
+    assert stored(jobs_table, "job-1")["status"] == "COMPLETED"
+
+
+def test_pending_transitions_are_written_after_the_coalesce_window(jobs_table):
+    job_state.JobState(jobs_table, "job-1", coalesce_seconds=0).transition("STARTED")
+    job = job_state.JobState(jobs_table, "job-1", status="STARTED", coalesce_seconds=0.05)
+
+    job.transition("RECORDING")
+
+    deadline = time.time() + 5
+    while stored(jobs_table, "job-1")["status"] != "RECORDING" and time.time() < deadline:
+        time.sleep(0.01)
+    assert stored(jobs_table, "job-1")["status"] == "RECORDING"
@@ -0,0 +1,149 @@
+import boto3
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+import job_stats
+from conftest import REGION
+
+DAY = 1700000000  # 2023-11-14 UTC
+
+
+class RecordingClient:
+    """Stands in for the DynamoDB client and keeps every transaction request"""
+
+    def __init__(self):
+        self.requests = []
+
+    def transact_write_items(self, **request):
+        self.requests.append(request)
+
+
+@pytest.fixture
+def client(aws):
+    client = boto3.client("dynamodb", region_name=REGION)
+    client.create_table(
+        TableName="job-stats",
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[{"AttributeName": "statKey", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "statKey", "AttributeType": "S"}],
+    )
+    return client
+
+
+def plain(deltas):
+    return {key: {name: value for name, value in counters.items() if value} for key, counters in deltas.items()}
+
+
+def stream_record(event_id, old, new, when):
+    serializer = TypeSerializer()
+    change = {"ApproximateCreationDateTime": when}
+    if old is not None:
+        change["OldImage"] = {k: serializer.serialize(v) for k, v in old.items()}
+    if new is not None:
+        change["NewImage"] = {k: serializer.serialize(v) for k, v in new.items()}
+    return {"eventID": event_id, "dynamodb": change}
+
+
+def test_new_job_is_counted_as_created():
+    deltas = job_stats.job_deltas(None, {"jobId": "a", "status": "PENDING"}, DAY)
+
+    assert plain(deltas) == {
+        "status#PENDING": {"jobs": 1},
+        "day#2023-11-14": {"created": 1},
+        "totals": {"created": 1},
+    }
+
+
+def test_status_change_moves_the_job_between_statuses():
+    deltas = job_stats.job_deltas({"status": "PENDING"}, {"status": "RECORDING"}, DAY)
+
+    assert plain(deltas) == {"status#PENDING": {"jobs": -1}, "status#RECORDING": {"jobs": 1}}
+
+
+def test_completed_job_counts_its_recording_time_and_bytes():
+    old = {"status": "UPLOADING", "bytesDownloaded": 1000, "recordingAt": 100, "uploadingAt": 400}
+    new = dict(old, status="COMPLETED", bytesDownloaded=1500)
+
+    deltas = job_stats.job_deltas(old, new, DAY)
+
+    expected = {"completed": 1, "recordings": 1, "recordingSeconds": 300, "bytesRecorded": 500}
+    assert plain(deltas)["totals"] == expected
+    assert plain(deltas)["day#2023-11-14"] == expected
+
+
+def test_progress_write_only_counts_new_bytes():
+    deltas = job_stats.job_deltas({"status": "RECORDING", "bytesDownloaded": 10},
+                                  {"status": "RECORDING", "bytesDownloaded": 30}, DAY)
+
+    assert plain(deltas) == {"day#2023-11-14": {"bytesRecorded": 20}, "totals": {"bytesRecorded": 20}}
+
+
+def test_expired_job_leaves_its_status_but_not_the_history():
+    deltas = job_stats.job_deltas({"status": "COMPLETED"}, None, DAY)
+
+    assert plain(deltas) == {"status#COMPLETED": {"jobs": -1}}
+
+
+def test_recording_seconds_accepts_iso_times():
+    job = {"startedAt": "2023-11-14T22:13:20Z", "finishedAt": "2023-11-14T22:15:20Z"}
+
+    assert job_stats.recording_seconds(job) == 120
+    assert job_stats.recording_seconds({"startedAt": 500, "finishedAt": 100}) is None
+
+
+def test_stream_batch_is_summed_per_stats_item():
+    records = [
+        stream_record("1", None, {"jobId": "a", "status": "PENDING"}, DAY),
+        stream_record("2", {"jobId": "a", "status": "PENDING"}, {"jobId": "a", "status": "RECORDING"}, DAY + 1),
+        stream_record("3", None, {"jobId": "b", "status": "PENDING"}, DAY + 2),
+    ]
+
+    deltas = job_stats.stream_deltas(records)
+
+    assert plain(deltas) == {
+        "status#PENDING": {"jobs": 1},
+        "status#RECORDING": {"jobs": 1},
+        "day#2023-11-14": {"created": 2},
+        "totals": {"created": 2},
+    }
+    assert job_stats.batch_time(records) == DAY + 2
+
+
+def test_retried_batch_sends_identical_requests():
+    records = [stream_record(str(i), None, {"jobId": f"job-{i}", "status": "PENDING"}, DAY + i) for i in range(3)]
+    first, retry = RecordingClient(), RecordingClient()
+
+    for client in (first, retry):
+        job_stats.apply(client, "job-stats", job_stats.stream_deltas(records),
+                        token=job_stats.batch_token(records), updated_at=job_stats.batch_time(records))
+
+    assert first.requests == retry.requests
+    assert first.requests[0]["ClientRequestToken"] == job_stats.batch_token(records) + "-0"
+
+
+def test_large_batches_are_split_into_transactions():
+    deltas = {f"status#S{i}": {"jobs": 1} for i in range(job_stats.TRANSACTION_ITEMS + 1)}
+    client = RecordingClient()
+
+    assert job_stats.apply(client, "job-stats", deltas, token="t") == job_stats.TRANSACTION_ITEMS + 1
+    assert [len(r["TransactItems"]) for r in client.requests] == [job_stats.TRANSACTION_ITEMS, 1]
+    assert [r["ClientRequestToken"] for r in client.requests] == ["t-0", "t-1"]
+
+
+def test_applied_deltas_are_read_back(client):
+    job_stats.apply(client, "job-stats", job_stats.job_deltas(None, {"status": "PENDING"}, DAY))
+    old = {"status": "UPLOADING", "recordingAt": DAY - 60, "uploadingAt": DAY, "bytesDownloaded": 0}
+    job_stats.apply(client, "job-stats",
+                    job_stats.job_deltas(old, dict(old, status="COMPLETED", bytesDownloaded=2048), DAY))
+
+    stats = job_stats.read_stats(client, "job-stats", days=2, now=DAY)
+
+    assert stats["byStatus"]["PENDING"] == 1
+    assert stats["byStatus"]["UPLOADING"] == -1
+    assert stats["byStatus"]["COMPLETED"] == 1
+    assert stats["totals"] == {
+        "created": 1, "completed": 1, "failed": 0, "bytesRecorded": 2048,
+        "recordings": 1, "recordingSeconds": 60, "averageRecordingSeconds": 60,
+    }
+    assert [day["day"] for day in stats["days"]] == ["2023-11-14", "2023-11-13"]
+    assert stats["days"][1]["created"] == 0
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import message_groups
+
+
+@pytest.mark.parametrize("url,expected", [
+    ("https://www.youtube.com/@Name/live", "youtube.com/@Name"),
+    ("https://youtube.com/channel/UC123/videos", "youtube.com/channel/UC123"),
+    ("https://m.youtube.com/watch?v=abc&t=3", "youtube.com/abc"),
+    ("https://youtu.be/abc?si=share", "youtube.com/abc"),
+    ("https://www.twitch.tv/SomeOne", "twitch.tv/someone"),
+    ("https://kick.com/", "kick.com"),
+])
+def test_channel(url, expected):
+    assert message_groups.channel(url) == expected
+
+
+def test_one_channel_shares_a_group():
+    groups = {
+        message_groups.message_group_id(f"job-{i}", url, shards=16, key="channel")
+        for i, url in enumerate(["https://youtu.be/abc", "https://www.youtube.com/watch?v=abc", "https://youtube.com/live/abc"])
+    }
+    assert len(groups) == 1
+
+
+def test_group_is_one_of_the_shards():
+    group = message_groups.message_group_id("job-1", "https://example.com/live", shards=4)
+    assert group in {f"shard-{n}" for n in range(4)}
+
+
+def test_job_key_requires_a_job_id():
+    with pytest.raises(ValueError):
+        message_groups.message_group_id(None, "https://example.com/live", key="job")
+
+
+@pytest.mark.parametrize("body", [
+    None,
+    "not json",
+    "[]",
+    json.dumps({"url": "https://example.com/live", "filename": "live.mp4"}),
+    json.dumps({"jobId": "job-1", "url": 42, "filename": "live.mp4"}),
+    json.dumps({"jobId": "job-1", "url": "https://example.com/live", "filename": " "}),
+])
+def test_create_job_rejects_invalid_requests(dispatch, body):
+    response = dispatch.handle_api_request({"httpMethod": "POST", "path": "/jobs", "body": body}, None)
+
+    assert response["statusCode"] == 400
+    assert "error" in json.loads(response["body"])
+
+
+def test_failed_job_is_not_overtaken_by_a_later_job_of_its_channel(dispatch, monkeypatch):
+    urls = ["https://www.twitch.tv/someone", "https://twitch.tv/SomeOne/"]
+    records = [
+        {
+            "messageId": f"m{i}",
+            "body": json.dumps({"jobId": f"job-{i}", "url": url, "filename": f"{i}.mp4", "s3Key": f"{i}.mp4"}),
+            "attributes": {"MessageGroupId": message_groups.message_group_id(f"job-{i}", url, key="channel")},
+        }
+        for i, url in enumerate(urls)
+    ]
+    dispatched = []
+
+    def dispatch_record(record, ecs=None):
+        if record["messageId"] == "m0":
+            raise RuntimeError("recorder could not be launched")
+        dispatched.append(record["messageId"])
+
+    monkeypatch.setattr(dispatch, "dispatch_record", dispatch_record)
+    monkeypatch.setenv("AWS_ENDPOINT_URL", "http://localstack:4566")
+    response = dispatch.lambda_handler({"Records": records}, None)
+
+    assert dispatched == []
+    assert [f["itemIdentifier"] for f in response["batchItemFailures"]] == ["m0", "m1"]
@@ -0,0 +1,117 @@
+import struct
+
+import pytest
+
+import piece_sidecar
+import torrent
+from conftest import BUCKET
+from test_torrent import DATA, PIECE_LENGTH, SAMPLE_INFO_HASH, sample_pieces
+
+KEY = "recordings/2024/01/01/sample.mp4"
+
+
+@pytest.fixture
+def head(s3):
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=DATA)
+    return s3.head_object(Bucket=BUCKET, Key=KEY)
+
+
+def sample_sidecar(sha256=None):
+    return piece_sidecar.Sidecar(PIECE_LENGTH, len(DATA), sample_pieces(), sha256)
+
+
+def test_header_layout():
+    data = sample_sidecar("ab" * 32).to_bytes()
+
+    assert data[:4] == b"CTPS"
+    assert struct.unpack_from(">BQQ", data, 4) == (1, PIECE_LENGTH, len(DATA))
+    assert data[21:53] == b"\xab" * 32
+    assert data[53:] == sample_pieces()
+
+
+@pytest.mark.parametrize("sha256", [None, "ab" * 32])
+def test_round_trip(sha256):
+    sidecar = piece_sidecar.Sidecar.from_bytes(sample_sidecar(sha256).to_bytes())
+
+    assert (sidecar.piece_length, sidecar.length, sidecar.pieces, sidecar.sha256) == \
+        (PIECE_LENGTH, len(DATA), sample_pieces(), sha256)
+
+
+@pytest.mark.parametrize("data", [
+    b"CTPS",
+    b"XXXX" + sample_sidecar().to_bytes()[4:],
+    sample_sidecar().to_bytes()[:-20],
+    piece_sidecar.HEADER.pack(b"CTPS", 2, PIECE_LENGTH, len(DATA), bytes(32)) + sample_pieces(),
+])
+def test_malformed_sidecars_are_rejected(data):
+    with pytest.raises(ValueError):
+        piece_sidecar.Sidecar.from_bytes(data)
+
+
+def test_torrent_built_from_a_sidecar_has_the_objects_info_hash():
+    assert torrent.info_hash(sample_sidecar().build_torrent("sample.mp4")) == SAMPLE_INFO_HASH
+
+
+def test_saved_sidecar_is_loaded(s3, head):
+    piece_sidecar.save(s3, BUCKET, KEY, head, sample_sidecar())
+
+    assert s3.head_object(Bucket=BUCKET, Key=KEY + ".pieces")
+    assert piece_sidecar.load(s3, BUCKET, KEY, head).pieces == sample_pieces()
+
+
+def test_sidecar_of_identical_content_is_reused_and_copied(s3, head):
+    piece_sidecar.save(s3, BUCKET, KEY, head, sample_sidecar())
+    copy = "recordings/2024/01/02/copy.mp4"
+    s3.put_object(Bucket=BUCKET, Key=copy, Body=DATA)
+    copy_head = s3.head_object(Bucket=BUCKET, Key=copy)
+
+    assert piece_sidecar.load(s3, BUCKET, copy, copy_head).pieces == sample_pieces()
+    assert s3.head_object(Bucket=BUCKET, Key=copy + ".pieces")["Metadata"]["source-etag"] == copy_head["ETag"]
+
+
+def test_sidecar_of_an_older_version_is_ignored(s3, head):
+    piece_sidecar.save(s3, BUCKET, KEY, head, sample_sidecar())
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=DATA[:-1])
+
+    assert piece_sidecar.load(s3, BUCKET, KEY, s3.head_object(Bucket=BUCKET, Key=KEY)) is None
+
+
+def test_missing_sidecar(s3, head):
+    assert piece_sidecar.load(s3, BUCKET, KEY, head) is None
+
+
+def test_checkpoint_round_trip(s3, head):
+    done = piece_sidecar.Sidecar(PIECE_LENGTH, 2 * PIECE_LENGTH, sample_pieces()[:40])
+
+    piece_sidecar.save_checkpoint(s3, BUCKET, head, done)
+
+    assert piece_sidecar.checkpoint_key(head).startswith("pieces/partial/")
+    checkpoint = piece_sidecar.load_checkpoint(s3, BUCKET, head)
+    assert (checkpoint.length, checkpoint.pieces) == (2 * PIECE_LENGTH, sample_pieces()[:40])
+
+    piece_sidecar.delete_checkpoint(s3, BUCKET, head)
+    assert piece_sidecar.load_checkpoint(s3, BUCKET, head) is None
+
+
+@pytest.mark.parametrize("length, pieces", [
+    # the whole object: nothing is left to resume
+    (len(DATA), 5),
+    # not on a piece boundary
+    (PIECE_LENGTH + 1, 2),
+])
+def test_unusable_checkpoints_are_ignored(s3, head, length, pieces):
+    piece_sidecar.save_checkpoint(s3, BUCKET, head,
+                                  piece_sidecar.Sidecar(PIECE_LENGTH, length, sample_pieces()[:pieces * 20]))
+
+    assert piece_sidecar.load_checkpoint(s3, BUCKET, head) is None
+
+
+def test_main_rebuilds_the_torrent(s3, head, monkeypatch):
+    monkeypatch.delenv("TRACKERS", raising=False)
+    monkeypatch.delenv("WEB_SEED_URLS", raising=False)
+    piece_sidecar.save(s3, BUCKET, KEY, head, sample_sidecar())
+
+    assert piece_sidecar.main([BUCKET, KEY, "-t", "udp://a:1/announce"]) == 0
+
+    torrent_bytes = s3.get_object(Bucket=BUCKET, Key="watch/sample.mp4.torrent")["Body"].read()
+    assert torrent.info_hash(torrent_bytes) == SAMPLE_INFO_HASH
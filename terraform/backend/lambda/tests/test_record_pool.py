@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+import record_pool
+
+
+def acquire_in_thread(budget, cost):
+    """Start acquire(cost) on a thread; the returned event is set once it got the budget"""
+    acquired = threading.Event()
+
+    def acquire():
+        budget.acquire(cost)
+        acquired.set()
+    threading.Thread(target=acquire, daemon=True).start()
+    return acquired
+
+
+def test_costs_that_fit_do_not_wait():
+    budget = record_pool.Budget(100)
+
+    budget.acquire(60)
+    budget.acquire(40)
+
+    assert budget.used == 100
+
+
+def test_acquire_waits_for_a_release():
+    budget = record_pool.Budget(100)
+    budget.acquire(60)
+
+    acquired = acquire_in_thread(budget, 50)
+    assert not acquired.wait(0.2)
+
+    budget.release(60)
+    assert acquired.wait(5)
+    assert budget.used == 50
+
+
+def test_cost_over_the_whole_budget_runs_alone():
+    budget = record_pool.Budget(100)
+
+    budget.acquire(500)
+    assert budget.used == 500
+
+    acquired = acquire_in_thread(budget, 1)
+    assert not acquired.wait(0.2)
+    budget.release(500)
+    assert acquired.wait(5)
+
+
+def test_run_isolates_failing_items():
+    done = []
+
+    def work(item):
+        if item == 2:
+            raise ValueError("bad item")
+        done.append(item)
+
+    budget = record_pool.Budget(100)
+    record_pool.run(range(5), work, lambda item: 10, budget)
+
+    assert sorted(done) == [0, 1, 3, 4]
+    assert budget.used == 0
+
+
+def test_run_stays_within_budget_and_max_workers():
+    running = []
+    peak = {"cost": 0, "items": 0}
+    lock = threading.Lock()
+
+    def work(item):
+        with lock:
+            running.append(item)
+            peak["cost"] = max(peak["cost"], sum(running))
+            peak["items"] = max(peak["items"], len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(item)
+
+    record_pool.run([30, 30, 30, 30, 30, 60], work, lambda item: item, record_pool.Budget(100), max_workers=4)
+
+    assert peak["cost"] <= 100
+    assert peak["items"] == 3
+
+
+@pytest.mark.parametrize("memory_mb, fraction, budget", [
+    ("1024", 0.5, 512 * 1024 * 1024),
+    ("3008", 0.25, 752 * 1024 * 1024),
+])
+def test_memory_budget(monkeypatch, memory_mb, fraction, budget):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", memory_mb)
+
+    assert record_pool.memory_budget(fraction) == budget
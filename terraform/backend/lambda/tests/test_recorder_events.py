@@ -0,0 +1,137 @@
+import importlib
+
+import pytest
+
+import active_recordings
+
+URL = "https://www.twitch.tv/someone"
+
+
+@pytest.fixture
+def recorder_events(jobs_table, index_table, monkeypatch):
+    """recorder_events, imported with the environment the Lambda is given"""
+    monkeypatch.setenv("DDB_TABLE", jobs_table.name)
+    monkeypatch.setenv("ACTIVE_RECORDINGS_TABLE", index_table.name)
+    monkeypatch.setenv("CONTAINER_NAME", "chronicle-recorder")
+    import recorder_events
+    return importlib.reload(recorder_events)
+
+
+def put_job(jobs_table, job_id, status):
+    jobs_table.put_item(Item={"jobId": job_id, "status": status, "url": URL, "createdAt": 1, "lastUpdatedAt": 1})
+
+
+def claimed_by(index_table):
+    entry = index_table.get_item(Key={"urlKey": active_recordings.normalize_url(URL)}).get("Item")
+    return entry and entry["jobId"]
+
+
+@pytest.mark.parametrize("status", ["RECORDING", "COMPLETED"])
+def test_recorder_exit_releases_the_url(recorder_events, jobs_table, index_table, status):
+    active_recordings.claim(index_table, jobs_table, URL, "job-1")
+    put_job(jobs_table, "job-1", status)
+
+    recorder_events.record_recorder_exit("job-1", 0)
+
+    assert claimed_by(index_table) is None
+
+
+def test_recorder_exit_leaves_a_newer_claim_alone(recorder_events, jobs_table, index_table):
+    put_job(jobs_table, "job-1", "FAILED")
+    active_recordings.claim(index_table, jobs_table, URL, "job-2")
+
+    recorder_events.record_recorder_exit("job-1", 1)
+
+    assert claimed_by(index_table) == "job-2"
+
+
+def task_event(job_id="job-1", last_status="STOPPED", exit_code=0, stopped_reason=None, containers=None):
+    detail = {
+        "taskArn": "arn:aws:ecs:us-east-1:123456789012:task/chronicle/abc",
+        "lastStatus": last_status,
+        "overrides": {"containerOverrides": [{
+            "name": "chronicle-recorder",
+            "environment": [{"name": "S3_KEY", "value": "recordings/x.mp4"}]
+            + ([{"name": "JOB_ID", "value": job_id}] if job_id else []),
+        }]},
+        "containers": containers if containers is not None else [
+            {"name": "chronicle-recorder", "exitCode": exit_code}],
+    }
+    if stopped_reason:
+        detail["stoppedReason"] = stopped_reason
+    return {"source": "aws.ecs", "detail-type": "ECS Task State Change", "detail": detail}
+
+
+def job(jobs_table, job_id="job-1"):
+    return jobs_table.get_item(Key={"jobId": job_id}).get("Item")
+
+
+def test_exit_code_0_completes_the_job(recorder_events, jobs_table):
+    put_job(jobs_table, "job-1", "RECORDING")
+
+    assert recorder_events.lambda_handler(task_event(), None) == {"status": "processed"}
+
+    item = job(jobs_table)
+    assert item["status"] == "COMPLETED"
+    assert "finishedAt" in item
+
+
+def test_non_zero_exit_code_fails_the_job_with_the_stopped_reason(recorder_events, jobs_table):
+    put_job(jobs_table, "job-1", "RECORDING")
+
+    recorder_events.lambda_handler(task_event(exit_code=137, stopped_reason="OutOfMemoryError"), None)
+
+    item = job(jobs_table)
+    assert (item["status"], item["error"]) == ("FAILED", "OutOfMemoryError")
+
+
+def test_non_zero_exit_code_without_a_reason(recorder_events, jobs_table):
+    put_job(jobs_table, "job-1", "STARTED")
+
+    recorder_events.lambda_handler(task_event(exit_code=2), None)
+
+    assert job(jobs_table)["error"] == "ECS task exited with code 2"
+
+
+@pytest.mark.parametrize("containers", [
+    [],
+    [{"name": "sidecar", "exitCode": 0}],
+    [{"name": "chronicle-recorder"}],
+])
+def test_recorder_that_never_ran_fails_the_job(recorder_events, jobs_table, containers):
+    put_job(jobs_table, "job-1", "STARTED")
+
+    recorder_events.lambda_handler(task_event(containers=containers), None)
+
+    item = job(jobs_table)
+    assert (item["status"], item["error"]) == ("FAILED", "ECS task exited with code -1")
+
+
+def test_task_without_a_job_id_is_ignored(recorder_events, jobs_table):
+    assert recorder_events.lambda_handler(task_event(job_id=None), None) == {"status": "ignored"}
+    assert jobs_table.scan()["Items"] == []
+
+
+@pytest.mark.parametrize("last_status", ["PROVISIONING", "RUNNING", "DEPROVISIONING"])
+def test_tasks_that_have_not_stopped_are_ignored(recorder_events, jobs_table, last_status):
+    put_job(jobs_table, "job-1", "STARTED")
+
+    assert recorder_events.lambda_handler(task_event(last_status=last_status), None) == {"status": "ignored"}
+    assert job(jobs_table)["status"] == "STARTED"
+
+
+@pytest.mark.parametrize("status, exit_code", [("COMPLETED", 1), ("FAILED", 0)])
+def test_final_status_written_by_the_recorder_is_kept(recorder_events, jobs_table, status, exit_code):
+    put_job(jobs_table, "job-1", status)
+
+    recorder_events.lambda_handler(task_event(exit_code=exit_code, stopped_reason="Essential container exited"),
+                                   None)
+
+    item = job(jobs_table)
+    assert item["status"] == status
+    assert "error" not in item
+
+
+def test_missing_job_record_is_not_created(recorder_events, jobs_table):
+    assert recorder_events.lambda_handler(task_event(job_id="unknown-job"), None) == {"status": "processed"}
+    assert job(jobs_table, "unknown-job") is None
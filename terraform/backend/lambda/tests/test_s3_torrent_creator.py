@@ -0,0 +1,69 @@
+import importlib
+
+import pytest
+
+import torrent
+from conftest import BUCKET
+from test_torrent import DATA
+
+
+@pytest.fixture
+def creator(s3, jobs_table, monkeypatch):
+    """s3_torrent_creator, imported with the environment the Lambda is given"""
+    monkeypatch.setenv("DDB_TABLE", jobs_table.name)
+    monkeypatch.delenv("TRACKERS", raising=False)
+    import s3_torrent_creator
+    return importlib.reload(s3_torrent_creator)
+
+
+def s3_event(*keys):
+    return {"Records": [
+        {"eventSource": "aws:s3", "s3": {"bucket": {"name": BUCKET}, "object": {"key": key, "size": len(DATA)}}}
+        for key in keys
+    ]}
+
+
+def job_statuses(jobs_table):
+    return {item["s3Key"]: item["status"] for item in jobs_table.scan()["Items"]}
+
+
+def test_each_object_gets_its_own_job_and_torrent(creator, s3, jobs_table):
+    s3.put_object(Bucket=BUCKET, Key="recordings/a.mp4", Body=DATA)
+    s3.put_object(Bucket=BUCKET, Key="recordings/b.mp4", Body=DATA[:1000])
+
+    creator.lambda_handler(s3_event("recordings/a.mp4", "recordings/b.mp4"), None)
+
+    assert job_statuses(jobs_table) == {"recordings/a.mp4": "COMPLETED", "recordings/b.mp4": "COMPLETED"}
+    torrent_bytes = s3.get_object(Bucket=BUCKET, Key="watch/b.mp4.torrent")["Body"].read()
+    assert torrent.bdecode(torrent_bytes)["info"]["length"] == 1000
+
+
+def test_failing_object_leaves_the_others_alone(creator, s3, jobs_table):
+    s3.put_object(Bucket=BUCKET, Key="recordings/a.mp4", Body=DATA)
+    s3.put_object(Bucket=BUCKET, Key="recordings/c.mp4", Body=DATA)
+
+    # b.mp4 is gone by the time it is processed
+    creator.lambda_handler(s3_event("recordings/a.mp4", "recordings/b.mp4", "recordings/c.mp4"), None)
+
+    assert job_statuses(jobs_table) == {
+        "recordings/a.mp4": "COMPLETED",
+        "recordings/b.mp4": "FAILED",
+        "recordings/c.mp4": "COMPLETED",
+    }
+    assert "watch/b.mp4.torrent" not in [o["Key"] for o in s3.list_objects_v2(Bucket=BUCKET)["Contents"]]
+
+
+def test_exception_in_one_object_leaves_the_others_alone(creator, s3, jobs_table, monkeypatch):
+    s3.put_object(Bucket=BUCKET, Key="recordings/a.mp4", Body=DATA)
+    s3.put_object(Bucket=BUCKET, Key="recordings/b.mp4", Body=DATA)
+    process_object = creator.process_object
+
+    def crash_on_a(s3_bucket, s3_key, context=None, job_id=None):
+        if s3_key == "recordings/a.mp4":
+            raise RuntimeError("worker crashed")
+        process_object(s3_bucket, s3_key, context, job_id)
+    monkeypatch.setattr(creator, "process_object", crash_on_a)
+
+    creator.lambda_handler(s3_event("recordings/a.mp4", "recordings/b.mp4"), None)
+
+    assert job_statuses(jobs_table) == {"recordings/b.mp4": "COMPLETED"}
@@ -0,0 +1,162 @@
+import os
+import json
+
+import pytest
+
+import s3_uploader
+from conftest import BUCKET
+
+MiB = s3_uploader.MiB
+
+
+class FlakyS3:
+    """Wraps an S3 client: counts uploaded parts and fails the listed part numbers once"""
+
+    def __init__(self, client, fail_parts=()):
+        self.client = client
+        self.fail_parts = set(fail_parts)
+        self.uploaded = []
+
+    def upload_part(self, **kwargs):
+        if kwargs["PartNumber"] in self.fail_parts:
+            self.fail_parts.discard(kwargs["PartNumber"])
+            raise ConnectionError(f"part {kwargs['PartNumber']} lost")
+        self.uploaded.append(kwargs["PartNumber"])
+        return self.client.upload_part(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def write(path, size, seed=b"x"):
+    data = (seed * 1021)[:1021]
+    data = (data * (size // len(data) + 1))[:size]
+    path.write_bytes(data)
+    return data
+
+
+def stored(s3, key):
+    return s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def test_part_size_stays_within_the_part_limit():
+    assert s3_uploader.part_size_for(100, 1) == s3_uploader.MIN_PART_SIZE
+    size = 5 * MiB * s3_uploader.MAX_PARTS + 1
+    part_size = s3_uploader.part_size_for(size, 5 * MiB)
+    assert part_size % MiB == 0
+    assert -(-size // part_size) <= s3_uploader.MAX_PARTS
+
+
+def test_small_file_is_sent_in_one_request(s3, tmp_path):
+    path = tmp_path / "small.mp4"
+    data = write(path, 1000)
+
+    result = s3_uploader.upload_file(s3, str(path), BUCKET, "small.mp4")
+
+    assert result.parts == 1
+    assert stored(s3, "small.mp4") == data
+
+
+def test_multipart_upload(s3, tmp_path):
+    path = tmp_path / "video.mp4"
+    data = write(path, 11 * MiB)
+
+    result = s3_uploader.upload_file(s3, str(path), BUCKET, "video.mp4", part_size=5 * MiB, concurrency=2)
+
+    assert (result.parts, result.resumed_parts) == (3, 0)
+    assert stored(s3, "video.mp4") == data
+    assert not os.path.exists(str(path) + ".upload")
+
+
+def test_failed_upload_resumes_with_the_missing_parts_only(s3, tmp_path):
+    path = tmp_path / "video.mp4"
+    data = write(path, 11 * MiB)
+    flaky = FlakyS3(s3, fail_parts=[3])
+
+    with pytest.raises(ConnectionError):
+        s3_uploader.upload_file(flaky, str(path), BUCKET, "video.mp4", part_size=5 * MiB, concurrency=1)
+    assert os.path.exists(str(path) + ".upload")
+
+    retry = FlakyS3(s3)
+    result = s3_uploader.upload_file(retry, str(path), BUCKET, "video.mp4", part_size=5 * MiB)
+
+    assert retry.uploaded == [3]
+    assert result.resumed_parts == 2
+    assert stored(s3, "video.mp4") == data
+    assert not os.path.exists(str(path) + ".upload")
+
+
+def test_changed_file_starts_a_new_upload(s3, tmp_path):
+    path = tmp_path / "video.mp4"
+    write(path, 11 * MiB)
+    with pytest.raises(ConnectionError):
+        s3_uploader.upload_file(FlakyS3(s3, fail_parts=[3]), str(path), BUCKET, "video.mp4",
+                                part_size=5 * MiB, concurrency=1)
+
+    data = write(path, 12 * MiB, seed=b"y")
+    retry = FlakyS3(s3)
+    result = s3_uploader.upload_file(retry, str(path), BUCKET, "video.mp4", part_size=5 * MiB)
+
+    assert sorted(retry.uploaded) == [1, 2, 3]
+    assert result.resumed_parts == 0
+    assert stored(s3, "video.mp4") == data
+
+
+def test_checkpoint_of_an_aborted_upload_starts_over(s3, tmp_path):
+    path = tmp_path / "video.mp4"
+    data = write(path, 11 * MiB)
+    checkpoint = str(path) + ".upload"
+    with pytest.raises(ConnectionError):
+        s3_uploader.upload_file(FlakyS3(s3, fail_parts=[3]), str(path), BUCKET, "video.mp4",
+                                part_size=5 * MiB, concurrency=1)
+    with open(checkpoint) as f:
+        upload_id = json.load(f)["uploadId"]
+    s3.abort_multipart_upload(Bucket=BUCKET, Key="video.mp4", UploadId=upload_id)
+
+    result = s3_uploader.upload_file(s3, str(path), BUCKET, "video.mp4", part_size=5 * MiB)
+
+    assert result.resumed_parts == 0
+    assert stored(s3, "video.mp4") == data
+
+
+
+def test_live_upload_sends_settled_parts_and_resends_a_rewritten_header(s3, tmp_path):
+    path = tmp_path / "live.mp4"
+    write(path, 11 * MiB)
+    flaky = FlakyS3(s3)
+    live = s3_uploader.LiveUpload(flaky, str(path), BUCKET, "live.mp4", part_size=5 * MiB,
+                                  concurrency=2, settle_bytes=0)
+
+    assert live.poll() == 2
+    live._drain()
+    assert sorted(flaky.uploaded) == [1, 2]
+
+    # The writer appends the rest, then patches its header on close
+    with open(path, "ab") as f:
+        f.write(b"z" * MiB)
+    with open(path, "r+b") as f:
+        f.write(b"HEADER")
+    result = live.finish()
+
+    assert result.parts == 3
+    assert sorted(flaky.uploaded) == [1, 1, 2, 3]
+    assert stored(s3, "live.mp4") == path.read_bytes()
+
+
+def test_live_upload_of_an_append_only_file_sends_each_part_once(s3, tmp_path):
+    # MPEG-TS (--hls-use-mpegts) is only appended to, so no part is resent
+    path = tmp_path / "live.ts"
+    write(path, 6 * MiB)
+    flaky = FlakyS3(s3)
+    live = s3_uploader.LiveUpload(flaky, str(path), BUCKET, "live.ts", part_size=5 * MiB,
+                                  concurrency=2, settle_bytes=0)
+
+    assert live.poll() == 1
+    with open(path, "ab") as f:
+        f.write(b"t" * 6 * MiB)
+    live.poll()
+    result = live.finish()
+
+    assert result.parts == 3
+    assert sorted(flaky.uploaded) == [1, 2, 3]
+    assert stored(s3, "live.ts") == path.read_bytes()
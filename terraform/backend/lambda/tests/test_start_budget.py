@@ -0,0 +1,125 @@
+"""Cold/warm start budget of the Lambda handlers.
+
+Each handler module is imported in a fresh interpreter (a cold start) and
+must load within the cold budget without pulling in modules that only one
+code path needs. The per-container caches (clients, the jobs table check,
+the watch folder check) are then exercised twice and the second (warm) call
+must be close to free; AWS calls are answered by botocore stubs and counted,
+so a warm call that goes back to AWS fails.
+"""
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets in milliseconds; raise them on a slow machine rather than skipping the test
+COLD_MS = float(os.environ.get("START_BUDGET_COLD_MS", "1500"))
+WARM_MS = float(os.environ.get("START_BUDGET_WARM_MS", "5"))
+
+# Handler module -> modules it must not import at cold start. The creators'
+# process pool (hash_engine) is created on first use; boto3's S3 transfer
+# manager imports multiprocessing itself, so the pool's module is checked
+HANDLERS = {
+    "dispatch_to_ecs": ("docker",),
+    "s3_torrent_creator": ("docker", "concurrent.futures.process"),
+    "s3_torrent_creator_local": ("docker", "concurrent.futures.process"),
+    "recorder_events": ("docker",),
+}
+
+# Environment the handlers read at import time
+HANDLER_ENV = {
+    "DDB_TABLE": "jobs",
+    "AWS_REGION": "us-west-1",
+    "AWS_DEFAULT_REGION": "us-west-1",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "SQS_QUEUE_URL": "http://localhost:4566/000000000000/jobs",
+    "S3_BUCKET": "budget-check",
+}
+
+COLD_PROBE = """
+import sys, time, json, logging
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+logging.disable(logging.CRITICAL)
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+WARM_PROBE = """
+import time, json, logging
+from botocore.stub import Stubber
+logging.disable(logging.CRITICAL)
+import clients
+import s3_torrent_creator
+import s3_torrent_creator_local
+
+# One stubbed response per cached AWS call, and a count of the calls made:
+# the watch folder check swallows errors, so a warm call that goes back to
+# AWS is caught by the count rather than by the missing response
+calls = []
+for client, method, response in (
+    (s3_torrent_creator.s3_client, "list_objects_v2", {{"Contents": [{{"Key": "watch/"}}]}}),
+    (s3_torrent_creator_local.s3_client, "list_objects_v2", {{"Contents": [{{"Key": "watch/"}}]}}),
+    (clients.client("dynamodb"), "describe_table", {{"Table": {{"TableName": "jobs"}}}}),
+):
+    client.meta.events.register_first("before-parameter-build.*.*", lambda **kwargs: calls.append(1))
+    stubber = Stubber(client)
+    stubber.add_response(method, response)
+    stubber.activate()
+
+timings = {{}}
+aws_calls = {{}}
+for name, probe in (
+    ("clients.client", lambda: clients.client("sqs")),
+    ("clients.table", lambda: clients.table("jobs")),
+    ("check_dynamodb_table", s3_torrent_creator_local.check_dynamodb_table),
+    ("ensure_watch_folder", lambda: s3_torrent_creator.index.ensure_watch_folder("{bucket}")),
+    ("ensure_watch_folder (local)", lambda: s3_torrent_creator_local.index.ensure_watch_folder("{bucket}")),
+):
+    probe()
+    del calls[:]
+    start = time.perf_counter()
+    probe()
+    timings[name] = (time.perf_counter() - start) * 1000
+    aws_calls[name] = len(calls)
+print(json.dumps({{"ms": timings, "calls": aws_calls}}))
+"""
+
+
+def run_probe(source):
+    env = dict(os.environ, **HANDLER_ENV)
+    env.pop("AWS_ENDPOINT_URL", None)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [LAMBDA_DIR, env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, "-c", source], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", sorted(HANDLERS))
+def test_cold_start(module):
+    cold = run_probe(COLD_PROBE.format(module=module, forbidden=HANDLERS[module]))
+
+    assert cold["loaded"] == [], f"{module} imports {cold['loaded']} at cold start"
+    assert cold["ms"] <= COLD_MS, f"{module}: cold import took {cold['ms']:.1f} ms (budget {COLD_MS:.0f} ms)"
+
+
+@pytest.fixture(scope="module")
+def warm():
+    return run_probe(WARM_PROBE.format(bucket=HANDLER_ENV["S3_BUCKET"]))
+
+
+@pytest.mark.parametrize("probe", [
+    "clients.client",
+    "clients.table",
+    "check_dynamodb_table",
+    "ensure_watch_folder",
+    "ensure_watch_folder (local)",
+])
+def test_warm_call_uses_its_cache(warm, probe):
+    assert warm["calls"][probe] == 0, f"{probe}: warm call made {warm['calls'][probe]} AWS call(s)"
+    assert warm["ms"][probe] <= WARM_MS, f"{probe}: warm call took {warm['ms'][probe]:.1f} ms (budget {WARM_MS:.0f} ms)"
@@ -0,0 +1,118 @@
+import hashlib
+
+import pytest
+
+import torrent
+
+PIECE_LENGTH = 256 * 1024
+# 4 full pieces and a 4-byte last piece
+DATA = bytes(range(256)) * 4096 + b"tail"
+# SHA-1 of the info dict, bencoded by hand:
+# d6:lengthi1048580e4:name10:sample.mp412:piece lengthi262144e6:pieces100:<pieces>e
+SAMPLE_INFO_HASH = "1dd277b810caa5416fd57635d3a8ea36c6e59b78"
+
+
+def sample_pieces():
+    return b"".join(hashlib.sha1(DATA[i:i + PIECE_LENGTH]).digest() for i in range(0, len(DATA), PIECE_LENGTH))
+
+
+def sample_torrent(**kwargs):
+    return torrent.build_torrent("sample.mp4", len(DATA), PIECE_LENGTH, sample_pieces(), **kwargs)
+
+
+@pytest.mark.parametrize("value, encoded", [
+    (b"spam", b"4:spam"),
+    ("", b"0:"),
+    (3, b"i3e"),
+    (-3, b"i-3e"),
+    (0, b"i0e"),
+    ([b"spam", b"eggs"], b"l4:spam4:eggse"),
+    ({"cow": b"moo", "spam": b"eggs"}, b"d3:cow3:moo4:spam4:eggse"),
+    ({"spam": [b"a", b"b"]}, b"d4:spaml1:a1:bee"),
+])
+def test_bencode_matches_the_spec_examples(value, encoded):
+    assert torrent.bencode(value) == encoded
+
+
+def test_bencode_sorts_keys_and_encodes_text_as_utf8():
+    assert torrent.bencode({"b": 1, "a": "é"}) == b"d1:a2:\xc3\xa91:bi1ee"
+
+
+def test_bencode_rejects_bools():
+    with pytest.raises(TypeError):
+        torrent.bencode(True)
+
+
+def test_bdecode_round_trip():
+    value = {"announce": b"http://tracker/announce", "info": {"length": 5, "pieces": b"\x00\xff" * 10},
+             "url-list": [b"https://a/x", b"https://b/x"]}
+
+    assert torrent.bdecode(torrent.bencode(value)) == value
+
+
+@pytest.mark.parametrize("data", [b"i03e", b"i-0e", b"ie", b"5:spam", b"l4:spam", b"4:spamX", b"x"])
+def test_bdecode_rejects_malformed_data(data):
+    with pytest.raises(ValueError):
+        torrent.bdecode(data)
+
+
+@pytest.mark.parametrize("size, piece_length", [
+    (0, 256 * 1024),
+    (1500 * 256 * 1024, 256 * 1024),
+    (1500 * 256 * 1024 + 1, 512 * 1024),
+    (10 * 1024 ** 3, 8 * 1024 * 1024),
+    (10 * 1024 ** 4, 16 * 1024 * 1024),
+])
+def test_piece_length_for_size(size, piece_length):
+    assert torrent.piece_length_for_size(size) == piece_length
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1000, PIECE_LENGTH, PIECE_LENGTH + 1, len(DATA)])
+def test_piece_hasher_does_not_depend_on_chunking(chunk_size):
+    hasher = torrent.PieceHasher(PIECE_LENGTH)
+    for i in range(0, len(DATA), chunk_size):
+        hasher.update(DATA[i:i + chunk_size])
+
+    assert hasher.length == len(DATA)
+    assert hasher.digest() == sample_pieces()
+
+
+def test_piece_hasher_of_nothing_has_no_pieces():
+    assert torrent.PieceHasher(PIECE_LENGTH).digest() == b""
+
+
+def test_info_hash_of_a_known_torrent():
+    assert torrent.info_hash(sample_torrent()) == SAMPLE_INFO_HASH
+
+
+def test_trackers_and_web_seeds_do_not_change_the_info_hash():
+    torrent_bytes = sample_torrent(trackers=["udp://a:1/announce"], comment="hi", web_seeds=["https://cdn/x"])
+
+    assert torrent.info_hash(torrent_bytes) == SAMPLE_INFO_HASH
+
+
+def test_single_tracker_has_no_announce_list():
+    metainfo = torrent.bdecode(sample_torrent(trackers=["udp://a:1/announce"]))
+
+    assert metainfo["announce"] == b"udp://a:1/announce"
+    assert "announce-list" not in metainfo
+
+
+def test_tracker_tiers():
+    metainfo = torrent.bdecode(sample_torrent(trackers=[["udp://a:1/announce", "", "udp://b:1/announce"],
+                                                        "http://c/announce", [], ""]))
+
+    assert metainfo["announce"] == b"udp://a:1/announce"
+    assert metainfo["announce-list"] == [[b"udp://a:1/announce", b"udp://b:1/announce"], [b"http://c/announce"]]
+
+
+def test_web_seeds_become_the_url_list():
+    metainfo = torrent.bdecode(sample_torrent(web_seeds=["https://cdn/x", "", "https://mirror/x"]))
+
+    assert metainfo["url-list"] == [b"https://cdn/x", b"https://mirror/x"]
+    assert "announce" not in metainfo
+
+
+def test_create_torrent_checks_the_size():
+    with pytest.raises(IOError):
+        torrent.create_torrent("sample.mp4", len(DATA) + 1, [DATA], piece_length=PIECE_LENGTH)
@@ -0,0 +1,117 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import torrent_index
+from conftest import BUCKET
+
+
+class CountingS3:
+    """Wraps an S3 client and counts the calls made through it"""
+
+    def __init__(self, client, fail_listing=False):
+        self.client = client
+        self.fail_listing = fail_listing
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def call(**kwargs):
+            self.calls.append(name)
+            if name == "list_objects_v2" and self.fail_listing:
+                raise ClientError({"Error": {"Code": "AccessDenied", "Message": "denied"}}, name)
+            return method(**kwargs)
+        return call
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(torrent_index.time, "monotonic", lambda: now[0])
+    return now
+
+
+def put(s3, *keys):
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"x")
+
+
+def test_torrent_keys():
+    assert torrent_index.torrent_key("recordings/a/b.mp4") == "recordings/a/b.mp4.torrent"
+    assert torrent_index.watch_torrent_key("recordings/a/b.mp4") == "watch/b.mp4.torrent"
+
+
+def test_existing_torrents_are_found_with_one_listing_per_location(s3):
+    put(s3, "recordings/a.mp4.torrent", "recordings/aa.mp4.torrent", "recordings/c.mp4",
+        "recordings/z.mp4.torrent", "watch/b.mp4.torrent")
+    counting = CountingS3(s3)
+
+    found = torrent_index.TorrentIndex(counting).existing(
+        BUCKET, ["recordings/a.mp4", "recordings/b.mp4", "recordings/c.mp4"])
+
+    assert found == {"recordings/a.mp4": "recordings/a.mp4.torrent", "recordings/b.mp4": "watch/b.mp4.torrent"}
+    assert counting.calls == ["list_objects_v2", "list_objects_v2"]
+
+
+def test_listing_follows_continuation_tokens(s3):
+    put(s3, *[f"recordings/{i:03}.mp4.torrent" for i in range(0, 30, 2)])
+    counting = CountingS3(s3)
+    original = s3.list_objects_v2
+    counting.client = type("Paged", (), {"list_objects_v2": lambda self, **kw: original(MaxKeys=4, **kw)})()
+
+    found = torrent_index.TorrentIndex(counting).existing(BUCKET, [f"recordings/{i:03}.mp4" for i in range(30)])
+
+    assert sorted(found) == [f"recordings/{i:03}.mp4" for i in range(0, 30, 2)]
+    assert counting.calls.count("list_objects_v2") > 2
+
+
+def test_failed_listing_falls_back_to_head_object(s3):
+    put(s3, "recordings/a.mp4.torrent")
+    counting = CountingS3(s3, fail_listing=True)
+
+    found = torrent_index.TorrentIndex(counting).existing(BUCKET, ["recordings/a.mp4", "recordings/b.mp4"])
+
+    assert found == {"recordings/a.mp4": "recordings/a.mp4.torrent"}
+    # Both locations of both objects
+    assert counting.calls.count("head_object") == 4
+
+
+def test_known_torrents_are_trusted_for_the_ttl(s3, clock):
+    counting = CountingS3(s3)
+    index = torrent_index.TorrentIndex(counting, ttl=60)
+    index.add(BUCKET, "recordings/a.mp4.torrent")
+
+    assert index.existing(BUCKET, ["recordings/a.mp4"]) == {"recordings/a.mp4": "recordings/a.mp4.torrent"}
+    # Only the watch folder location is still listed
+    assert counting.calls == ["list_objects_v2"]
+    counting.calls.clear()
+
+    clock[0] += 61
+    assert index.existing(BUCKET, ["recordings/a.mp4"]) == {}
+    assert counting.calls == ["list_objects_v2", "list_objects_v2"]
+
+
+def test_found_torrents_are_remembered(s3, clock):
+    put(s3, "recordings/a.mp4.torrent", "watch/a.mp4.torrent")
+    counting = CountingS3(s3)
+    index = torrent_index.TorrentIndex(counting, ttl=60)
+    index.existing(BUCKET, ["recordings/a.mp4"])
+    counting.calls.clear()
+
+    assert index.existing(BUCKET, ["recordings/a.mp4"]) == {"recordings/a.mp4": "recordings/a.mp4.torrent"}
+    assert counting.calls == []
+
+
+def test_watch_folder_is_created_and_checked_once_per_ttl(s3, clock):
+    counting = CountingS3(s3)
+    index = torrent_index.TorrentIndex(counting, ttl=60)
+
+    index.ensure_watch_folder(BUCKET)
+    index.ensure_watch_folder(BUCKET)
+
+    assert counting.calls == ["list_objects_v2", "put_object"]
+    assert s3.head_object(Bucket=BUCKET, Key="watch/")
+
+    clock[0] += 61
+    index.ensure_watch_folder(BUCKET)
+    assert counting.calls == ["list_objects_v2", "put_object", "list_objects_v2"]
@@ -0,0 +1,208 @@
+import hashlib
+import time
+
+# Default piece size used when a caller does not choose one explicitly
+DEFAULT_PIECE_LENGTH = 256 * 1024
+
+# Piece-length policy: aim for roughly TARGET_PIECES pieces per torrent,
+# using a power of two between MIN_PIECE_LENGTH and MAX_PIECE_LENGTH
+MIN_PIECE_LENGTH = 256 * 1024
+MAX_PIECE_LENGTH = 16 * 1024 * 1024
+TARGET_PIECES = 1500
+
+CREATED_BY = "Chronicle Torrent"
+
+
+def _encode(value, out):
+    # Appends encoded fragments to out, so nested values are joined once at the end
+    if isinstance(value, bytes):
+        out.append(b"%d:" % len(value))
+        out.append(value)
+    elif isinstance(value, str):
+        value = value.encode("utf-8")
+        out.append(b"%d:" % len(value))
+        out.append(value)
+    elif isinstance(value, bool):
+        raise TypeError("Cannot bencode a bool")
+    elif isinstance(value, int):
+        out.append(b"i%de" % value)
+    elif isinstance(value, dict):
+        out.append(b"d")
+        for key, item in sorted(
+            (k.encode("utf-8") if isinstance(k, str) else bytes(k), v) for k, v in value.items()
+        ):
+            out.append(b"%d:" % len(key))
+            out.append(key)
+            _encode(item, out)
+        out.append(b"e")
+    elif isinstance(value, (list, tuple)):
+        out.append(b"l")
+        for item in value:
+            _encode(item, out)
+        out.append(b"e")
+    elif isinstance(value, (bytearray, memoryview)):
+        _encode(bytes(value), out)
+    else:
+        raise TypeError(f"Cannot bencode value of type {type(value).__name__}")
+
+
+def bencode(value):
+    """Encode a Python value (int, str, bytes, list, dict) as bencoded bytes"""
+    out = []
+    _encode(value, out)
+    return b"".join(out)
+
+
+def _decode(data, i):
+    kind = data[i:i + 1]
+    if kind == b"i":
+        end = data.index(b"e", i)
+        digits = data[i + 1:end]
+        if not digits or digits == b"-" or digits.startswith((b"-0", b"0")) and digits != b"0":
+            raise ValueError(f"Invalid integer at offset {i}")
+        return int(digits), end + 1
+    if kind == b"l":
+        items = []
+        i += 1
+        while data[i:i + 1] != b"e":
+            item, i = _decode(data, i)
+            items.append(item)
+        return items, i + 1
+    if kind == b"d":
+        result = {}
+        i += 1
+        while data[i:i + 1] != b"e":
+            key, i = _decode_bytes(data, i)
+            result[key.decode("utf-8", "surrogateescape")], i = _decode(data, i)
+        return result, i + 1
+    if kind.isdigit():
+        return _decode_bytes(data, i)
+    raise ValueError(f"Invalid bencoded value at offset {i}")
+
+
+def _decode_bytes(data, i):
+    colon = data.index(b":", i)
+    digits = data[i:colon]
+    if not digits.isdigit():
+        raise ValueError(f"Invalid string length at offset {i}")
+    length = int(digits)
+    start = colon + 1
+    if start + length > len(data):
+        raise ValueError(f"String at offset {i} runs past the end of the data")
+    return data[start:start + length], start + length
+
+
+def bdecode(data):
+    """Decode bencoded bytes. Strings come back as bytes and dict keys as str."""
+    data = bytes(data)
+    try:
+        value, end = _decode(data, 0)
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"Invalid bencoded data: {e}")
+    if end != len(data):
+        raise ValueError(f"Trailing data after offset {end}")
+    return value
+
+
+def info_hash(torrent_bytes):
+    """SHA-1 info hash of a .torrent, the ID peers and trackers know it by"""
+    return hashlib.sha1(bencode(bdecode(torrent_bytes)["info"])).hexdigest()
+
+
+def piece_length_for_size(size, target_pieces=TARGET_PIECES):
+    """Pick a power-of-two piece length that keeps the piece count near target_pieces"""
+    piece_length = MIN_PIECE_LENGTH
+    while piece_length < MAX_PIECE_LENGTH and size / piece_length > target_pieces:
+        piece_length *= 2
+    return piece_length
+
+
+class PieceHasher:
+    """Incrementally SHA-1 hash a byte stream into fixed-size torrent pieces.
+
+    Only the running hash of the current piece is kept, so memory stays flat
+    no matter how large the input is or how it is chunked.
+    """
+
+    def __init__(self, piece_length=DEFAULT_PIECE_LENGTH):
+        if piece_length <= 0:
+            raise ValueError("piece_length must be positive")
+        self.piece_length = piece_length
+        self.length = 0
+        self._pieces = []
+        self._current = hashlib.sha1()
+        self._current_size = 0
+
+    def update(self, data):
+        """Feed the next chunk of the stream"""
+        view = memoryview(data)
+        while view:
+            take = min(len(view), self.piece_length - self._current_size)
+            self._current.update(view[:take])
+            self._current_size += take
+            self.length += take
+            view = view[take:]
+            if self._current_size == self.piece_length:
+                self._pieces.append(self._current.digest())
+                self._current = hashlib.sha1()
+                self._current_size = 0
+
+    def digest(self):
+        """Return the concatenated 20-byte SHA-1 of every piece seen so far"""
+        pieces = b"".join(self._pieces)
+        if self._current_size:
+            pieces += self._current.digest()
+        return pieces
+
+
+def build_torrent(name, length, piece_length, pieces, trackers=(), comment=None, web_seeds=()):
+    """Build a single-file .torrent and return it as bencoded bytes.
+
+    trackers is a list of announce tiers (lists of URLs); a plain URL is a
+    tier of its own. web_seeds are HTTP URLs of the file itself (BEP 19).
+    """
+    tiers = [[t] if isinstance(t, str) else [u for u in t if u] for t in trackers if t]
+    tiers = [tier for tier in tiers if tier]
+    metainfo = {
+        "created by": CREATED_BY,
+        "creation date": int(time.time()),
+        "info": {
+            "length": length,
+            "name": name,
+            "piece length": piece_length,
+            "pieces": pieces,
+        },
+    }
+    if tiers:
+        metainfo["announce"] = tiers[0][0]
+    if sum(len(tier) for tier in tiers) > 1:
+        metainfo["announce-list"] = tiers
+    web_seeds = [u for u in web_seeds if u]
+    if web_seeds:
+        metainfo["url-list"] = web_seeds
+    if comment:
+        metainfo["comment"] = comment
+    return bencode(metainfo)
+
+
+def create_torrent(name, size, chunks, trackers=(), comment=None, piece_length=None, web_seeds=()):
+    """Hash a stream of byte chunks and build its torrent; returns (torrent bytes, HashResult)"""
+    # Imported here: hash_engine builds on this module
+    import hash_engine
+
+    hasher = hash_engine.ParallelPieceHasher(piece_length or piece_length_for_size(size))
+    for chunk in chunks:
+        hasher.update(chunk)
+    result = hasher.result()
+    if result.length != size:
+        raise IOError(f"Expected {size} bytes for {name}, read {result.length}")
+    torrent_bytes = build_torrent(
+        name=name,
+        length=result.length,
+        piece_length=result.piece_length,
+        pieces=result.pieces,
+        trackers=trackers,
+        comment=comment,
+        web_seeds=web_seeds
+    )
+    return torrent_bytes, result
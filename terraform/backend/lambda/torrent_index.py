@@ -0,0 +1,131 @@
+import os
+import time
+import logging
+import threading
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+WATCH_PREFIX = "watch/"
+
+# Seconds a watch folder check or a torrent known to exist is trusted
+INDEX_TTL = int(os.environ.get("TORRENT_INDEX_TTL", "300"))
+
+
+def torrent_key(s3_key):
+    """Key of a torrent stored next to its source object"""
+    return s3_key + ".torrent"
+
+
+def watch_torrent_key(s3_key):
+    """Key of the torrent for s3_key in the watch folder"""
+    return f"{WATCH_PREFIX}{os.path.basename(s3_key)}.torrent"
+
+
+class TorrentIndex:
+    """Per-container cache of which torrents already exist in a bucket.
+
+    Existence for a whole event batch is answered with one listing per
+    location (next to the source objects, and the watch folder) over just
+    the key range the batch covers, instead of a head_object per candidate.
+    Torrents seen or uploaded are remembered for INDEX_TTL seconds, as is a
+    bucket's watch folder once it is known to exist.
+    """
+
+    def __init__(self, s3_client, ttl=INDEX_TTL):
+        self.s3_client = s3_client
+        self.ttl = ttl
+        self._watch_checked = {}
+        self._known = {}
+        self._lock = threading.Lock()
+
+    def ensure_watch_folder(self, bucket):
+        """Create the watch folder in S3 if it doesn't exist (checked once per ttl)"""
+        with self._lock:
+            checked_at = self._watch_checked.get(bucket)
+        if checked_at is not None and time.monotonic() - checked_at < self.ttl:
+            return
+        try:
+            # Check if folder exists by listing objects with prefix
+            response = self.s3_client.list_objects_v2(Bucket=bucket, Prefix=WATCH_PREFIX, MaxKeys=1)
+            if not response.get('Contents'):
+                logger.info(f"Creating watch folder in bucket {bucket}")
+                # Create an empty object with the folder name as the key
+                self.s3_client.put_object(Bucket=bucket, Key=WATCH_PREFIX)
+            with self._lock:
+                self._watch_checked[bucket] = time.monotonic()
+        except Exception as e:
+            # Not critical for the main flow; the check is retried on the next event
+            logger.error(f"Error ensuring watch folder exists: {e}")
+
+    def add(self, bucket, key):
+        """Remember that key exists (e.g. a torrent this container just uploaded)"""
+        with self._lock:
+            self._known[(bucket, key)] = time.monotonic()
+
+    def existing(self, bucket, s3_keys):
+        """Return {s3_key: torrent key} for the source objects that already have a torrent"""
+        candidates = {}
+        for s3_key in s3_keys:
+            candidates[s3_key] = (torrent_key(s3_key), watch_torrent_key(s3_key))
+
+        found = {key for keys in candidates.values() for key in keys if self._is_known(bucket, key)}
+        unknown = [key for keys in candidates.values() for key in keys if key not in found]
+        # Torrents next to their sources and in the watch folder are listed separately
+        # so each listing only covers a narrow, contiguous key range
+        for group in (
+            [key for key in unknown if not key.startswith(WATCH_PREFIX)],
+            [key for key in unknown if key.startswith(WATCH_PREFIX)],
+        ):
+            if group:
+                found |= self._lookup(bucket, group)
+
+        for key in found:
+            self.add(bucket, key)
+        return {
+            s3_key: next(key for key in keys if key in found)
+            for s3_key, keys in candidates.items()
+            if any(key in found for key in keys)
+        }
+
+    def _is_known(self, bucket, key):
+        with self._lock:
+            seen_at = self._known.get((bucket, key))
+        return seen_at is not None and time.monotonic() - seen_at < self.ttl
+
+    def _lookup(self, bucket, keys):
+        try:
+            return self._list_range(bucket, keys)
+        except ClientError as e:
+            logger.warning(f"Listing torrents in {bucket} failed ({e}), checking keys one by one")
+            return {key for key in keys if self._head(bucket, key)}
+
+    def _list_range(self, bucket, keys):
+        """Which of keys exist, from one paginated listing between the first and last of them"""
+        keys = sorted(set(keys))
+        wanted = set(keys)
+        found = set()
+        # StartAfter is exclusive and any proper prefix of a key sorts before it
+        kwargs = {"Bucket": bucket, "Prefix": os.path.commonprefix(keys), "StartAfter": keys[0][:-1]}
+        while True:
+            response = self.s3_client.list_objects_v2(**kwargs)
+            for obj in response.get('Contents', []):
+                if obj['Key'] > keys[-1]:
+                    return found
+                if obj['Key'] in wanted:
+                    found.add(obj['Key'])
+            if not response.get('IsTruncated'):
+                return found
+            kwargs["ContinuationToken"] = response['NextContinuationToken']
+
+    def _head(self, bucket, key):
+        try:
+            self.s3_client.head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            # Unknown state: report it as existing so the object is not processed twice
+            logger.error(f"Error checking if torrent exists: {e}")
+            return True
@@ -0,0 +1,68 @@
+import os
+import json
+import logging
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+# Shipped next to the torrent builders (Lambda packages, recorder image)
+CONFIG_PATH = os.environ.get(
+    "TRACKER_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "tracker-config.json")
+)
+
+
+def load(path=CONFIG_PATH):
+    """The tracker configuration, or {} if the file is missing or unreadable"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable tracker config {path}: {e}")
+        return {}
+
+
+def _split(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def announce_tiers(config=None, trackers=None):
+    """Announce tiers (BEP 12) for a new torrent.
+
+    The primary tracker is the first tier. Fallback trackers form the next
+    tier (clients try them in random order), and a nested list in "fallback"
+    is a tier of its own. trackers (default: $TRACKERS, comma-separated)
+    replaces the configured primary, one tier per tracker.
+    """
+    if config is None:
+        config = load()
+    settings = config.get("trackers", {})
+    if trackers is None:
+        trackers = _split(os.environ.get("TRACKERS", ""))
+    tiers = [[t] for t in trackers if t]
+    if not tiers and settings.get("primary"):
+        tiers.append([settings["primary"]])
+    fallback = [t for t in settings.get("fallback", []) if isinstance(t, str) and t]
+    if fallback:
+        tiers.append(fallback)
+    for tier in settings.get("fallback", []):
+        if isinstance(tier, list) and tier:
+            tiers.append(list(tier))
+    return tiers
+
+
+def web_seeds(bucket, key, config=None, base_urls=None):
+    """url-list (BEP 19) for an object: the object's URL under each web seed base URL.
+
+    Base URLs (default: $WEB_SEED_URLS, comma-separated, else the config's
+    "web_seeds") point at the bucket through CloudFront or its S3 endpoint,
+    and may contain {bucket}. With none configured there are no web seeds.
+    """
+    if base_urls is None:
+        base_urls = _split(os.environ.get("WEB_SEED_URLS", ""))
+    if not base_urls:
+        base_urls = (config if config is not None else load()).get("web_seeds", [])
+    path = urllib.parse.quote(key)
+    return [f"{base.format(bucket=bucket).rstrip('/')}/{path}" for base in base_urls if base]
@@ -1,34 +1,56 @@
-# Package the Lambda function
+# Package the Lambda function together with the shared torrent modules
 data "archive_file" "s3_torrent_creator" {
   type        = "zip"
-  source_file = "${path.module}/lambda/s3_torrent_creator.py"
   output_path = "${path.module}/lambda/s3_torrent_creator.zip"
-}
 
-# Create a custom Lambda layer for transmission-cli tools
-# Note: In a real implementation, you would need to create this layer manually
-# and upload it to AWS since it requires native binaries
-resource "aws_lambda_layer_version" "transmission_tools" {
-  layer_name = "transmission-tools"
-  description = "Lambda layer with transmission-cli tools for torrent creation"
-
-  # This is a placeholder - in reality, this layer should be created externally
-  # and referenced here by its ARN. The layer creation process would involve:
-  # 1. Set up an Amazon Linux 2 environment
-  # 2. Install transmission-cli
-  # 3. Copy the binaries to the layer structure
-  # 4. Zip and upload the layer
-  filename = "${path.module}/lambda/transmission_tools_layer.zip"
-  compatible_runtimes = ["python3.8", "python3.9"]
-  
-  # Only create this layer in a development environment
-  # In production, reference an existing layer by ARN
-  count = var.environment == "dev" ? 1 : 0
-  lifecycle {
-    ignore_changes = [
-      filename,
-      source_code_hash
-    ]
+  source {
+    content  = file("${path.module}/lambda/s3_torrent_creator.py")
+    filename = "s3_torrent_creator.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/clients.py")
+    filename = "clients.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/torrent.py")
+    filename = "torrent.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/hash_engine.py")
+    filename = "hash_engine.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/job_state.py")
+    filename = "job_state.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/torrent_index.py")
+    filename = "torrent_index.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/piece_sidecar.py")
+    filename = "piece_sidecar.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/record_pool.py")
+    filename = "record_pool.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/tracker_config.py")
+    filename = "tracker_config.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/tracker-config.json")
+    filename = "tracker-config.json"
   }
 }
 
@@ -71,13 +93,14 @@ resource "aws_iam_role_policy" "s3_torrent_lambda_policy" {
         Action = [
           "s3:GetObject",
           "s3:PutObject",
+          "s3:DeleteObject",
           "s3:ListBucket",
           "s3:HeadObject"
         ]
         Effect   = "Allow"
         Resource = [
-          aws_s3_bucket.recordings.arn,
-          "${aws_s3_bucket.recordings.arn}/*"
+          aws_s3_bucket.streams.arn,
+          "${aws_s3_bucket.streams.arn}/*"
         ]
       },
       {
@@ -88,6 +111,12 @@ resource "aws_iam_role_policy" "s3_torrent_lambda_policy" {
         ]
         Effect   = "Allow"
         Resource = aws_dynamodb_table.jobs.arn
+      },
+      {
+        # Hands hashing of objects too large for one run over to a new invocation
+        Action   = "lambda:InvokeFunction"
+        Effect   = "Allow"
+        Resource = "arn:aws:lambda:*:*:function:${var.environment}-s3-torrent-creator"
       }
     ]
   })
@@ -104,44 +133,48 @@ resource "aws_lambda_function" "s3_torrent_creator" {
   timeout          = 300
   memory_size      = 1024
 
-  # Attach the transmission tools layer if available (dev environment)
-  layers = var.environment == "dev" ? [aws_lambda_layer_version.transmission_tools[0].arn] : []
-
-  # In production, you would specify the ARN of a pre-created layer
-  # layers = var.environment == "dev" ? [aws_lambda_layer_version.transmission_tools[0].arn] : ["arn:aws:lambda:${var.region}:${var.account_id}:layer:transmission-tools:1"]
-
   environment {
     variables = {
-      S3_BUCKET = aws_s3_bucket.recordings.id
+      S3_BUCKET = aws_s3_bucket.streams.id
       DDB_TABLE = aws_dynamodb_table.jobs.name
-      TRACKERS  = "udp://23.252.56.60:6969"
-    }
-  }
 
-  # Provide a larger ephemeral storage for handling large files
-  ephemeral_storage {
-    size = 1024 # 1 GB
-  }
-}
+      # Announce tiers (primary and fallback trackers) come from the packaged
+      # tracker-config.json; TRACKERS is not set, since it would replace them.
+      # Web seed base URLs (BEP 19):
+      WEB_SEED_URLS = join(",", var.web_seed_urls)
+
+      # Checkpoint and continue in a new invocation when less than this is left
+      CONTINUATION_MARGIN_MS = "60000"
 
-# Create an empty placeholder zip file for the layer
-resource "local_file" "placeholder_layer" {
-  count = var.environment == "dev" ? 1 : 0
-  filename = "${path.module}/lambda/transmission_tools_layer.zip"
-  content  = "Placeholder for transmission tools layer"
+      # Records of one event hashed at once, within half of memory_size
+      MAX_CONCURRENT_RECORDS = "4"
+      MEMORY_BUDGET_FRACTION = "0.5"
+    }
+  }
 }
 
-# S3 bucket notification for the Lambda function
+# The bucket's only notification configuration: S3 keeps one per bucket, so
+# a second aws_s3_bucket_notification would overwrite this one. New recordings
+# go to the torrent creator, and the watch-folder torrents it writes go to the
+# seeders' queue. S3 rejects overlapping rules for the same events, so the
+# creator only gets recordings/ (it skips .torrent and .pieces objects there)
 resource "aws_s3_bucket_notification" "bucket_notification" {
-  bucket = aws_s3_bucket.recordings.id
+  bucket = aws_s3_bucket.streams.id
 
   lambda_function {
     lambda_function_arn = aws_lambda_function.s3_torrent_creator.arn
     events              = ["s3:ObjectCreated:*"]
-    filter_suffix       = "" # Optional: specify file extensions like .mp4
+    filter_prefix       = "recordings/"
+  }
+
+  queue {
+    queue_arn     = aws_sqs_queue.watch_torrents.arn
+    events        = ["s3:ObjectCreated:*"]
+    filter_prefix = "watch/"
+    filter_suffix = ".torrent"
   }
 
-  depends_on = [aws_lambda_permission.allow_bucket]
+  depends_on = [aws_lambda_permission.allow_bucket, aws_sqs_queue.watch_torrents]
 }
 
 # Lambda permission to allow S3 to invoke it
@@ -150,5 +183,5 @@ resource "aws_lambda_permission" "allow_bucket" {
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.s3_torrent_creator.function_name
   principal     = "s3.amazonaws.com"
-  source_arn    = aws_s3_bucket.recordings.arn
+  source_arn    = aws_s3_bucket.streams.arn
 } 
\ No newline at end of file
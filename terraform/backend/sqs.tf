@@ -16,3 +16,32 @@ resource "aws_sqs_queue" "chronicle_jobs" {
     maxReceiveCount     = 3
   })
 }
+
+# Jobs table stream batches the job stats Lambda gave up on (metadata only:
+# shard and sequence numbers to re-read them from the stream)
+resource "aws_sqs_queue" "stats_stream_failures" {
+  name                      = "${var.environment}-job-stats-stream-failures"
+  message_retention_seconds = 1209600
+}
+
+# S3 notifications for new watch-folder torrents, consumed by the transmission seeder
+# (sent by the bucket notification in s3-torrent-lambda.tf)
+resource "aws_sqs_queue" "watch_torrents" {
+  name                      = "${var.environment}-watch-torrents"
+  message_retention_seconds = 1209600
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect    = "Allow"
+        Principal = { Service = "s3.amazonaws.com" }
+        Action    = "sqs:SendMessage"
+        Resource  = "arn:aws:sqs:${var.aws_region}:*:${var.environment}-watch-torrents"
+        Condition = {
+          ArnEquals = { "aws:SourceArn" = aws_s3_bucket.streams.arn }
+        }
+      }
+    ]
+  })
+}
@@ -69,3 +69,38 @@ variable "vpc_cidr" {
 variable "public_subnet_cidrs" {
   type = list(string) 
 }
+
+variable "message_group_shards" {
+  description = "FIFO message groups jobs are spread over; up to this many are dispatched at once"
+  type        = number
+  default     = 16
+}
+
+variable "message_group_key" {
+  description = "What keeps jobs in dispatch order: job, channel (same stream or channel) or host"
+  type        = string
+  default     = "job"
+}
+
+variable "web_seed_urls" {
+  description = <<-EOT
+    Base URLs serving the recordings over HTTP (a CloudFront distribution or the
+    bucket's S3 endpoint), added to every torrent as web seeds so clients can fetch
+    pieces from them next to the seeders. "{bucket}" is replaced with the bucket name.
+    Empty: torrents have no web seeds.
+  EOT
+  type        = list(string)
+  default     = []
+}
+
+variable "seeder_pool_size" {
+  description = "Number of transmission daemons in the seeder pool"
+  type        = number
+  default     = 2
+}
+
+variable "seeder_max_torrents" {
+  description = "Torrents each seeder pool daemon carries before evicting cold ones"
+  type        = number
+  default     = 200
+}
@@ -48,9 +48,9 @@ echo "$JOBS" | jq -r '.Items[] | "\(.jobId.S)|\(.status.S)|\(.lastHeartbeat.S)|\
     aws --endpoint-url="$ENDPOINT_URL" --region="$REGION" dynamodb update-item \
       --table-name "$DDB_TABLE" \
       --key "{\"jobId\":{\"S\":\"$JOB_ID\"}}" \
-      --update-expression "SET #s = :s, finishedAt = :ft, torrentFile = :tf" \
+      --update-expression "SET #s = :s, finishedAt = :ft, torrentFile = :tf, lastUpdatedAt = :lu" \
       --expression-attribute-names '{"#s":"status"}' \
-      --expression-attribute-values "{\":s\":{\"S\":\"COMPLETED\"},\":ft\":{\"S\":\"$(date -Iseconds -u)\"},\":tf\":{\"S\":\"$TORRENT_PATH\"}}"
+      --expression-attribute-values "{\":s\":{\"S\":\"COMPLETED\"},\":ft\":{\"S\":\"$(date -Iseconds -u)\"},\":tf\":{\"S\":\"$TORRENT_PATH\"},\":lu\":{\"N\":\"$NOW\"}}"
       
     echo "✅ Job $JOB_ID marked as COMPLETED"
   else
@@ -70,9 +70,9 @@ echo "$JOBS" | jq -r '.Items[] | "\(.jobId.S)|\(.status.S)|\(.lastHeartbeat.S)|\
           aws --endpoint-url="$ENDPOINT_URL" --region="$REGION" dynamodb update-item \
             --table-name "$DDB_TABLE" \
             --key "{\"jobId\":{\"S\":\"$JOB_ID\"}}" \
-            --update-expression "SET #s = :s, finishedAt = :ft" \
+            --update-expression "SET #s = :s, finishedAt = :ft, lastUpdatedAt = :lu" \
             --expression-attribute-names '{"#s":"status"}' \
-            --expression-attribute-values "{\":s\":{\"S\":\"COMPLETED\"},\":ft\":{\"S\":\"$(date -Iseconds -u)\"}}"
+            --expression-attribute-values "{\":s\":{\"S\":\"COMPLETED\"},\":ft\":{\"S\":\"$(date -Iseconds -u)\"},\":lu\":{\"N\":\"$NOW\"}}"
             
           echo "✅ Job $JOB_ID marked as COMPLETED"
         else
@@ -81,9 +81,9 @@ echo "$JOBS" | jq -r '.Items[] | "\(.jobId.S)|\(.status.S)|\(.lastHeartbeat.S)|\
           aws --endpoint-url="$ENDPOINT_URL" --region="$REGION" dynamodb update-item \
             --table-name "$DDB_TABLE" \
             --key "{\"jobId\":{\"S\":\"$JOB_ID\"}}" \
-            --update-expression "SET #s = :s, finishedAt = :ft, errorDetail = :err" \
+            --update-expression "SET #s = :s, finishedAt = :ft, errorDetail = :err, lastUpdatedAt = :lu" \
             --expression-attribute-names '{"#s":"status"}' \
-            --expression-attribute-values "{\":s\":{\"S\":\"FAILED\"},\":ft\":{\"S\":\"$(date -Iseconds -u)\"},\":err\":{\"S\":\"Job timed out after $IDLE_TIME seconds without progress\"}}"
+            --expression-attribute-values "{\":s\":{\"S\":\"FAILED\"},\":ft\":{\"S\":\"$(date -Iseconds -u)\"},\":err\":{\"S\":\"Job timed out after $IDLE_TIME seconds without progress\"},\":lu\":{\"N\":\"$NOW\"}}"
             
           echo "❌ Job $JOB_ID marked as FAILED"
         fi
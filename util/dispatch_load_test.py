@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Measure job dispatch throughput against the FIFO message group shard count.
+
+For each shard count a scratch FIFO queue is created in LocalStack and
+filled with synthetic jobs, grouped exactly as the dispatcher groups them
+(message_groups.message_group_id). Consumer threads then drain it the way
+the SQS event source feeds the dispatch Lambda: a batch of up to 10
+messages from one group at a time, held for --dispatch-ms while it is
+dispatched. SQS never hands out a group that has a batch in flight, so with
+one shard every job waits behind the one before it.
+
+Usage: ./dispatch_load_test.py [--shards 1,4,16] [--jobs 200] [--consumers 16] [--dispatch-ms 500]
+Needs boto3 and a running LocalStack (or set --endpoint); the queues are deleted afterwards.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "terraform", "backend", "lambda")
+sys.path.insert(0, LAMBDA_DIR)
+
+import message_groups  # noqa: E402
+
+
+def fill(sqs, queue_url, jobs, channels, shards, key):
+    """Send the synthetic jobs; returns the number of distinct message groups used"""
+    groups = set()
+    for start in range(0, jobs, 10):
+        entries = []
+        for i in range(start, min(start + 10, jobs)):
+            job_id = f"load-{i}"
+            url = f"https://www.youtube.com/@channel{i % channels}/live"
+            group = message_groups.message_group_id(job_id, url, shards, key)
+            groups.add(group)
+            entries.append({"Id": str(i), "MessageBody": f'{{"jobId": "{job_id}", "url": "{url}"}}',
+                            "MessageGroupId": group})
+        sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+    return len(groups)
+
+
+def drain(sqs, queue_url, jobs, consumers, dispatch_seconds):
+    """Consume every job with consumers threads; returns the seconds it took"""
+    done = []
+    lock = threading.Lock()
+
+    def consume():
+        while True:
+            with lock:
+                if len(done) >= jobs:
+                    return
+            messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10,
+                                           WaitTimeSeconds=1).get("Messages", [])
+            if not messages:
+                continue
+            # The dispatcher handles a batch's records concurrently
+            time.sleep(dispatch_seconds)
+            sqs.delete_message_batch(QueueUrl=queue_url, Entries=[
+                {"Id": str(n), "ReceiptHandle": m["ReceiptHandle"]} for n, m in enumerate(messages)])
+            with lock:
+                done.extend(messages)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=consume, daemon=True) for _ in range(consumers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.monotonic() - started
+
+
+def main(argv=None):
+    import boto3
+
+    parser = argparse.ArgumentParser(description="Dispatch throughput per FIFO message group shard count")
+    parser.add_argument("--shards", default="1,4,16", help="comma-separated shard counts to compare")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=50, help="distinct channels among the jobs")
+    parser.add_argument("--key", default="job", choices=["job", "channel", "host"])
+    parser.add_argument("--consumers", type=int, default=16, help="concurrent dispatch invocations")
+    parser.add_argument("--dispatch-ms", type=int, default=500, help="time one batch takes to dispatch")
+    parser.add_argument("--endpoint", default=os.environ.get("AWS_ENDPOINT_URL", "http://localhost:4566"))
+    args = parser.parse_args(argv)
+
+    sqs = boto3.client("sqs", endpoint_url=args.endpoint, region_name=os.environ.get("AWS_REGION", "us-west-1"),
+                       aws_access_key_id="test", aws_secret_access_key="test")
+    print(f"{args.jobs} jobs, {args.consumers} consumers, {args.dispatch_ms} ms per batch, key={args.key}")
+    print(f"{'shards':>7} {'groups':>7} {'seconds':>8} {'jobs/s':>8} {'speedup':>8}")
+    baseline = None
+    for shards in [int(s) for s in args.shards.split(",") if s]:
+        queue_url = sqs.create_queue(
+            QueueName=f"chronicle-dispatch-load-{os.getpid()}-{shards}.fifo",
+            Attributes={"FifoQueue": "true", "ContentBasedDeduplication": "true", "VisibilityTimeout": "60"},
+        )["QueueUrl"]
+        try:
+            groups = fill(sqs, queue_url, args.jobs, args.channels, shards, args.key)
+            seconds = drain(sqs, queue_url, args.jobs, args.consumers, args.dispatch_ms / 1000)
+        finally:
+            sqs.delete_queue(QueueUrl=queue_url)
+        rate = args.jobs / seconds
+        baseline = baseline or rate
+        print(f"{shards:>7} {groups:>7} {seconds:>8.1f} {rate:>8.1f} {rate / baseline:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,7 @@ WEB_CONTAINER="web-web-dev-1"
 RECORDER_CONTAINER="chronicle-recorder"
 TRANSMISSION_CONTAINER="chronicle-transmission"
 OPENTRACKER_CONTAINER="chronicle-opentracker"
+JOB_WATCHER_CONTAINER="chronicle-job-watcher"
 
 # Define bucket and table names (matching localstack setup)
 S3_BUCKET="chronicle-recordings-dev"
@@ -152,7 +153,7 @@ cd "$ROOT_DIR"
 
 # Build recorder and transmission images with no cache
 echo "🔄 Building recorder image with no cache..."
-docker build --no-cache -t chronicle-recorder:latest -f "$ROOT_DIR/docker/ecs/Dockerfile" "$ROOT_DIR/docker/ecs"
+docker build --no-cache -t chronicle-recorder:latest -f "$ROOT_DIR/docker/ecs/Dockerfile" "$ROOT_DIR"
 
 echo "🔄 Building transmission image with no cache..."
 docker build --no-cache -t chronicle-transmission:latest -f "$ROOT_DIR/docker/transmission/Dockerfile" "$ROOT_DIR/docker/transmission"
@@ -178,9 +179,24 @@ docker run -d \
   -e AWS_REGION=us-west-1 \
   -e AWS_ACCESS_KEY_ID=test \
   -e AWS_SECRET_ACCESS_KEY=test \
+  -e WATCH_QUEUE_URL="http://$LOCALSTACK_CONTAINER:4566/000000000000/chronicle-watch-torrents" \
   chronicle-transmission:latest
 
 
+# Start the job watcher that records recorder container exits (dispatch no longer waits for them)
+echo "🔄 Building and starting job watcher..."
+docker build --no-cache -t chronicle-job-watcher:latest -f "$ROOT_DIR/docker/job-watcher/Dockerfile" "$ROOT_DIR"
+docker run -d \
+  --name "$JOB_WATCHER_CONTAINER" \
+  --network="$NETWORK_NAME" \
+  -v /var/run/docker.sock:/var/run/docker.sock \
+  -e DDB_TABLE="$DDB_TABLE" \
+  -e AWS_ENDPOINT_URL="http://$LOCALSTACK_CONTAINER:4566" \
+  -e AWS_REGION=us-west-1 \
+  -e AWS_ACCESS_KEY_ID=test \
+  -e AWS_SECRET_ACCESS_KEY=test \
+  chronicle-job-watcher:latest
+
 # Let the user know we're done
 echo ""
 echo "✅ Development environment is ready!"
@@ -196,6 +212,7 @@ echo "  - Web container: docker logs -f $WEB_CONTAINER"
 echo "  - LocalStack: docker logs -f $LOCALSTACK_CONTAINER"
 echo "  - Transmission: docker logs -f $TRANSMISSION_CONTAINER"
 echo "  - Opentracker: docker logs -f $OPENTRACKER_CONTAINER"
+echo "  - Job watcher: docker logs -f $JOB_WATCHER_CONTAINER"
 echo ""
 echo "To test the full workflow, run:"
 echo "  ./util/test_e2e_flow.sh <youtube_url> <output_filename>"
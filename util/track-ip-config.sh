@@ -36,22 +36,20 @@ TRACKER_URL="udp://${TRACKER_IP}:${TRACKER_PORT}"
 
 echo "Using tracker URL: $TRACKER_URL"
 
-# Update tracker-config.json
+# Update the primary tracker in tracker-config.json, keeping the fallback tiers and web seeds
 update_tracker_config() {
   CONFIG_FILE="terraform/backend/lambda/tracker-config.json"
   if [ -f "$CONFIG_FILE" ]; then
     echo "Updating $CONFIG_FILE..."
-    cat > "$CONFIG_FILE" << EOF
-{
-  "trackers": {
-    "primary": "${TRACKER_URL}",
-    "fallback": []
-  },
-  "torrent_options": {
-    "comment": "Chronicle Livestream Recording",
-    "piece_length": 16384
-  }
-}
+    python3 - "$CONFIG_FILE" "$TRACKER_URL" << 'EOF'
+import json, sys
+path, url = sys.argv[1], sys.argv[2]
+with open(path) as f:
+    config = json.load(f)
+config.setdefault("trackers", {})["primary"] = url
+with open(path, "w") as f:
+    json.dump(config, f, indent=2)
+    f.write("\n")
 EOF
   else
     echo "Warning: $CONFIG_FILE not found, skipping"
@@ -70,49 +68,9 @@ update_lambda_env() {
   fi
 }
 
-# Update entrypoint.sh in docker/ecs
-update_entrypoint() {
-  ENTRYPOINT_SCRIPT="docker/ecs/entrypoint.sh"
-  if [ -f "$ENTRYPOINT_SCRIPT" ]; then
-    echo "Updating $ENTRYPOINT_SCRIPT..."
-    sed -i "s|udp://[^:]*:[0-9]*|${TRACKER_URL}|g" "$ENTRYPOINT_SCRIPT"
-    echo "Updated $ENTRYPOINT_SCRIPT"
-  else
-    echo "Warning: $ENTRYPOINT_SCRIPT not found, skipping"
-  fi
-}
-
-# Update Lambda functions' default tracker
-update_lambda_files() {
-  for LAMBDA_FILE in terraform/backend/lambda/s3_torrent_creator.py terraform/backend/lambda/s3_torrent_creator_local.py; do
-    if [ -f "$LAMBDA_FILE" ]; then
-      echo "Updating $LAMBDA_FILE..."
-      sed -i "s|TRACKERS = os.environ.get('TRACKERS', 'udp://[^:]*:[0-9]*')|TRACKERS = os.environ.get('TRACKERS', '${TRACKER_URL}')|g" "$LAMBDA_FILE"
-      echo "Updated $LAMBDA_FILE"
-    else
-      echo "Warning: $LAMBDA_FILE not found, skipping"
-    fi
-  done
-}
-
-# Update Terraform configuration
-update_terraform() {
-  TF_FILE="terraform/backend/s3-torrent-lambda.tf"
-  if [ -f "$TF_FILE" ]; then
-    echo "Updating $TF_FILE..."
-    sed -i "s|TRACKERS  = \"udp://[^:]*:[0-9]*\"|TRACKERS  = \"${TRACKER_URL}\"|g" "$TF_FILE"
-    echo "Updated $TF_FILE"
-  else
-    echo "Warning: $TF_FILE not found, skipping"
-  fi
-}
-
 # Run all update functions
 update_tracker_config
 update_lambda_env
-update_entrypoint
-update_lambda_files
-update_terraform
 
 echo "Tracker configuration complete! All components now use: $TRACKER_URL"
 echo "Remember to rebuild any containers or redeploy Lambda functions for changes to take effect." 
\ No newline at end of file
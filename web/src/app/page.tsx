@@ -6,29 +6,64 @@ import { listJobs, pollJobs } from "../lib/api";
 import { JobCard } from "../components/JobCard";
 import { JobDetails } from "../components/JobDetails";
 import { NewJobModal } from "../components/NewJobModal";
+import { Button } from "../components/ui/button";
+
+// Replace the jobs that changed, keeping their position in the list
+function mergeChanges(list: Job[], changes: Map<string, Job>): Job[] {
+  return list.map((job) => changes.get(job.jobId) ?? job);
+}
 
 export default function HomePage() {
+  // First page (kept fresh by the change feed) and any older pages loaded on demand
   const [jobs, setJobs] = useState<Job[]>([]);
+  const [olderJobs, setOlderJobs] = useState<Job[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedJobId, setSelectedJobId] = useState<string | null>(null);
 
-  // Initial load + polling
+  // Load the first page once, then apply only the jobs that changed since
   useEffect(() => {
     let stopped = false;
-    async function fetchOnce() {
-      const initial = await listJobs();
-      if (!stopped) setJobs(initial);
-    }
-    fetchOnce();
-    const stopPolling = pollJobs((latest) => {
-      if (!stopped) setJobs(latest);
-    });
+    const stopPolling = pollJobs(
+      (page) => {
+        if (stopped) return;
+        setJobs(page.items);
+        setNextCursor(page.nextCursor);
+      },
+      (changed) => {
+        if (stopped) return;
+        const changes = new Map(changed.map((job) => [job.jobId, job]));
+        setOlderJobs((older) => mergeChanges(older, changes));
+        setJobs((current) => {
+          const known = new Set(current.map((job) => job.jobId));
+          // Jobs not on the first page are new, or older jobs that changed; both go to the top
+          const added = changed.filter((job) => !known.has(job.jobId));
+          return [...added, ...mergeChanges(current, changes)];
+        });
+      }
+    );
     return () => {
       stopped = true;
       stopPolling();
     };
   }, []);
 
-  const selectedJob = jobs.find((j) => j.jobId === selectedJobId) || null;
+  async function loadMore() {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await listJobs({ cursor: nextCursor });
+      setOlderJobs((older) => [...older, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
+  const firstPageIds = new Set(jobs.map((j) => j.jobId));
+  const allJobs = [...jobs, ...olderJobs.filter((j) => !firstPageIds.has(j.jobId))];
+
+  const selectedJob = allJobs.find((j) => j.jobId === selectedJobId) || null;
 
   return (
     <div className="p-6 space-y-6">
@@ -40,11 +75,11 @@ export default function HomePage() {
       </header>
 
       <main>
-        {jobs.length === 0 ? (
+        {allJobs.length === 0 ? (
           <p className="text-center text-gray-400">No jobs yet.</p>
         ) : (
           <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">
-            {jobs.map((job) => (
+            {allJobs.map((job) => (
               <JobCard
                 key={job.jobId}
                 job={job}
@@ -53,6 +88,13 @@ export default function HomePage() {
             ))}
           </div>
         )}
+        {nextCursor && (
+          <div className="flex justify-center mt-6">
+            <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? "Loading…" : "Load more"}
+            </Button>
+          </div>
+        )}
       </main>
 
       {selectedJob && (
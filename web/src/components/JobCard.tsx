@@ -14,9 +14,11 @@ const getBadgeStyle = (status: Job["status"]) => {
   const colorMapping = {
     "PENDING": "bg-gray-500",
     "STARTED": "bg-blue-500",
+    "DOWNLOADING": "bg-blue-500",
     "RECORDING": "bg-green-500",
     "UPLOADING": "bg-yellow-500",
     "CREATING_TORRENT": "bg-purple-500",
+    "UPLOADING_TORRENT": "bg-purple-500",
     "SEEDING": "bg-amber-500",
     "COMPLETED": "bg-emerald-500",
     "FAILED": "bg-red-500"
@@ -49,6 +51,12 @@ export function JobCard({ job, onClick }: JobCardProps) {
             Downloaded: {job.bytesDownloaded.toLocaleString()} bytes
           </p>
         )}
+        {job.ingestRate != null && (
+          <p className="text-xs text-muted-foreground">
+            Rate: {(job.ingestRate / 1e6).toFixed(2)} MB/s
+            {job.avgIngestRate != null && ` (avg ${(job.avgIngestRate / 1e6).toFixed(2)} MB/s)`}
+          </p>
+        )}
         {job.torrentFile && (
           <p className="text-xs text-muted-foreground">
             Torrent available
@@ -4,6 +4,7 @@ import { Card, CardHeader, CardTitle, CardContent, CardFooter } from "@/componen
 import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import { Download } from "lucide-react";
+import { toDate } from "@/lib/utils";
 
 type JobDetailsProps = {
   job: Job;
@@ -31,9 +32,11 @@ export function JobDetails({ job, onClose }: JobDetailsProps) {
     const colorMapping = {
       "PENDING": "bg-gray-500",
       "STARTED": "bg-blue-500",
+      "DOWNLOADING": "bg-blue-500",
       "RECORDING": "bg-green-500",
       "UPLOADING": "bg-yellow-500",
       "CREATING_TORRENT": "bg-purple-500",
+      "UPLOADING_TORRENT": "bg-purple-500",
       "SEEDING": "bg-amber-500",
       "COMPLETED": "bg-emerald-500",
       "FAILED": "bg-red-500"
@@ -60,7 +63,7 @@ export function JobDetails({ job, onClose }: JobDetailsProps) {
           </div>
           <dl className="grid grid-cols-2 gap-2 text-sm">
             <dt>Created At</dt>
-            <dd>{new Date(job.createdAt).toLocaleString()}</dd>
+            <dd>{toDate(job.createdAt).toLocaleString()}</dd>
 
             {job.startedAt && (
               <>
@@ -110,6 +113,18 @@ export function JobDetails({ job, onClose }: JobDetailsProps) {
                 <dd>{job.bytesDownloaded.toLocaleString()}</dd>
               </>
             )}
+            {job.ingestRate != null && (
+              <>
+                <dt>Ingest Rate</dt>
+                <dd>{(job.ingestRate / 1e6).toFixed(2)} MB/s</dd>
+              </>
+            )}
+            {job.avgIngestRate != null && (
+              <>
+                <dt>Average Ingest Rate</dt>
+                <dd>{(job.avgIngestRate / 1e6).toFixed(2)} MB/s</dd>
+              </>
+            )}
           </dl>
 
           {job.errorDetail && (
@@ -1,8 +1,9 @@
 import axios from "axios";
-import { Job } from "../types/job";
+import { CreateJobResponse, Job, JobChanges, JobPage, JobStatus } from "../types/job";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL!;
 const POLL_INTERVAL = parseInt(process.env.NEXT_PUBLIC_POLL_INTERVAL || "5000", 10);
+export const PAGE_SIZE = parseInt(process.env.NEXT_PUBLIC_PAGE_SIZE || "24", 10);
 
 // Configure axios with CORS headers
 const api = axios.create({
@@ -125,33 +126,64 @@ async function tryApiEndpoints<T>(apiCall: (endpoint: string) => Promise<T>): Pr
   }
 }
 
+export interface ListJobsParams {
+  status?: JobStatus[];
+  since?: number;        // epoch seconds
+  limit?: number;
+  cursor?: string | null;
+}
+
 /**
- * Fetch the list of jobs.
+ * Fetch one page of jobs, newest first. Pass the returned nextCursor to get the next page.
  */
-export async function listJobs(): Promise<Job[]> {
+export async function listJobs(params: ListJobsParams = {}): Promise<JobPage> {
   if (useMockData) {
     console.log("Using mock data for job listing");
-    return mockJobs;
+    return { items: mockJobs, nextCursor: null, changedSince: 0 };
   }
 
+  const query = {
+    status: params.status?.join(","),
+    since: params.since,
+    limit: params.limit ?? PAGE_SIZE,
+    cursor: params.cursor ?? undefined,
+  };
+
   try {
     if (isLocalStack) {
       // Use our direct LocalStack integration
       console.log(`Using direct LocalStack integration for jobs`);
-      const res = await api.get<Job[]>('/api/localstack-jobs');
+      const res = await api.get<JobPage>('/api/localstack-jobs', { params: query });
       return res.data;
     } else {
       // Direct API call for production
       console.log(`Fetching jobs from: ${getApiPath('/jobs')}`);
-      const res = await api.get<Job[]>(getApiPath('/jobs'));
+      const res = await api.get<JobPage>(getApiPath('/jobs'), { params: query });
       return res.data;
     }
   } catch (error) {
     console.warn('Error connecting to API, falling back to mock data');
     console.error(error);
     useMockData = true;
-    return mockJobs;
+    return { items: mockJobs, nextCursor: null, changedSince: 0 };
+  }
+}
+
+/**
+ * Fetch only the jobs written since a watermark returned by listJobs or a previous call.
+ */
+export async function listChangedJobs(changedSince: number, status?: JobStatus[]): Promise<JobChanges> {
+  if (useMockData) {
+    return { items: mockJobs, changedSince };
+  }
+
+  const query = { changedSince, status: status?.join(",") };
+  if (isLocalStack) {
+    const res = await api.get<JobChanges>('/api/localstack-jobs', { params: query });
+    return res.data;
   }
+  const res = await api.get<JobChanges>(getApiPath('/jobs'), { params: query });
+  return res.data;
 }
 
 /**
@@ -184,7 +216,8 @@ export async function getJob(jobId: string): Promise<Job> {
 }
 
 /**
- * Create a new job. Generates a UUID in the client.
+ * Create a new job. Generates a UUID in the client. If the URL is already being
+ * recorded, the API coalesces the request and the existing job is returned.
  */
 export async function createJob(url: string, filename: string): Promise<Job> {
   // generate a client-side UUID
@@ -217,24 +250,25 @@ export async function createJob(url: string, filename: string): Promise<Job> {
   }
 
   try {
+    let res;
     if (isLocalStack) {
       // Use our local CORS proxy for LocalStack
       const proxyUrl = `/api/cors-proxy?url=${encodeURIComponent(getApiPath('/jobs'))}`;
-      await api.post(proxyUrl, {
+      res = await api.post<CreateJobResponse>(proxyUrl, {
         jobId,
         url,
         filename,
       });
     } else {
-      await api.post(getApiPath('/jobs'), {
+      res = await api.post<CreateJobResponse>(getApiPath('/jobs'), {
         jobId,
         url,
         filename,
       });
     }
     
-    // Immediately fetch and return the newly created job record
-    return getJob(jobId);
+    // Immediately fetch and return the job record (the existing job if the request was coalesced)
+    return getJob(res.data?.jobId || jobId);
   } catch (error) {
     console.warn('Error connecting to API, falling back to mock data');
     useMockData = true;
@@ -243,18 +277,21 @@ export async function createJob(url: string, filename: string): Promise<Job> {
 }
 
 /**
- * Simple helper to poll listJobs every POLL_INTERVAL ms.
+ * Load the first page of listJobs, then poll every POLL_INTERVAL ms for the jobs
+ * that changed since. Each poll costs the number of in-flight jobs, not the history.
  */
-export function pollJobs(onUpdate: (jobs: Job[]) => void): () => void {
+export function pollJobs(
+  onPage: (page: JobPage) => void,
+  onChanges: (jobs: Job[]) => void
+): () => void {
   let timer: NodeJS.Timeout;
+  let changedSince: number | null = null;
 
   async function tick() {
     try {
-      const jobs = await listJobs();
-      
       // For mock mode, simulate progress updates
       if (useMockData) {
-        jobs.forEach(job => {
+        mockJobs.forEach(job => {
           if (job.status === "RECORDING" && job.progress !== undefined && job.progress < 100) {
             job.progress += 2;
             job.lastHeartbeat = new Date().toISOString();
@@ -266,8 +303,16 @@ export function pollJobs(onUpdate: (jobs: Job[]) => void): () => void {
           }
         });
       }
-      
-      onUpdate(jobs);
+
+      if (changedSince === null) {
+        const page = await listJobs();
+        changedSince = page.changedSince;
+        onPage(page);
+      } else {
+        const changes = await listChangedJobs(changedSince);
+        changedSince = changes.changedSince;
+        if (changes.items.length > 0) onChanges(changes.items);
+      }
     } catch (err) {
       console.error("Failed to fetch jobs:", err);
     } finally {
@@ -0,0 +1,46 @@
+import AWS from "aws-sdk"
+
+/**
+ * The dispatch Lambda serves the jobs API (cursor pages and the change feed in
+ * job_queries.py, job creation with duplicate coalescing and FIFO message groups
+ * in message_groups.py). The LocalStack API routes hand requests to it as API
+ * Gateway proxy events, so LocalStack runs the same code as AWS.
+ */
+export const DISPATCH_LAMBDA_NAME = process.env.DISPATCH_LAMBDA_NAME || "dispatch-to-ecs"
+
+export interface JobsApiRequest {
+  method: string
+  path: string
+  query?: Record<string, string | string[] | undefined>
+  body?: unknown
+}
+
+export interface JobsApiResponse {
+  statusCode: number
+  headers?: Record<string, string>
+  body: string
+}
+
+/**
+ * Call the Lambda's API handler; returns its { statusCode, headers, body } response
+ */
+export async function invokeJobsApi(lambda: AWS.Lambda, request: JobsApiRequest): Promise<JobsApiResponse> {
+  const query = Object.fromEntries(
+    Object.entries(request.query || {}).filter(([, value]) => value !== undefined && value !== "")
+  )
+  const event = {
+    httpMethod: request.method,
+    path: request.path,
+    queryStringParameters: Object.keys(query).length ? query : null,
+    body: request.body ? JSON.stringify(request.body) : null,
+  }
+  const result = await lambda.invoke({
+    FunctionName: DISPATCH_LAMBDA_NAME,
+    Payload: JSON.stringify(event),
+  }).promise()
+  const response = JSON.parse(String(result.Payload))
+  if (result.FunctionError) {
+    throw new Error(response.errorMessage || `${DISPATCH_LAMBDA_NAME} failed`)
+  }
+  return response
+}
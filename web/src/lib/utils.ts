@@ -4,3 +4,10 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
+
+/**
+ * Parse a timestamp stored either as epoch seconds or as an ISO string.
+ */
+export function toDate(value: number | string): Date {
+  return typeof value === "number" ? new Date(value * 1000) : new Date(value)
+}
@@ -1,5 +1,6 @@
 import axios from 'axios';
 import AWS from 'aws-sdk';
+import { invokeJobsApi } from '../../lib/dispatchLambda';
 
 export default async function handler(req, res) {
   try {
@@ -15,56 +16,19 @@ export default async function handler(req, res) {
       secretAccessKey: 'test'
     };
     
-    // Handle job list request
-    if (path === '/jobs') {
-      const dynamoDB = new AWS.DynamoDB.DocumentClient(awsConfig);
-      
-      if (method === 'GET') {
-        // List all jobs
-        const result = await dynamoDB.scan({ TableName: 'jobs' }).promise();
-        return res.status(200).json(result.Items || []);
-      } 
-      
-      if (method === 'POST') {
-        // Create new job
-        const jobId = body.jobId;
-        const date = new Date();
-        const year = date.getFullYear();
-        const month = String(date.getMonth() + 1).padStart(2, '0');
-        const day = String(date.getDate()).padStart(2, '0');
-        const s3Key = `recordings/${year}/${month}/${day}/${body.filename}`;
-        
-        // Create job in DynamoDB
-        const jobItem = {
-          jobId: jobId,
-          url: body.url,
-          filename: body.filename,
-          s3Key: s3Key,
-          status: 'QUEUED',
-          createdAt: new Date().toISOString()
-        };
-        
-        await dynamoDB.put({
-          TableName: 'jobs',
-          Item: jobItem
-        }).promise();
-        
-        // Send job to SQS
-        const sqs = new AWS.SQS(awsConfig);
-        
-        await sqs.sendMessage({
-          QueueUrl: `${apiUrl}/000000000000/yt-jobs.fifo`,
-          MessageBody: JSON.stringify({
-            jobId: jobId,
-            url: body.url,
-            filename: body.filename,
-            s3Key: s3Key
-          }),
-          MessageGroupId: 'default'
-        }).promise();
-        
-        return res.status(200).json(jobItem);
-      }
+    // Handle job list and creation requests through the dispatch Lambda:
+    // GET returns one JobPage ({ items, nextCursor, changedSince }) or the change
+    // feed from the status indexes (job_queries.py); POST validates the request,
+    // coalesces duplicate URLs and picks the FIFO message group (message_groups.py)
+    if (path === '/jobs' && (method === 'GET' || method === 'POST')) {
+      const { path: _path, ...params } = query;
+      const response = await invokeJobsApi(new AWS.Lambda(awsConfig), {
+        method,
+        path: '/jobs',
+        query: method === 'GET' ? params : undefined,
+        body: method === 'POST' ? body : undefined
+      });
+      return res.status(response.statusCode).json(JSON.parse(response.body));
     }
     
     // Handle single job request - matches paths like /jobs/123-456-789
@@ -1,9 +1,11 @@
 export type JobStatus =
   | "PENDING"
   | "STARTED"
+  | "DOWNLOADING"
   | "RECORDING"
   | "UPLOADING"
   | "CREATING_TORRENT"
+  | "UPLOADING_TORRENT"
   | "SEEDING"
   | "COMPLETED"
   | "FAILED";
@@ -14,11 +16,14 @@ export interface Job {
   filename:         string;
   s3Key:            string;
   status:           JobStatus;
-  createdAt:        string;
+  createdAt:        number | string;  // epoch seconds (older items may hold an ISO string)
+  lastUpdatedAt?:   number;  // epoch seconds of the last write, drives the change feed
   startedAt?:       string;
   recordingAt?:     string;
   lastHeartbeat?:   string;
   bytesDownloaded?: number;
+  ingestRate?:      number;  // bytes/s recorded over the last sample
+  avgIngestRate?:   number;  // bytes/s recorded since the recording started
   uploadingAt?:     string;
   creatingTorrentAt?: string;
   seedingStartedAt?: string;
@@ -29,4 +34,22 @@ export interface Job {
   size?:            number;  // Size in bytes
   torrentFile?:     string;  // S3 key for the torrent file
   torrentInfo?:     string;  // Information about the torrent
+  contentSha256?:   string;  // SHA-256 of the recording, computed while it was uploaded
+}
+
+export interface JobPage {
+  items:        Job[];
+  nextCursor:   string | null;  // pass back to listJobs for the next (older) page
+  changedSince: number;         // pass to listChangedJobs to get later updates
+}
+
+export interface JobChanges {
+  items:        Job[];          // only the jobs written since the requested watermark
+  changedSince: number;         // watermark for the next listChangedJobs call
+}
+
+export interface CreateJobResponse {
+  success:    boolean;
+  jobId:      string;           // the job recording the URL (the existing one if coalesced)
+  coalesced:  boolean;          // true if the URL was already being recorded by another job
 }